@@ -2,385 +2,108 @@
 # -*- coding: utf-8 -*-
 
 import streamlit as st
+import copy
+import logging
 import os
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
-from moviepy.video.VideoClip import ImageClip
-from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
-from moviepy.audio.io.AudioFileClip import AudioFileClip
-from moviepy import concatenate_videoclips
-import uuid
-import tempfile
-import re
 
-# --- NUEVO: intento de importar OpenCV / numpy ---
-try:
-	import cv2
-	import numpy as np
-	cv2_available = True
-	_haarcascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-	if not os.path.exists(_haarcascade_path):
-		_haarcascade_path = None
-except Exception:
-	cv2 = None
-	np = None
-	cv2_available = False
-	_haarcascade_path = None
-
-# --- nueva: detección simple de emoji ---
-_emoji_re = re.compile(
-	"[" 
-	"\U0001F300-\U0001F5FF"
-	"\U0001F600-\U0001F64F"
-	"\U0001F680-\U0001F6FF"
-	"\U0001F700-\U0001F77F"
-	"\U0001F780-\U0001F7FF"
-	"\U0001F800-\U0001F8FF"
-	"\U0001F900-\U0001F9FF"
-	"\U0001FA00-\U0001FA6F"
-	"\U0001FA70-\U0001FAFF"
-	"]", flags=re.UNICODE)
-
-def contiene_emoji(s):
-	if not s:
-		return False
-	return bool(_emoji_re.search(s))
-
-# --- NUEVO: utilidades de detección y difuminado usando OpenCV ---
-def detectar_caras_pil(img_pil):
-	"""
-	Devuelve lista de boxes (x,y,w,h) usando Haarcascade sobre imagen PIL.
-	Si OpenCV no está disponible devuelve [].
-	"""
-	if not cv2_available or _haarcascade_path is None:
-		return []
-	arr = np.array(img_pil.convert("RGB"))
-	gray = cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
-	cascade = cv2.CascadeClassifier(_haarcascade_path)
-	faces = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-	return faces.tolist() if len(faces) else []
-
-def es_menor_por_tamano(face_box, img_size, threshold_ratio):
-	"""
-	Heurística: si la altura de la cara < threshold_ratio * altura_imagen => considerar menor.
-	"""
-	x, y, w, h = face_box
-	_, h_img = img_size
-	return (h / float(h_img)) < float(threshold_ratio)
-
-def difuminar_caras_en_pil(img_pil, boxes, blur_radius=15, expand_factor=0.25):
-	"""
-	Aplica GaussianBlur sobre cada box (con margen expand_factor).
-	"""
-	if not boxes:
-		return img_pil
-	img = img_pil.convert("RGBA")
-	for (x, y, w, h) in boxes:
-		exp_w = int(w * expand_factor)
-		exp_h = int(h * expand_factor)
-		x0 = max(0, x - exp_w)
-		y0 = max(0, y - exp_h)
-		x1 = min(img.width, x + w + exp_w)
-		y1 = min(img.height, y + h + exp_h)
-		region = img.crop((x0, y0, x1, y1))
-		region = region.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-		img.paste(region, (x0, y0), region)
-	return img
-
-# --- nueva: carga de fuente escalable ---
-def cargar_fuente(tamano, fuente_path=None, prefer_emoji=False):
-	"""
-	Intentar cargar una fuente TrueType escalable.
-	Si prefer_emoji True, prueba fuentes emoji antes de las estándar.
-	"""
-	tamano = int(tamano) if tamano else 20
-	posibles = []
-	if prefer_emoji:
-		# rutas comunes de fuentes emoji (macOS / Linux)
-		posibles += [
-			"/System/Library/Fonts/Apple Color Emoji.ttf",
-			"/usr/share/fonts/truetype/noto/NotoColorEmoji.ttf",
-			"/usr/share/fonts/truetype/seguiemj.ttf",
-			"/usr/share/fonts/truetype/ancient-scripts/Symbola.ttf"
-		]
-	if fuente_path:
-		posibles.append(fuente_path)
-	# rutas comunes en Linux / macOS / Windows (no-emoji)
-	posibles += [
-		"/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
-		"/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-		"/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
-		"/usr/share/fonts/truetype/freefont/FreeSans.ttf",
-		"/usr/share/fonts/truetype/msttcorefonts/Arial.ttf",
-		"/Library/Fonts/Arial.ttf",
-		"C:\\Windows\\Fonts\\Arial.ttf",
-		"arial.ttf",
-	]
-	for p in posibles:
-		try:
-			if p and os.path.exists(p):
-				# intenta cargar con tamaño
-				return ImageFont.truetype(p, tamano)
-		except Exception:
-			continue
-	# Intentar por nombre (Pillow puede resolver algunos nombres instalados)
-	for name_try in ("DejaVuSans.ttf", "Arial.ttf", "LiberationSans-Regular.ttf"):
-		try:
-			return ImageFont.truetype(name_try, tamano)
-		except Exception:
-			continue
-	# último recurso
-	return ImageFont.load_default()
-
-# --- NUEVO: estilo por prompt y funciones de efecto (a nivel de módulo) ---
-def apply_style_effects(img_pil, prompt):
-	"""
-	Aplica efectos simples basados en palabras clave del prompt.
-	Efectos: sepia/vintage, noir/black&white, warm/cool, grain, vignette, soft/blur, glow, contrast, brighten, desaturate.
-	"""
-	if not prompt:
-		return img_pil
-	p = str(prompt).lower()
-
-	img = img_pil.convert("RGBA")
-	# brillo/contraste/color enhancers
-	from PIL import ImageEnhance, ImageOps, ImageChops, ImageFilter, Image
-	# b&w / noir
-	if any(k in p for k in ("noir", "black and white", "black&white", "b&w", "bw", "monochrome")):
-		img = ImageOps.grayscale(img).convert("RGBA")
-		# aumentar contraste
-		img = ImageEnhance.Contrast(img).enhance(1.3)
-	# sepia / vintage
-	if any(k in p for k in ("sepia", "vintage", "retro")):
-		rgb = img.convert("RGB")
-		sep = rgb.copy()
-		sep = sep.convert("L")
-		sep = sep.convert("RGB")
-		overlay = Image.new("RGB", sep.size, (230, 180, 120))
-		sep = Image.blend(sep, overlay, 0.35).convert("RGBA")
-		sep.putalpha(img.split()[-1])
-		img = sep
-	# warm / sunny
-	if any(k in p for k in ("warm", "sunny", "sun")):
-		rgb = img.convert("RGB")
-		r_enh = ImageEnhance.Color(rgb).enhance(1.1)
-		r_enh = ImageEnhance.Brightness(r_enh).enhance(1.05)
-		w, h = rgb.size
-		overlay = Image.new("RGB", (w,h), (255,140,50))
-		img = Image.blend(r_enh, overlay, 0.08).convert("RGBA")
-	# cool / blue
-	if any(k in p for k in ("cool", "blue", "cold")):
-		rgb = img.convert("RGB")
-		overlay = Image.new("RGB", rgb.size, (40,120,200))
-		img = Image.blend(rgb, overlay, 0.08).convert("RGBA")
-	# soft / blur
-	if any(k in p for k in ("soft", "blur", "gentle")):
-		img = img.filter(ImageFilter.GaussianBlur(radius=2))
-	# glow
-	if "glow" in p:
-		blur = img.filter(ImageFilter.GaussianBlur(radius=8))
-		img = ImageChops.screen(img.convert("RGB"), blur.convert("RGB")).convert("RGBA")
-	# grain
-	if any(k in p for k in ("grain", "film", "noise")):
-		w, h = img.size
-		try:
-			noise = Image.effect_noise((w, h), 64).convert("L")
-			noise = ImageEnhance.Brightness(noise).enhance(0.8)
-			noise_rgba = Image.merge("RGBA", (noise, noise, noise, noise)).convert("RGBA")
-			img = Image.blend(img, noise_rgba, 0.08)
-		except Exception:
-			pass
-	# vignette
-	if "vignette" in p:
-		w, h = img.size
-		mask = Image.new("L", (w, h), 0)
-		mdraw = ImageDraw.Draw(mask)
-		n = 8
-		for i in range(n):
-			bbox = [int(w* (-0.1 + i*(1.2/n))), int(h*(-0.1 + i*(1.2/n))), int(w*(1.1 - i*(1.2/n))), int(h*(1.1 - i*(1.2/n)))]
-			alpha = int(255 * (i/(n-1))**1.5)
-			mdraw.ellipse(bbox, fill=alpha)
-		mask = ImageOps.invert(mask)
-		black = Image.new("RGBA", (w,h), (0,0,0,180))
-		img = Image.composite(img, Image.composite(img, black, mask), mask).convert("RGBA")
-	# contrast/bright/desaturate shortcuts
-	if "contrast" in p:
-		img = ImageEnhance.Contrast(img).enhance(1.15)
-	if "bright" in p or "brillo" in p or "brighten" in p:
-		img = ImageEnhance.Brightness(img).enhance(1.08)
-	if "desaturate" in p or "desaturado" in p:
-		img = ImageEnhance.Color(img).enhance(0.5)
-	return img
-
-# --- NUEVA SECCIÓN: Ajuste de títulos tras la generación del vídeo ---
-# (Movida aquí para estar definida antes de su uso)
-def superponer_titulos_en_video(video_path, output_path, titulos, pos_y, tamano, color, pos_sub_y, tamano_sub, color_sub):
-    # Importar submódulos concretos (evita dependencias de moviepy.editor)
-    from moviepy.video.io.VideoFileClip import VideoFileClip
-    from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
-    try:
-        from moviepy.video.VideoClip import TextClip
-    except Exception:
-        TextClip = None
-
-    video = VideoFileClip(video_path)
-    clips = [video]
-
-    # Si TextClip no está disponible, no añadimos clips de texto (se puede usar la ruta de frames/PIL)
-    if TextClip is not None:
-        for i, (titulo, subtitulo) in enumerate(titulos):
-            if titulo:
-                txt_clip = TextClip(
-                    titulo,
-                    fontsize=tamano,
-                    color=color,
-                    font="Arial",
-                    method="caption",
-                    size=(video.w - 100, None)
-                ).set_position(("center", pos_y)).set_duration(video.duration)
-                clips.append(txt_clip)
-            if subtitulo:
-                sub_clip = TextClip(
-                    subtitulo,
-                    fontsize=tamano_sub,
-                    color=color_sub,
-                    font="Arial",
-                    method="caption",
-                    size=(video.w - 100, None)
-                ).set_position(("center", pos_sub_y)).set_duration(video.duration)
-                clips.append(sub_clip)
-
-    final = CompositeVideoClip(clips)
-    final.write_videofile(output_path, codec='libx264', audio_codec='aac', fps=24)
-    video.close()
-    final.close()
-
-
-# --- FUNCIONES NÚCLEO (ligeramente adaptadas) ---
-# --- nueva: normaliza especificadores de color a '#RRGGBB' o devuelve nombre válido ---
-def normalizar_color(c):
-	"""
-	Devuelve un color válido para PIL: acepta '#RRGGBB', 'RRGGBB' o nombres como 'white'.
-	"""
-	if not c:
-		return "#000000"
-	cs = str(c).strip()
-	if cs.startswith("#"):
-		return cs
-	# si es hex sin '#'
-	if len(cs) == 6 and all(ch in "0123456789abcdefABCDEF" for ch in cs):
-		return "#" + cs
-	# fallback: devuelve tal cual (permite nombres como 'white')
-	return cs
-
-def ajustar_y_procesar_imagen(ruta_imagen, tamano_salida, titulo_info, subtitulo_texto=None, fondo_tipo="difuminado", fondo_color="#000000"):
-    """
-    Abre una imagen, la redimensiona para que quepa en el formato vertical,
-    crea un fondo según el tipo seleccionado y añade los textos.
-    
-    fondo_tipo: "difuminado" o "color"
-    fondo_color: color en formato hex (#RRGGBB) para el fondo si es de tipo "color"
-    """
-    img = Image.open(ruta_imagen).convert("RGBA")
-    
-    # Crear el fondo según el tipo seleccionado
-    if fondo_tipo == "difuminado":
-        fondo = img.resize(tamano_salida, Image.LANCZOS).filter(ImageFilter.GaussianBlur(radius=30))
-    else:  # fondo_tipo == "color"
-        fondo = Image.new("RGBA", tamano_salida, fondo_color)
-    
-    img.thumbnail(tamano_salida, Image.LANCZOS)
-    
-    lienzo = Image.new("RGBA", tamano_salida)
-    lienzo.paste(fondo, (0, 0))
-    pos_x = (tamano_salida[0] - img.width) // 2
-    pos_y = (tamano_salida[1] - img.height) // 2
-    lienzo.paste(img, (pos_x, pos_y), img)
-    
-    draw = ImageDraw.Draw(lienzo)
-
-    # Añadir Título
-    if titulo_info['texto']:
-        prefer_emoji = contiene_emoji(titulo_info['texto'])
-        fuente_titulo = cargar_fuente(titulo_info.get('tamano', 90), titulo_info.get('fuente_path'), prefer_emoji=prefer_emoji)
-        bbox_titulo = draw.textbbox((0, 0), titulo_info['texto'], font=fuente_titulo)
-        ancho_texto = bbox_titulo[2] - bbox_titulo[0]
-        alto_texto = bbox_titulo[3] - bbox_titulo[1]
-        pos_titulo_x = (tamano_salida[0] - ancho_texto) // 2
-        pos_titulo_y = titulo_info.get('pos_y', 100)  # Usa el valor configurable
-        
-        # normalizar colores antes de dibujar
-        _color_sombra = normalizar_color(titulo_info.get('color_sombra', '000000'))
-        _color_texto = normalizar_color(titulo_info.get('color', 'ffffff'))
-        
-        draw.text((pos_titulo_x + 3, pos_titulo_y + 3), titulo_info['texto'], font=fuente_titulo, fill=_color_sombra)
-        draw.text((pos_titulo_x, pos_titulo_y), titulo_info['texto'], font=fuente_titulo, fill=_color_texto)
-
-    # Añadir Subtítulo
-    if subtitulo_texto:
-        prefer_emoji_sub = contiene_emoji(subtitulo_texto)
-        fuente_subtitulo = cargar_fuente(titulo_info.get('tamano_sub', 60), titulo_info.get('fuente_path'), prefer_emoji=prefer_emoji_sub)
-        bbox_sub = draw.textbbox((0, 0), subtitulo_texto, font=fuente_subtitulo)
-        ancho_sub = bbox_sub[2] - bbox_sub[0]
-        alto_sub = bbox_sub[3] - bbox_sub[1]
-        pos_sub_x = (tamano_salida[0] - ancho_sub) // 2
-        pos_sub_y = titulo_info.get('pos_sub_y', tamano_salida[1] - alto_sub - 150)  # Usa el valor configurable
-        
-        _color_sombra_sub = normalizar_color(titulo_info.get('color_sombra', '000000'))
-        _color_sub = normalizar_color(titulo_info.get('color_sub', 'ffffff'))
-        
-        draw.text((pos_sub_x + 2, pos_sub_y + 2), subtitulo_texto, font=fuente_subtitulo, fill=_color_sombra_sub)
-        draw.text((pos_sub_x, pos_sub_y), subtitulo_texto, font=fuente_subtitulo, fill=_color_sub)
-
-    return lienzo.convert("RGB")
-
-# --- NUEVO: utilidades para collage/overlay con soporte de escala por imagen ---
-import math
-def crear_collage_general(paths, scales=None, tamaño=(1080,1920)):
-    """
-    Crea un collage automático a partir de una lista de rutas.
-    - scales: lista de floats con factor de escala por imagen (1.0 = ocupa celda completa).
-    Distribución: grid cuadrada (cols = ceil(sqrt(n))).
-    """
-    if not paths:
-        return Image.new("RGB", tamaño, (0,0,0))
-    n = len(paths)
-    w, h = tamaño
-    cols = int(math.ceil(math.sqrt(n)))
-    rows = int(math.ceil(n / float(cols)))
-    cell_w = w // cols
-    cell_h = h // rows
-    canvas = Image.new("RGBA", (w, h), (0,0,0,255))
-    scales = scales or [1.0]*n
-    for idx, p in enumerate(paths):
-        try:
-            im = Image.open(p).convert("RGBA")
-        except Exception:
-            continue
-        scale = scales[idx] if idx < len(scales) else 1.0
-        target_w = max(10, int(cell_w * scale))
-        target_h = max(10, int(cell_h * scale))
-        im_resized = im.resize((target_w, target_h), Image.LANCZOS)
-        col = idx % cols
-        row = idx // cols
-        # centrar dentro de la celda
-        x0 = col * cell_w + (cell_w - target_w)//2
-        y0 = row * cell_h + (cell_h - target_h)//2
-        canvas.paste(im_resized, (x0, y0), im_resized)
-    return canvas.convert("RGB")
-
-def overlay_two_images(path_a, path_b, tamaño=(1080,1920), alpha=0.35):
-    """Superpone B encima de A con alpha (abre rutas o acepta PIL)."""
-    try:
-        a = Image.open(path_a).convert("RGBA").resize(tamaño, Image.LANCZOS)
-    except Exception:
-        a = Image.new("RGBA", tamaño, (0,0,0,255))
-    try:
-        b = Image.open(path_b).convert("RGBA").resize(tamaño, Image.LANCZOS)
-    except Exception:
-        b = Image.new("RGBA", tamaño, (0,0,0,0))
-    b.putalpha(int(255 * alpha))
-    out = Image.alpha_composite(a, b)
-    return out.convert("RGB")
+# Todo el procesado de imagen y el montaje viven en el paquete motor (sin Streamlit)
+from motor import (
+    cv2_available,
+    VistaPrevia,
+    renderizar_proyecto,
+    incrustar_titulos,
+    obtener_cache,
+    obtener_gestor,
+    obtener_cola,
+    servidor_publico,
+    MOVIMIENTOS,
+    PERFILES,
+)
+from motor.medicion import Medicion
+from motor.trabajos import COMPLETADO, ERROR
+
+# Una línea JSON por render con sus tiempos por etapa (logger motor.medicion)
+_logger_medicion = logging.getLogger("motor.medicion")
+if not _logger_medicion.handlers:
+    _logger_medicion.addHandler(logging.StreamHandler())
+    _logger_medicion.setLevel(logging.INFO)
+
+# Cada sesión trabaja en su propio directorio (con cuotas y limpieza en segundo plano)
+gestor_espacios = obtener_gestor(os.path.join("temp_files", "sesiones"))
+if "espacio_sesion_id" not in st.session_state:
+    st.session_state["espacio_sesion_id"] = gestor_espacios.sesion().id
+espacio_sesion = gestor_espacios.sesion(st.session_state["espacio_sesion_id"])
+# Renders e incrustaciones se ejecutan en una cola compartida (codificaciones limitadas)
+cola_trabajos = obtener_cola()
+
+ETAPAS = {
+    "preparar": "Preparando fotos",
+    "esperando_codificacion": "Esperando turno para codificar",
+    "codificar": "Codificando",
+    "audio": "Preparando audio",
+    "concatenar": "Uniendo segmentos",
+}
+
+
+@st.fragment(run_every=1.0)
+def mostrar_progreso(clave):
+    """Barra de progreso del trabajo pendiente en session_state[clave]; al terminar recarga la página."""
+    pendiente = st.session_state.get(clave)
+    if not pendiente:
+        return
+    trabajo = pendiente["trabajo"]
+    if not trabajo.activo:
+        st.rerun()
+    texto = ETAPAS.get(trabajo.etapa, "En cola...")
+    if trabajo.etapa == "preparar":
+        texto += f" ({trabajo.hecho}/{trabajo.total})"
+    elif trabajo.etapa == "codificar":
+        texto += f" ({trabajo.hecho:.1f} / {trabajo.total:.1f} s)"
+    st.progress(trabajo.fraccion, text=texto)
+    if st.button("Cancelar", key=f"cancelar_{clave}"):
+        trabajo.cancelar()
+
+
+def mostrar_medicion(informe, titulo):
+    """Desglose de tiempos de un render (fases y etapas) y, si se pidió, su perfilado."""
+    with st.expander(f"{titulo} ({informe['total_s']:.1f} s)"):
+        if informe["fases"]:
+            st.caption("Fases (tiempo real): " + " · ".join(f"{k} {v:.2f} s" for k, v in informe["fases"].items()))
+        st.caption("Etapas (tiempo acumulado, incluidos los procesos en paralelo)")
+        st.table([{"etapa": e["etapa"], "segundos": f"{e['segundos']:.3f}", "llamadas": e["llamadas"]} for e in informe["etapas"]])
+        if "cprofile" in informe["perfilado"]:
+            st.code(informe["perfilado"]["cprofile"], language=None)
+        if "tracemalloc" in informe["perfilado"]:
+            st.caption(f"tracemalloc: pico {informe['perfilado']['tracemalloc']['pico_mb']} MB")
+            st.code("\n".join(informe["perfilado"]["tracemalloc"]["top"]), language=None)
+
+
+def video_en_memoria(ruta):
+    """Bytes del vídeo para st.video, leídos una sola vez por ruta y no en cada recarga de la página."""
+    actual = st.session_state.get("video_en_memoria")
+    if not actual or actual[0] != ruta:
+        with open(ruta, "rb") as f:
+            actual = st.session_state["video_en_memoria"] = (ruta, f.read())
+    return actual[1]
+
+
+def lectura_diferida(ruta):
+    """data de st.download_button que solo lee el fichero cuando se pulsa el botón."""
+    def _leer():
+        with open(ruta, "rb") as f:
+            return f.read()
+    return _leer
+
+
+def _trabajos_en_uso():
+    """Trabajos de la sesión que no deben expulsarse por cuota."""
+    en_uso = set()
+    if st.session_state.get("trabajo_render") is not None:
+        en_uso.add(st.session_state["trabajo_render"].id)
+    for clave in ("render_pendiente", "titulos_pendiente"):
+        if st.session_state.get(clave):
+            en_uso.add(st.session_state[clave]["espacio"].id)
+    return en_uso
 
 # --- INTERFAZ DE STREAMLIT ---
 
@@ -417,6 +140,15 @@ with st.sidebar:
     st.subheader("3. Ajustes de Duración")
     duracion_foto = st.slider("Duración de cada foto (segundos)", 1.0, 10.0, 3.0, 0.5)
     transicion_duracion = st.slider("Duración de la transición (segundos)", 0.1, 2.0, 0.5, 0.1)
+    modo_borrador = st.checkbox(
+        "Modo borrador (360x640, 12 fps, rápido)", value=st.session_state.get("modo_borrador", False),
+        help="Prueba rápida para revisar orden y tiempos. Después, 'Render final' genera el vídeo completo con los mismos títulos."
+    )
+    perfil_codificacion = st.selectbox(
+        "Perfil de codificación", options=[None] + list(PERFILES), index=0,
+        format_func=lambda p: "Automático (fast-draft en borrador, balanced en final)" if p is None else p,
+        help="fast-draft: codifica muy rápido, ficheros grandes. balanced: equilibrio. archive: máxima calidad, más lento."
+    )
 
     # 4. Ajustes de título (nuevo)
     st.subheader("4. Ajustes de Título")
@@ -441,7 +173,9 @@ with st.sidebar:
 
     # --- nuevo: controles de transición / collage ---
     st.subheader("🔁 Montaje y Transiciones")
-    transition_type = st.selectbox("Tipo de transición", options=["none","crossfade","dissolve","slide","zoom"], index=1)
+    transition_type = st.selectbox("Tipo de transición", options=["none","crossfade","dissolve","fade","slide","wipe","zoom"], index=1)
+    zoom_movimiento = st.selectbox("Movimiento del zoom", options=list(MOVIMIENTOS), index=0,
+                                   disabled=transition_type != "zoom")
     
     # Nueva opción para habilitar/deshabilitar collage
     usar_collage = st.checkbox("Usar collage para múltiples fotos", value=st.session_state.get("usar_collage", False))
@@ -467,51 +201,32 @@ with st.sidebar:
     st.session_state["global_style_prompt"] = global_style_prompt
     st.session_state["global_style_apply"] = global_style_apply
     st.session_state["transition_type"] = transition_type
+    st.session_state["zoom_movimiento"] = zoom_movimiento
     st.session_state["max_photos_per_collage"] = max_photos_per_collage
     st.session_state["usar_collage"] = usar_collage
     st.session_state["fondo_tipo"] = fondo_tipo
     st.session_state["fondo_color"] = fondo_color
+    st.session_state["modo_borrador"] = modo_borrador
+    st.session_state["perfil_elegido"] = perfil_codificacion
+
+# Las subidas se guardan por contenido en segundo plano en cuanto aparecen, mientras
+# se termina de configurar el vídeo; "Generar" solo espera a las que falten.
+# file_id identifica cada subida de Streamlit: en las recargas no se vuelve a hashear.
+almacen_subidas = espacio_sesion.subidas()
+subidas_guardadas = st.session_state.setdefault("subidas_guardadas", {})
+for archivo in list(fotos_subidas or []) + ([audio_subido] if audio_subido else []):
+    if archivo.file_id not in subidas_guardadas:
+        subidas_guardadas[archivo.file_id] = almacen_subidas.guardar(archivo.getvalue(), archivo.name)
 
-# --- Mueve esta función antes de la lógica de generación (antes de la línea donde se usa) ---
-def crear_clip_zoom_pil(imagen_path, duracion, factor_zoom=0.1, fps=24):
-    """
-    Genera un clip de zoom-in usando PIL y numpy, empezando al 20% y terminando al 100%.
-    """
-    import numpy as np
-    from PIL import Image
-    from moviepy.video.VideoClip import VideoClip
-    
-    # Cargar imagen una vez fuera de make_frame
-    img = Image.open(imagen_path).convert("RGB")
-    w, h = img.size
-    
-    # Crear función make_frame que genera el frame con zoom según el tiempo
-    def make_frame(t):
-        # Calcular factor de zoom basado en el tiempo (20% -> 100%)
-        factor = 0.2 + 0.8 * (t / duracion)
-        
-        # Calcular dimensiones para el frame actual
-        current_w = int(w * factor)
-        current_h = int(h * factor)
-        
-        # Crear un lienzo negro del tamaño final
-        canvas = Image.new("RGB", (w, h), (0, 0, 0))
-        
-        # Redimensionar la imagen original al tamaño actual según el factor
-        img_resized = img.resize((current_w, current_h), Image.LANCZOS)
-        
-        # Calcular posición para centrar en el lienzo
-        paste_x = (w - current_w) // 2
-        paste_y = (h - current_h) // 2
-        
-        # Pegar la imagen redimensionada en el centro del lienzo
-        canvas.paste(img_resized, (paste_x, paste_y))
-        
-        # Convertir a array para MoviePy
-        return np.array(canvas)
-    
-    # Crear VideoClip usando la función make_frame
-    return VideoClip(make_frame, duration=duracion)
+
+
+def ruta_subida(archivo):
+    """Ruta guardada de una subida; si la limpieza de disco la ha borrado desde entonces, la vuelve a guardar."""
+    ruta = subidas_guardadas[archivo.file_id].result()
+    if not os.path.exists(ruta):
+        subidas_guardadas[archivo.file_id] = almacen_subidas.guardar(archivo.getvalue(), archivo.name)
+        ruta = subidas_guardadas[archivo.file_id].result()
+    return ruta
 
 # --- LÓGICA DE GENERACIÓN ---
 if "video_generado_path" not in st.session_state:
@@ -528,391 +243,91 @@ if st.button("✨ ¡Generar Vídeo!"):
     if not fotos_subidas:
         st.warning("Por favor, sube al menos una foto.")
     else:
-        with st.spinner('Procesando... El vídeo se está creando. ¡Esto puede tardar unos minutos!'):
-            temp_dir = "temp_files"
-            if not os.path.exists(temp_dir):
-                os.makedirs(temp_dir)
-            rutas_fotos = []
-            for foto in fotos_subidas:
-                ruta = os.path.join(temp_dir, foto.name)
-                with open(ruta, "wb") as f:
-                    f.write(foto.getbuffer())
-                rutas_fotos.append(ruta)
-            ruta_audio = None
-            if audio_subido:
-                ruta_audio = os.path.join(temp_dir, audio_subido.name)
-                with open(ruta_audio, "wb") as f:
-                    f.write(audio_subido.getbuffer())
-            subtitulos = [s.strip() for s in subtitulos_texto.split('\n') if s.strip()]
-            if subtitulos and len(subtitulos) != len(rutas_fotos):
-                st.warning("El número de subtítulos no coincide con el de fotos. Se omitirán.")
-                subtitulos = []
-            
-            # --- MONTAJE Y TRANSICIONES ---
-            style_prompt_global = st.session_state.get("global_style_prompt", "") or ""
-            sp = style_prompt_global.lower()
-            
-            # Determinar modo de montaje según la selección del usuario, no por prompt
-            montage_mode = "normal"
-            if st.session_state.get("usar_collage", False):
-                montage_mode = "collage"
-            elif "overlay" in sp or "superpos" in sp:
-                montage_mode = "overlay"
-                
-            # Obtenemos las opciones de fondo
-            fondo_tipo = st.session_state.get("fondo_tipo", "difuminado")
-            fondo_color = st.session_state.get("fondo_color", "#000000")
-            
-            speed_factor = 1.0
-            if "fast" in sp or "rápido" in sp:
-                speed_factor = 0.6
-            if "slow" in sp or "lento" in sp:
-                speed_factor = 1.5
-
-            # Transición seleccionada por el usuario
-            transition_type = st.session_state.get("transition_type", "crossfade")
-            use_crossfade = transition_type in ("crossfade", "dissolve", "fade")
-            use_slide = transition_type == "slide"
-            use_zoom = transition_type == "zoom"
-            trans_dur = transicion_duracion
-
-            clips_imagenes = []
-            frames_paths = []
-            i = 0
-            N = len(rutas_fotos)
-            while i < N:
-                if montage_mode == "collage":
-                    group = rutas_fotos[i:i+st.session_state.get("max_photos_per_collage",3)]
-                    temp_imgs = []
-                    scales_for_group = []
-                    for p in group:
-                        improc = ajustar_y_procesar_imagen(
-                            p, (1080,1920), 
-                            {
-                                'texto': '',
-                                'fuente_path': None,
-                                'tamano': 1,
-                                'color': "white",
-                                'color_sombra': "black",
-                                'tamano_sub': 1,
-                                'color_sub': "white",
-                                'pos_y': 0,
-                                'pos_sub_y': 0
-                            }, 
-                            None,
-                            fondo_tipo=fondo_tipo,
-                            fondo_color=fondo_color
-                        )
-                        if st.session_state.get("global_style_apply", False) and style_prompt_global:
-                            try:
-                                improc = apply_style_effects(improc, style_prompt_global)
-                            except Exception:
-                                pass
-                        tmpn = os.path.join(temp_dir, f"sub_{uuid.uuid4()}.png")
-                        improc.save(tmpn)
-                        temp_imgs.append(tmpn)
-                        idx_global = i + len(temp_imgs) - 1
-                        try:
-                            s = st.session_state["titulos_state"][idx_global].get("scale",1.0)
-                        except Exception:
-                            s = 1.0
-                        scales_for_group.append(float(s))
-                    collage_img = crear_collage_general(temp_imgs, scales=scales_for_group, tamaño=(1080,1920))
-                    if st.session_state.get("global_style_apply", False) and style_prompt_global:
-                        try:
-                            collage_img = apply_style_effects(collage_img, style_prompt_global)
-                        except Exception:
-                            pass
-                    ruta_temporal_frame = os.path.join(temp_dir, f"frame_{uuid.uuid4()}.png")
-                    collage_img.save(ruta_temporal_frame)
-                    frames_paths.append(ruta_temporal_frame)
-                    dur = max(0.5, duracion_foto * speed_factor)
-                    clip = ImageClip(ruta_temporal_frame, duration=dur)
-                    clips_imagenes.append(clip)
-                    i += len(group)
-                elif montage_mode == "overlay":
-                    a = rutas_fotos[i]
-                    b = rutas_fotos[i+1] if i+1 < N else None
-                    if b:
-                        a_proc = ajustar_y_procesar_imagen(a, (1080,1920), {
-                            'texto': '',
-                            'fuente_path': None,
-                            'tamano': 1,
-                            'color': "white",
-                            'color_sombra': "black",
-                            'tamano_sub': 1,
-                            'color_sub': "white",
-                            'pos_y': 0,
-                            'pos_sub_y': 0
-                        }, None, fondo_tipo=fondo_tipo, fondo_color=fondo_color)
-                        b_proc = ajustar_y_procesar_imagen(b, (1080,1920), {
-                            'texto': '',
-                            'fuente_path': None,
-                            'tamano': 1,
-                            'color': "white",
-                            'color_sombra': "black",
-                            'tamano_sub': 1,
-                            'color_sub': "white",
-                            'pos_y': 0,
-                            'pos_sub_y': 0
-                        }, None, fondo_tipo=fondo_tipo, fondo_color=fondo_color)
-                        if st.session_state.get("global_style_apply", False) and style_prompt_global:
-                            try:
-                                a_proc = apply_style_effects(a_proc, style_prompt_global)
-                                b_proc = apply_style_effects(b_proc, style_prompt_global)
-                            except Exception:
-                                pass
-                        ta = os.path.join(temp_dir, f"sub_{uuid.uuid4()}.png")
-                        tb = os.path.join(temp_dir, f"sub_{uuid.uuid4()}.png")
-                        a_proc.save(ta); b_proc.save(tb)
-                        over = overlay_two_images(ta, tb, tamaño=(1080,1920), alpha=0.35)
-                        if st.session_state.get("global_style_apply", False) and style_prompt_global:
-                            try:
-                                over = apply_style_effects(over, style_prompt_global)
-                            except Exception:
-                                pass
-                        ruta_temporal_frame = os.path.join(temp_dir, f"frame_{uuid.uuid4()}.png")
-                        over.save(ruta_temporal_frame)
-                        frames_paths.append(ruta_temporal_frame)
-                        dur = max(0.5, duracion_foto * speed_factor)
-                        clip = ImageClip(ruta_temporal_frame, duration=dur)
-                        clips_imagenes.append(clip)
-                        i += 2
-                    else:
-                        single = ajustar_y_procesar_imagen(a, (1080,1920), {
-                            'texto': '',
-                            'fuente_path': None,
-                            'tamano': 1,
-                            'color': "white",
-                            'color_sombra': "black",
-                            'tamano_sub': 1,
-                            'color_sub': "white",
-                            'pos_y': 0,
-                            'pos_sub_y': 0
-                        }, None, fondo_tipo=fondo_tipo, fondo_color=fondo_color)
-                        if st.session_state.get("global_style_apply", False) and style_prompt_global:
-                            try:
-                                single = apply_style_effects(single, style_prompt_global)
-                            except Exception:
-                                pass
-                        ruta_temporal_frame = os.path.join(temp_dir, f"frame_{uuid.uuid4()}.png")
-                        single.save(ruta_temporal_frame)
-                        frames_paths.append(ruta_temporal_frame)
-                        dur = max(0.5, duracion_foto * speed_factor)
-                        clip = ImageClip(ruta_temporal_frame, duration=dur)
-                        clips_imagenes.append(clip)
-                        i += 1
-                else:
-                    p = rutas_fotos[i]
-                    imagen_procesada_pil = ajustar_y_procesar_imagen(p, (1080,1920), {
-                        'texto': '',
-                        'fuente_path': None,
-                        'tamano': 1,
-                        'color': "white",
-                        'color_sombra': "black",
-                        'tamano_sub': 1,
-                        'color_sub': "white",
-                        'pos_y': 0,
-                        'pos_sub_y': 0
-                    }, None, fondo_tipo=fondo_tipo, fondo_color=fondo_color)
-                    # aplicar estilo global si procede
-                    if st.session_state.get("global_style_apply", False) and style_prompt_global:
-                        try:
-                            imagen_procesada_pil = apply_style_effects(imagen_procesada_pil, style_prompt_global)
-                        except Exception:
-                            pass
-                    ruta_temporal_frame = os.path.join(temp_dir, f"frame_{uuid.uuid4()}.png")
-                    imagen_procesada_pil.save(ruta_temporal_frame)
-                    frames_paths.append(ruta_temporal_frame)
-                    dur = max(0.5, duracion_foto * speed_factor)
-                    clip = ImageClip(ruta_temporal_frame, duration=dur)
-                    clips_imagenes.append(clip)
-                    i += 1
-
-            # --- Transiciones entre clips ---
-            final_clips = []
-            for idx, clip in enumerate(clips_imagenes):
-                if idx == 0:
-                    final_clips.append(clip)
-                else:
-                    prev = final_clips[-1]
-                    if use_crossfade:
-                        # Usa las funciones fx en lugar de los métodos
-                        final_clips[-1] = fadeout(prev, trans_dur)
-                        final_clips.append(fadein(clip, trans_dur))
-                    elif use_slide:
-                        final_clips.append(clip)
-                    elif use_zoom:
-                        # Sustituye el zoom de MoviePy por PIL
-                        zoomed = crear_clip_zoom_pil(frames_paths[idx], clip.duration, factor_zoom=0.1)
-                        final_clips.append(zoomed)
-                    else:
-                        final_clips.append(clip)
-            if use_crossfade:
-                video_final = concatenate_videoclips(final_clips, method="compose", padding=-trans_dur)
-            else:
-                video_final = concatenate_videoclips(final_clips, method="compose")
-
-            video_salida_path = os.path.join(temp_dir, "evento_final.mp4")
-            if ruta_audio:
-                audio_clip = AudioFileClip(ruta_audio)
-                audio_clip = audio_clip.fx(lambda c: c.loop(duration=video_final.duration))
-                video_final.audio = audio_clip.subclip(0, video_final.duration)
-            else:
-                video_final = video_final.without_audio()
-            video_final.write_videofile(video_salida_path, codec='libx264', audio_codec='aac', fps=24)
-            
-            # --- NUEVO: calcula tamaños por defecto basados en el primer frame ---
-            if frames_paths:
-                try:
-                    with Image.open(frames_paths[0]) as _img:
-                        w_first, h_first = _img.size
-                except Exception:
-                    h_first = 1920
-            else:
-                h_first = 1920
-
-            default_title_size = max(18, int(h_first * 0.08))   # ~8% de la altura
-            default_sub_size = max(12, int(h_first * 0.045))    # ~4.5% de la altura
-
-            st.session_state["video_generado_path"] = video_salida_path
-            st.session_state["frames_paths"] = frames_paths
-            st.session_state["titulos_state"] = [
-                {
-                    "titulo": texto_titulo if (mostrar_titulo_en == 'En todas las fotos' or i == 0) else "",
-                    "subtitulo": subtitulos[i] if i < len(subtitulos) else "",
-                    "pos_y": int(h_first * 0.06),
-                    "tamano": default_title_size,
-                    "color": "000000",
-                    "pos_sub_y": int(h_first * 0.88),
-                    "tamano_sub": default_sub_size,
-                    "color_sub": "000000",
-                    "angle": 0,
-                    "angle_sub": 0,
-                    # nuevos campos para difuminado (por imagen)
-                    "blur": st.session_state.get("global_blur", False),
-                    "blur_minors": st.session_state.get("global_blur_minors", False),
-                    "blur_strength": st.session_state.get("global_blur_strength", 15),
-                    "minors_threshold": st.session_state.get("global_minors_threshold", 0.12),
-                    # campos de estilo por imagen
-                    "use_style": st.session_state.get("global_style_apply", False),
-                    "style_prompt": st.session_state.get("global_style_prompt", ""),
-                    # nuevo: escala relativa para collage (0.2 - 1.5)
-                    "scale": 1.0
-                }
-                for i in range(len(frames_paths))
-            ]
-            st.success("¡Vídeo generado! Ahora puedes ajustar los títulos antes de incrustarlos.")
-# --- FUNCIÓN PARA SUPERPONER TÍTULOS EN UN FRAME ---
-# Modificar llamadas para aceptar flags blur y aplicarlo antes de dibujar texto
-def superponer_titulos_en_frame(imagen_path, titulo, subtitulo, pos_y, tamano, color, pos_sub_y, tamano_sub, color_sub, angle=0, angle_sub=0, blur=False, blur_minors=False, blur_strength=15, minors_threshold=0.12, style_apply=False, style_prompt=""):
-	# Cargar imagen base
-	img = Image.open(imagen_path).convert("RGBA")
-	# Si se solicita difuminado, detectar caras y aplicar según opciones
-	if blur and cv2_available:
-		boxes = detectar_caras_pil(img)
-		if boxes:
-			if blur_minors:
-				# filtrar boxes por heurística de tamaño
-				boxes = [b for b in boxes if es_menor_por_tamano(b, img.size, minors_threshold)]
-			# aplicar difuminado
-			img = difuminar_caras_en_pil(img, boxes, blur_radius=blur_strength)
-	# aplicar estilo (si está activo y hay prompt)
-	if style_apply and style_prompt:
-		try:
-			img = apply_style_effects(img, style_prompt)
-		except Exception:
-			# no bloquear si falla el efecto
-			pass
-	# continuar con el proceso (resto de la implementación igual)
-	w_img, h_img = img.size
-	canvas = Image.new("RGBA", img.size, (0,0,0,0))
-
-	# Función auxiliar para crear una capa con el texto y rotarla (ahora con auto-escalado)
-	def _draw_rotated_text_inner(base_img, text, font_size, x_center, y_top, fill, shadow_fill, angle_deg):
-		if not text:
-			return (None, None)
-		# normalizar colores
-		fill_color = normalizar_color(fill)
-		shadow_color = normalizar_color(shadow_fill)
-
-		# preferencia por emoji si corresponde
-		prefer_emoji = contiene_emoji(text)
-		requested_size = int(max(6, font_size))
-		font = cargar_fuente(requested_size, None, prefer_emoji=prefer_emoji)
-
-		# medir texto con la fuente actual
-		temp_draw = ImageDraw.Draw(Image.new("RGBA", (10,10)))
-		bbox = temp_draw.textbbox((0,0), text, font=font)
-		tw = bbox[2] - bbox[0]
-		th = bbox[3] - bbox[1]
-
-		# ancho máximo permitido para el texto (margen lateral)
-		max_width = max(20, w_img - 40)
-
-		# si excede, escalar fuente proporcionalmente (mismo comportamiento)
-		if tw > max_width:
-			scale = max_width / float(tw)
-			new_size = max(8, int(requested_size * scale))
-			font = cargar_fuente(new_size, None, prefer_emoji=prefer_emoji)
-			bbox = temp_draw.textbbox((0,0), text, font=font)
-			tw = bbox[2] - bbox[0]
-			th = bbox[3] - bbox[1]
-			loop_guard = 0
-			while tw > max_width and loop_guard < 12 and new_size > 8:
-				new_size = max(8, int(new_size * 0.9))
-				font = cargar_fuente(new_size, None, prefer_emoji=prefer_emoji)
-				bbox = temp_draw.textbbox((0,0), text, font=font)
-				tw = bbox[2] - bbox[0]
-				th = bbox[3] - bbox[1]
-				loop_guard += 1
-
-		# utilizar métricas para margen inferior (evita corte)
-		try:
-			ascent, descent = font.getmetrics()
-		except Exception:
-			ascent, descent = th, int(th*0.2)
-		margin_top = 10
-		margin_bottom = max(10, descent + 6)
-
-		layer_w, layer_h = tw + margin_top + margin_bottom + 20, th + margin_top + margin_bottom + 20
-		layer = Image.new("RGBA", (layer_w, layer_h), (0,0,0,0))
-		layer_draw = ImageDraw.Draw(layer)
-		# dibujar sombra y texto en la capa con colores normalizados
-		shadow_offset = 3
-		layer_draw.text((10+shadow_offset, margin_top+shadow_offset), text, font=font, fill=shadow_color)
-		layer_draw.text((10, margin_top), text, font=font, fill=fill_color)
-		# rotar capa
-		rot = layer.rotate(angle_deg, resample=Image.BICUBIC, expand=True)
-		# calcular paste position
-		paste_x = int(x_center - rot.width // 2)
-		paste_y = int(y_top)
-		# clamp vertical/horizontal
-		if paste_y < 0:
-			paste_y = 0
-		if paste_y + rot.height > h_img:
-			paste_y = max(0, h_img - rot.height)
-		if paste_x < 0:
-			paste_x = 0
-		if paste_x + rot.width > w_img:
-			paste_x = max(0, w_img - rot.width)
-		return rot, (paste_x, paste_y)
-
-	# Título: centrado en ancho, posición vertical pos_y
-	if titulo:
-		rot_layer, pos = _draw_rotated_text_inner(img, titulo, tamano, w_img//2, pos_y, color or "ffffff", "000000", angle)
-		if rot_layer:
-			canvas.alpha_composite(rot_layer, dest=pos)
-
-	# Subtítulo
-	if subtitulo:
-		rot_layer_sub, pos_sub = _draw_rotated_text_inner(img, subtitulo, tamano_sub, w_img//2, pos_sub_y, color_sub or "ffffff", "000000", angle_sub)
-		if rot_layer_sub:
-			canvas.alpha_composite(rot_layer_sub, dest=pos_sub)
+        if st.session_state.get("render_pendiente"):
+            st.session_state["render_pendiente"]["trabajo"].cancelar()
+        with st.spinner('Guardando archivos...'):
+            trabajo = espacio_sesion.trabajo("render", protegidos=_trabajos_en_uso())
+            temp_dir = trabajo.directorio
+            rutas_fotos = [ruta_subida(foto) for foto in fotos_subidas]
+            ruta_audio = ruta_subida(audio_subido) if audio_subido else None
+
+            # escalas de collage guardadas en el editor (si existen de una generación anterior)
+            escalas = [t.get("scale", 1.0) for t in st.session_state.get("titulos_state", [])]
+            proyecto = {
+                "fotos": rutas_fotos,
+                "audio": ruta_audio,
+                "titulo": texto_titulo,
+                "mostrar_titulo_en": "todas" if mostrar_titulo_en == 'En todas las fotos' else "primera",
+                "subtitulos": subtitulos_texto,
+                "duracion_foto": duracion_foto,
+                "transicion_duracion": transicion_duracion,
+                "transicion": st.session_state.get("transition_type", "crossfade"),
+                "zoom_movimiento": st.session_state.get("zoom_movimiento", "in"),
+                "fondo_tipo": st.session_state.get("fondo_tipo", "difuminado"),
+                "fondo_color": st.session_state.get("fondo_color", "#000000"),
+                "estilo_prompt": st.session_state.get("global_style_prompt", "") or "",
+                "estilo_aplicar": st.session_state.get("global_style_apply", False),
+                "usar_collage": st.session_state.get("usar_collage", False),
+                "max_fotos_collage": st.session_state.get("max_photos_per_collage", 3),
+                "escalas": escalas,
+                "blur": st.session_state.get("global_blur", False),
+                "blur_minors": st.session_state.get("global_blur_minors", False),
+                "blur_strength": st.session_state.get("global_blur_strength", 15),
+                "minors_threshold": st.session_state.get("global_minors_threshold", 0.12),
+                "borrador": st.session_state.get("modo_borrador", False),
+                "perfil_codificacion": st.session_state.get("perfil_elegido"),
+                # títulos por defecto incrustados ya en el primer render: al incrustar después
+                # solo se recodifican los segmentos de las fotos cuyos títulos se hayan editado
+                "incrustar_titulos": True,
+                "salida": trabajo.ruta("evento_final.mp4"),
+                # caché compartida con la incrustación de títulos (segmentos y música ya codificada)
+                "cache_segmentos_dir": os.path.join("temp_files", "cache_segmentos"),
+                # frames ya preparados (mismas fotos y ajustes de imagen), compartidos entre sesiones
+                "cache_frames_dir": os.path.join("temp_files", "cache_frames"),
+            }
+            # el render se ejecuta en la cola compartida; la página sigue respondiendo
+            st.session_state["render_pendiente"] = {
+                "trabajo": cola_trabajos.enviar(renderizar_proyecto, proyecto, temp_dir=temp_dir, tipo="render", espacio=espacio_sesion),
+                "espacio": trabajo,
+                "ruta_audio": ruta_audio,
+                "proyecto": proyecto,
+            }
+
+pendiente = st.session_state.get("render_pendiente")
+if pendiente and not pendiente["trabajo"].activo:
+    del st.session_state["render_pendiente"]
+    trabajo_cola = pendiente["trabajo"]
+    # leído el resultado, la cola deja de retenerlo (sea cual sea el estado)
+    cola_trabajos.olvidar(trabajo_cola.id)
+    if trabajo_cola.estado == COMPLETADO:
+        resultado = trabajo_cola.resultado
+        # el render anterior (y sus frames) queda sujeto a la cuota de la sesión
+        if st.session_state.get("almacen_frames") is not None:
+            st.session_state["almacen_frames"].limpiar()
+        st.session_state["trabajo_render"] = pendiente["espacio"]
+        st.session_state["almacen_frames"] = resultado["almacen"]
+        st.session_state["timeline"] = resultado["timeline"]
+        st.session_state["ruta_audio"] = pendiente["ruta_audio"]
+        st.session_state["proyecto_render"] = pendiente["proyecto"]
+        st.session_state["render_borrador"] = resultado["borrador"]
+        st.session_state["perfil_codificacion"] = resultado["perfil_codificacion"]
+        st.session_state["medicion_render"] = resultado["medicion"]
+        for aviso in resultado["avisos"]:
+            st.warning(aviso)
+
+        st.session_state["video_generado_path"] = resultado["video_path"]
+        st.session_state["frames_paths"] = resultado["frames_paths"]
+        st.session_state["titulos_state"] = resultado["titulos_state"]
+        st.session_state["video_con_titulos_path"] = resultado.get("video_con_titulos_path")
+        st.success("¡Vídeo generado con los títulos por defecto! Ahora puedes ajustarlos y volver a incrustarlos.")
+    elif trabajo_cola.estado == ERROR:
+        st.error(f"No se pudo generar el vídeo: {trabajo_cola.error}")
+    else:
+        st.info("Generación cancelada.")
+mostrar_progreso("render_pendiente")
+if st.session_state.get("medicion_render"):
+    mostrar_medicion(st.session_state["medicion_render"], "⏱️ Tiempos del render")
 
-	# Combinar sobre la imagen original
-	result = Image.alpha_composite(img, canvas).convert("RGB")
-	return result
 
 # --- Nueva UI: configuración a la izquierda, vista previa a la derecha ---
 if st.session_state["video_generado_path"]:
@@ -963,73 +378,95 @@ if st.session_state["video_generado_path"]:
 	with col_preview:
 		st.subheader("Vista previa")
 		frame_path = frames_paths[st.session_state["selected_frame"]]
+		almacen = st.session_state["almacen_frames"]
 		current = st.session_state["titulos_state"][st.session_state["selected_frame"]]
-		img_preview = superponer_titulos_en_frame(
-			frame_path,
-			current["titulo"],
-			current["subtitulo"],
-			current["pos_y"],
-			current["tamano"],
-			current["color"],
-			current["pos_sub_y"],
-			current["tamano_sub"],
-			current["color_sub"],
-			current.get("angle",0),
-			current.get("angle_sub",0),
-			blur=current.get("blur", False),
-			blur_minors=current.get("blur_minors", False),
-			blur_strength=current.get("blur_strength", 15),
-			minors_threshold=current.get("minors_threshold", 0.12),
-			style_apply = current.get("use_style", False),
-			style_prompt = current.get("style_prompt", "") or st.session_state.get("global_style_prompt","")
-		)
-		tmp = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-		img_preview.save(tmp.name)
-		st.image(tmp.name, caption=f"Preview foto {st.session_state['selected_frame']+1}", use_container_width=True)
+		# proxy reducido con difuminado/estilo memorizados: solo se recomponen los textos
+		vista_previa = st.session_state.get("vista_previa")
+		if vista_previa is None or vista_previa.almacen is not almacen:
+			vista_previa = st.session_state["vista_previa"] = VistaPrevia(almacen)
+		img_preview = vista_previa.renderizar(frame_path, current, st.session_state.get("global_style_prompt", ""))
+		st.image(img_preview, caption=f"Preview foto {st.session_state['selected_frame']+1}", use_container_width=True)
 
 	# Botón para incrustar títulos en todo el vídeo
 	if st.button("🎬 Incrustar títulos en el vídeo final"):
-		with st.spinner("Incrustando títulos en el vídeo..."):
-			from moviepy.video.io.VideoFileClip import VideoFileClip
-			from moviepy.video.VideoClip import ImageClip as MPImageClip
-			video = VideoFileClip(st.session_state["video_generado_path"])
-			clips = []
-			duracion_foto = video.duration / len(frames_paths)
-			for i, frame_path in enumerate(frames_paths):
-				t = titulos_state[i]
-				img_con_titulo = superponer_titulos_en_frame(
-					frame_path,
-					t["titulo"],
-					t["subtitulo"],
-					t["pos_y"],
-					t["tamano"],
-					t["color"],
-					t["pos_sub_y"],
-					t["tamano_sub"],
-					t["color_sub"],
-					t.get("angle",0),
-					t.get("angle_sub",0),
-					blur=t.get("blur",False),
-					blur_minors=t.get("blur_minors",False),
-					blur_strength=t.get("blur_strength",15),
-					minors_threshold=t.get("minors_threshold",0.12),
-					style_apply = t.get("use_style", False),
-					style_prompt = t.get("style_prompt","") or st.session_state.get("global_style_prompt","")
-				)
-				temp_img_path = os.path.join("temp_files", f"final_frame_{i}_{uuid.uuid4()}.png")
-				img_con_titulo.save(temp_img_path)
-				clips.append(MPImageClip(temp_img_path, duration=duracion_foto))
-			video_final_con_titulos = concatenate_videoclips(clips, method="compose")
-			# Mantener audio original si existe
-			if video.audio:
-				video_final_con_titulos.audio = video.audio
-			video_con_titulos_path = os.path.join("temp_files", "video_con_titulos.mp4")
-			video_final_con_titulos.write_videofile(video_con_titulos_path, codec='libx264', audio_codec='aac', fps=24)
-			with open(video_con_titulos_path, "rb") as f:
-				st.video(f.read())
+		if st.session_state.get("titulos_pendiente"):
+			st.session_state["titulos_pendiente"]["trabajo"].cancelar()
+		# el trabajo del render sigue en uso (fotos, frames y audio): no se expulsa
+		trabajo_titulos = espacio_sesion.trabajo("titulos", protegidos=_trabajos_en_uso())
+		medicion_titulos = Medicion("titulos", directorio=trabajo_titulos.directorio)
+		st.session_state["titulos_pendiente"] = {
+			"trabajo": cola_trabajos.enviar(
+				incrustar_titulos,
+				list(frames_paths),
+				copy.deepcopy(titulos_state),
+				st.session_state["timeline"],
+				trabajo_titulos.ruta("video_con_titulos.mp4"),
+				st.session_state["almacen_frames"],
+				audio=st.session_state.get("ruta_audio"),
+				estilo_prompt_global=st.session_state.get("global_style_prompt", ""),
+				temp_dir=trabajo_titulos.directorio,
+				cache=obtener_cache(os.path.join("temp_files", "cache_segmentos")),
+				perfil=st.session_state.get("perfil_codificacion"),
+				medicion=medicion_titulos,
+				tipo="titulos",
+				espacio=espacio_sesion,
+			),
+			"espacio": trabajo_titulos,
+			"medicion": medicion_titulos,
+		}
+
+	# Tras un borrador: mismo proyecto a resolución completa, con los títulos editados ya incrustados
+	# (los títulos están en coordenadas de 1080x1920, así que la composición es la del borrador)
+	if st.session_state.get("render_borrador") and st.button("🚀 Render final (1080x1920, con títulos)"):
+		if st.session_state.get("render_pendiente"):
+			st.session_state["render_pendiente"]["trabajo"].cancelar()
+		trabajo = st.session_state["trabajo_render"]
+		proyecto_final = dict(
+			st.session_state["proyecto_render"],
+			borrador=False, resolucion=None, fps=None,
+			titulos=copy.deepcopy(titulos_state),
+			escalas=[t.get("scale", 1.0) for t in titulos_state],
+			incrustar_titulos=True,
+			salida=trabajo.ruta("video_final.mp4"),
+		)
+		st.session_state["render_pendiente"] = {
+			"trabajo": cola_trabajos.enviar(renderizar_proyecto, proyecto_final, temp_dir=trabajo.directorio, tipo="render", espacio=espacio_sesion),
+			"espacio": trabajo,
+			"ruta_audio": st.session_state.get("ruta_audio"),
+			"proyecto": proyecto_final,
+		}
+		st.rerun()
+
+	pendiente = st.session_state.get("titulos_pendiente")
+	if pendiente and not pendiente["trabajo"].activo:
+		del st.session_state["titulos_pendiente"]
+		cola_trabajos.olvidar(pendiente["trabajo"].id)
+		if pendiente["trabajo"].estado == COMPLETADO:
+			st.session_state["video_con_titulos_path"] = pendiente["trabajo"].resultado
+			st.session_state["medicion_titulos"] = pendiente["medicion"].informe()
+		elif pendiente["trabajo"].estado == ERROR:
+			st.error(f"No se pudieron incrustar los títulos: {pendiente['trabajo'].error}")
+		else:
+			st.info("Incrustación cancelada.")
+	mostrar_progreso("titulos_pendiente")
+
+	video_con_titulos_path = st.session_state.get("video_con_titulos_path")
+	if video_con_titulos_path and os.path.exists(video_con_titulos_path):
+		servidor = servidor_publico()
+		if servidor is not None:
+			# se sirve desde disco por trozos (con Range): el MP4 no pasa por la memoria de la sesión
+			st.video(servidor.publicar(video_con_titulos_path))
+			st.link_button("📥 Descargar Vídeo con Títulos (MP4)", servidor.url_descarga(video_con_titulos_path))
+		else:
+			# sin URL pública del servidor de archivos: desde el mismo origen que la app, con
+			# una sola copia en memoria del vídeo actual y la descarga leída solo al pulsarla
+			st.video(video_en_memoria(video_con_titulos_path), format="video/mp4")
 			st.download_button(
 				label="📥 Descargar Vídeo con Títulos (MP4)",
-				data=open(video_con_titulos_path, "rb").read(),
+				data=lectura_diferida(video_con_titulos_path),
 				file_name="video_con_titulos.mp4",
 				mime="video/mp4"
-			)
\ No newline at end of file
+			)
+		st.caption(f"Perfil de codificación: {st.session_state.get('perfil_codificacion')}")
+		if st.session_state.get("medicion_titulos"):
+			mostrar_medicion(st.session_state["medicion_titulos"], "⏱️ Tiempos de la incrustación")
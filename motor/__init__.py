@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Motor de render del generador de vídeos verticales.
+
+Contiene todo el procesado de imagen y montaje sin depender de Streamlit, para
+poder usarlo desde la app (app.py) o en lote desde la línea de comandos
+(python -m motor).
+"""
+
+from .medicion import Medicion, etapa, medido
+from .caras import cv2_available, detectar_caras_pil, detectar_caras_lote, es_menor_por_tamano, difuminar_caras_en_pil
+from .estilos import apply_style_effects
+from .textos import TAMANO_REFERENCIA, contiene_emoji, normalizar_color, cargar_fuente, preparar_base, componer_textos, superponer_titulos_en_frame
+from .imagen import ajustar_y_procesar_imagen, fondo_difuminado, crear_collage_general, overlay_two_images
+from .frames import AlmacenFrames
+from .ingesta import ImagenDemasiadoGrande, decodificar_imagen, estimar_bytes_decodificacion
+from .zoom import MOVIMIENTOS, MotorZoom, frames_zoom
+from .clips import crear_clip_zoom_pil, superponer_titulos_en_video
+from .transiciones import TRANSICIONES, frames_transicion
+from .timeline import construir_timeline
+from .perfiles import PERFILES, PERFIL_POR_DEFECTO, perfil_codificacion
+from .audio import preparar_audio, mezclar_audio
+from .codificador import codificar_timeline
+from .renderizador import RenderizadorTimeline
+from .cache_segmentos import CacheSegmentos, obtener_cache
+from .subidas import AlmacenSubidas, obtener_almacen_subidas
+from .espacios import GestorEspacios, EspacioSesion, EspacioTrabajo, obtener_gestor
+from .trabajos import ColaTrabajos, Trabajo, TrabajoCancelado, obtener_cola, configurar_codificaciones
+from .servidor_archivos import ServidorArchivos, obtener_servidor, servidor_publico
+from .vista_previa import VistaPrevia
+from .render import (
+    TAMANO_SALIDA,
+    FPS,
+    TAMANO_BORRADOR,
+    FPS_BORRADOR,
+    SPEC_POR_DEFECTO,
+    normalizar_spec,
+    cargar_spec,
+    titulos_por_defecto,
+    renderizar_proyecto,
+    titular_frame,
+    incrustar_titulos,
+)
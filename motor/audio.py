@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# motor/audio.py — pista de audio decodificada y codificada una sola vez, reutilizable por copia de stream
+
+import os
+import subprocess
+
+from moviepy.config import FFMPEG_BINARY
+
+from .cache_segmentos import clave_contenido, huella_fichero
+from .medicion import medido
+
+
+def clave_audio(ruta, duracion, audio_bitrate):
+    """Clave de la pista preparada: contenido del fichero, duración objetivo y bitrate."""
+    return clave_contenido("audio", huella_fichero(ruta), round(float(duracion), 3), audio_bitrate)
+
+
+@medido("audio")
+def preparar_audio(ruta, duracion, cache=None, temp_dir="temp_files", audio_bitrate="128k"):
+    """
+    Decodifica la música una vez, la repite en bucle y la recorta a duracion
+    segundos, y la codifica a AAC (un MP4 solo de audio). Con cache
+    (CacheSegmentos) la pista se guarda por clave_audio: cualquier render o
+    incrustación posterior con la misma música y duración la reutiliza sin
+    decodificar ni codificar nada. Devuelve la ruta de la pista.
+    """
+    clave = clave_audio(ruta, duracion, audio_bitrate)
+    if cache is not None:
+        existente = cache.obtener(clave)
+        if existente is not None:
+            return existente
+        destino = cache.ruta_temporal()
+    else:
+        destino = os.path.join(temp_dir, f"audio_{clave}.mp4")
+        if os.path.exists(destino):
+            return destino
+    cmd = [
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-stream_loop", "-1", "-i", ruta, "-t", f"{duracion:.3f}",
+        "-vn", "-c:a", "aac", "-b:a", audio_bitrate, "-movflags", "+faststart", destino,
+    ]
+    res = subprocess.run(cmd, stderr=subprocess.PIPE)
+    if res.returncode != 0:
+        if os.path.exists(destino):
+            os.remove(destino)
+        raise RuntimeError(f"ffmpeg falló al preparar el audio {ruta}: {res.stderr.decode(errors='replace').strip()}")
+    return cache.guardar(clave, destino) if cache is not None else destino
+
+
+def mezclar_audio(video, audio, salida):
+    """Une un vídeo sin audio y una pista preparada copiando ambos streams (sin recodificar)."""
+    cmd = [
+        FFMPEG_BINARY, "-y", "-loglevel", "error", "-i", video, "-i", audio,
+        "-map", "0:v:0", "-map", "1:a:0", "-c", "copy", "-shortest", "-movflags", "+faststart", salida,
+    ]
+    res = subprocess.run(cmd, stderr=subprocess.PIPE)
+    if res.returncode != 0:
+        raise RuntimeError(f"ffmpeg falló al añadir el audio a {salida}: {res.stderr.decode(errors='replace').strip()}")
+    return salida
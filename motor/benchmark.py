@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+# motor/benchmark.py — benchmarks por etapa con fotos sintéticas; resultados en JSON para comparar versiones
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from . import caras
+from .caras import cv2_available, detectar_caras_pil
+from .clips import crear_clip_zoom_pil
+from .estilos import apply_style_effects
+from .imagen import ajustar_y_procesar_imagen, crear_collage_general, overlay_two_images
+from .render import TAMANO_SALIDA, renderizar_proyecto
+from .textos import superponer_titulos_en_frame
+
+# (nombre, megapíxeles, aspecto ancho/alto, formato): aspectos mezclados, de 2 a 48 MP, PNG con alfa y JPEG
+FOTOS_SINTETICAS = [
+    ("02mp_4x3.jpg", 2, 4 / 3., "JPEG"),
+    ("04mp_9x16.png", 4, 9 / 16., "PNG"),
+    ("08mp_3x4.jpg", 8, 3 / 4., "JPEG"),
+    ("12mp_16x9.png", 12, 16 / 9., "PNG"),
+    ("24mp_1x1.jpg", 24, 1., "JPEG"),
+    ("48mp_4x3.jpg", 48, 4 / 3., "JPEG"),
+]
+MAX_MP_RAPIDO = 12
+
+PROMPTS_ESTILO = [
+    "vintage sepia grain vignette",
+    "noir contrast",
+    "warm glow",
+    "cool soft",
+    "bright desaturate film",
+]
+
+ETAPAS = ("ajuste", "estilo", "collage", "caras", "titulos", "zoom", "render")
+
+_TITULO_VACIO = {"texto": ""}
+
+
+def _imagen_sintetica(w, h, alfa, rng):
+    """Degradados suaves con algo de ruido: se comprime y decodifica como una foto, no como ruido puro."""
+    base = rng.integers(0, 256, size=(max(2, h // 48), max(2, w // 48), 4 if alfa else 3), dtype=np.uint8)
+    img = Image.fromarray(base).resize((w, h), Image.BICUBIC)
+    ruido = rng.integers(116, 141, size=(max(1, h // 4), max(1, w // 4)), dtype=np.uint8)
+    ruido = np.asarray(Image.fromarray(ruido).resize((w, h), Image.NEAREST), dtype=np.int16) - 128
+    arr = np.asarray(img, dtype=np.int16)
+    arr[..., :3] = np.clip(arr[..., :3] + ruido[..., None], 0, 255)
+    return Image.fromarray(arr.astype(np.uint8))
+
+
+def generar_fotos(directorio, rapido=False, semilla=1234):
+    """
+    Crea (una sola vez) el juego de fotos sintéticas en directorio y devuelve
+    una lista de dicts con ruta, megapixeles y formato.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    rng = np.random.default_rng(semilla)
+    fotos = []
+    for nombre, mp, aspecto, formato in FOTOS_SINTETICAS:
+        if rapido and mp > MAX_MP_RAPIDO:
+            continue
+        ruta = os.path.join(directorio, nombre)
+        if not os.path.exists(ruta):
+            h = int(round((mp * 1e6 / aspecto) ** 0.5))
+            w = int(round(h * aspecto))
+            img = _imagen_sintetica(w, h, formato == "PNG", rng)
+            img.save(ruta, formato, **({"quality": 90} if formato == "JPEG" else {}))
+        fotos.append({"ruta": ruta, "megapixeles": mp, "formato": formato})
+    return fotos
+
+
+def _leer_status(campo):
+    with open("/proc/self/status") as f:
+        for linea in f:
+            if linea.startswith(campo + ":"):
+                return int(linea.split()[1]) * 1024
+    raise KeyError(campo)
+
+
+def _rss_reiniciable():
+    """En Linux el pico de RSS (VmHWM) se puede reiniciar: mide también la memoria de PIL y OpenCV."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        _leer_status("VmHWM")
+        return True
+    except (OSError, KeyError):
+        return False
+
+
+def medir(func, repeticiones=1, memoria=True):
+    """
+    Ejecuta func repeticiones veces y devuelve (segundos por ejecución, la
+    mejor de todas, pico de memoria en MB). El pico se mide en una ejecución
+    aparte para no falsear los tiempos: en Linux es el pico de RSS del proceso
+    durante esa ejecución (incluye los buffers de PIL y OpenCV y la memoria ya
+    ocupada por el proceso); en otros sistemas, el pico de tracemalloc (solo
+    Python y NumPy). No cuenta los workers del pool.
+    """
+    mejor = None
+    for _ in range(max(1, repeticiones)):
+        t0 = time.perf_counter()
+        func()
+        duracion = time.perf_counter() - t0
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    pico = None
+    if memoria and _rss_reiniciable():
+        func()
+        pico = _leer_status("VmHWM") / (1024 * 1024.)
+    elif memoria:
+        tracemalloc.start()
+        try:
+            func()
+            pico = tracemalloc.get_traced_memory()[1] / (1024 * 1024.)
+        finally:
+            tracemalloc.stop()
+    return mejor, pico
+
+
+def _resultado(etapa, variante, segundos, pico_mb, n=1, unidad="frames/s"):
+    return {
+        "etapa": etapa,
+        "variante": variante,
+        "n": n,
+        "segundos": round(segundos, 4),
+        "por_segundo": round(n / segundos, 3) if segundos else None,
+        "unidad": unidad,
+        "pico_mb": round(pico_mb, 1) if pico_mb is not None else None,
+    }
+
+
+def _frame_preparado(ruta):
+    return ajustar_y_procesar_imagen(ruta, TAMANO_SALIDA, _TITULO_VACIO)
+
+
+def bench_ajuste(fotos, repeticiones):
+    resultados = []
+    for foto in fotos:
+        for fondo in ("difuminado", "color"):
+            seg, pico = medir(lambda: ajustar_y_procesar_imagen(foto["ruta"], TAMANO_SALIDA, _TITULO_VACIO, fondo_tipo=fondo), repeticiones)
+            resultados.append(_resultado("ajuste", f"{fondo} {foto['megapixeles']}MP {foto['formato']}", seg, pico, unidad="fotos/s"))
+    return resultados
+
+
+def bench_estilo(frames, repeticiones):
+    resultados = []
+    for prompt in PROMPTS_ESTILO:
+        seg, pico = medir(lambda: apply_style_effects(frames[0], prompt), repeticiones)
+        resultados.append(_resultado("estilo", prompt, seg, pico))
+    return resultados
+
+
+def bench_collage(frames, repeticiones):
+    seg, pico = medir(lambda: crear_collage_general(frames[:3], tamaño=TAMANO_SALIDA), repeticiones)
+    resultados = [_resultado("collage", f"collage {min(3, len(frames))} fotos", seg, pico)]
+    seg, pico = medir(lambda: overlay_two_images(frames[0], frames[1 % len(frames)], tamaño=TAMANO_SALIDA), repeticiones)
+    resultados.append(_resultado("collage", "overlay 2 fotos", seg, pico))
+    return resultados
+
+
+def bench_caras(frames, repeticiones):
+    if not cv2_available:
+        return []
+    arr = np.asarray(frames[0].convert("RGB"))
+
+    def _detectar():
+        caras._caras_cache.clear()  # medir la detección, no la caché por contenido
+        detectar_caras_pil(arr)
+    seg, pico = medir(_detectar, repeticiones)
+    return [_resultado("caras", "haarcascade 1080x1920", seg, pico)]
+
+
+def bench_titulos(frames, repeticiones):
+    arr = np.asarray(frames[0].convert("RGB"))
+    variantes = [("textos", {}), ("textos + estilo", {"style_apply": True, "style_prompt": PROMPTS_ESTILO[0]})]
+    if cv2_available:
+        variantes.append(("textos + difuminado", {"blur": True}))
+    resultados = []
+    for nombre, extra in variantes:
+        def _titular():
+            caras._caras_cache.clear()
+            superponer_titulos_en_frame(arr, "Mis Vacaciones", "Día 1: La llegada", 115, 153, "ffffff", 1689, 86, "ffffff", **extra)
+        seg, pico = medir(_titular, repeticiones)
+        resultados.append(_resultado("titulos", nombre, seg, pico))
+    return resultados
+
+
+def bench_zoom(frames, repeticiones, fps=24, duracion=2.0):
+    def _zoom():
+        clip = crear_clip_zoom_pil(frames[0], duracion, fps=fps)
+        for k in range(int(duracion * fps)):
+            clip.get_frame(k / float(fps))
+    n = int(duracion * fps)
+    seg, pico = medir(_zoom, repeticiones)
+    return [_resultado("zoom", f"{n} frames", seg, pico, n=n)]
+
+
+def bench_render(fotos, escalado, temp_dir, perfil=None, procesos=None):
+    """Render completo (preparación + codificación, sin caché) con 1..n fotos: mide el escalado."""
+    resultados = []
+    for n in escalado:
+        rutas = [fotos[k % len(fotos)]["ruta"] for k in range(n)]
+        spec = {
+            "fotos": rutas, "titulo": "Benchmark", "incrustar_titulos": True,
+            "cache_segmentos": False, "cache_frames": False, "perfil_codificacion": perfil, "procesos": procesos,
+            "salida": os.path.join(temp_dir, f"benchmark_{n}.mp4"),
+        }
+        info = {}
+
+        def _render():
+            res = renderizar_proyecto(spec, temp_dir=temp_dir)
+            info["timeline"], info["medicion"] = res["timeline"], res["medicion"]
+        seg, pico = medir(_render, 1)
+        total = info["timeline"]["total"]
+        resultado = _resultado("render", f"{n} fotos", seg, pico, n=total)
+        resultado["fotos"] = n
+        resultado["etapas"] = info["medicion"]["etapas"]
+        resultados.append(resultado)
+    return resultados
+
+
+def _version():
+    try:
+        res = subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return res.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _rss_max_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    factor = 1024 * 1024. if sys.platform == "darwin" else 1024.  # bytes en macOS, KB en Linux
+    return round(max(propio, hijos) / factor, 1)
+
+
+def ejecutar(etapas=ETAPAS, directorio="temp_files/benchmark", rapido=False, repeticiones=3, escalado=(2, 4, 8), perfil=None, procesos=None, informar=print):
+    """Ejecuta las etapas pedidas y devuelve el informe (dict serializable a JSON)."""
+    fotos = generar_fotos(os.path.join(directorio, "fotos"), rapido=rapido)
+    frames = [_frame_preparado(f["ruta"]) for f in fotos[:3]]
+    resultados = []
+    for etapa in etapas:
+        informar(f"[{etapa}]")
+        if etapa == "ajuste":
+            nuevos = bench_ajuste(fotos, repeticiones)
+        elif etapa == "estilo":
+            nuevos = bench_estilo(frames, repeticiones)
+        elif etapa == "collage":
+            nuevos = bench_collage(frames, repeticiones)
+        elif etapa == "caras":
+            nuevos = bench_caras(frames, repeticiones)
+        elif etapa == "titulos":
+            nuevos = bench_titulos(frames, repeticiones)
+        elif etapa == "zoom":
+            nuevos = bench_zoom(frames, repeticiones)
+        elif etapa == "render":
+            nuevos = bench_render(fotos, escalado, directorio, perfil, procesos)
+        else:
+            raise ValueError(f"Etapa desconocida: {etapa}")
+        for r in nuevos:
+            informar(f"  {r['variante']:<40} {r['segundos']:>9.4f}s {r['por_segundo'] or 0:>9.2f} {r['unidad']:<8} pico {r['pico_mb']} MB")
+        resultados += nuevos
+    return {
+        "version": _version(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "opencv": cv2_available,
+        "rapido": rapido,
+        "repeticiones": repeticiones,
+        "rss_max_mb": _rss_max_mb(),
+        "resultados": resultados,
+    }
+
+
+def comparar(actual, anterior, informar=print):
+    """Muestra la variación de velocidad de cada medida respecto a un informe anterior."""
+    previos = {(r["etapa"], r["variante"]): r for r in anterior["resultados"]}
+    informar(f"Comparación con {anterior.get('version')} ({anterior.get('fecha')}):")
+    for r in actual["resultados"]:
+        previo = previos.get((r["etapa"], r["variante"]))
+        if not previo or not previo["segundos"]:
+            continue
+        cambio = previo["segundos"] / r["segundos"] if r["segundos"] else float("inf")
+        informar(f"  {r['etapa']:<8} {r['variante']:<40} {previo['segundos']:>9.4f}s -> {r['segundos']:>9.4f}s  x{cambio:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m motor.benchmark",
+        description="Mide cada etapa del render con fotos sintéticas y guarda los resultados en JSON."
+    )
+    parser.add_argument("--salida", default="benchmark.json", help="Fichero JSON de resultados (por defecto: benchmark.json)")
+    parser.add_argument("--directorio", default=os.path.join("temp_files", "benchmark"), help="Directorio de fotos sintéticas y vídeos temporales")
+    parser.add_argument("--etapas", default=",".join(ETAPAS), help=f"Etapas separadas por comas (por defecto: {','.join(ETAPAS)})")
+    parser.add_argument("--rapido", action="store_true", help=f"Solo fotos de hasta {MAX_MP_RAPIDO} MP, una repetición y render con 2 y 4 fotos")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Repeticiones por medida (se guarda la mejor)")
+    parser.add_argument("--escalado", default="2,4,8", help="Número de fotos de los renders completos (por defecto: 2,4,8)")
+    parser.add_argument("--perfil", default=None, help="Perfil de codificación del render completo")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos para preparar frames en el render completo")
+    parser.add_argument("--comparar", default=None, help="JSON de un benchmark anterior con el que comparar")
+    args = parser.parse_args(argv)
+
+    escalado = [2, 4] if args.rapido else [int(n) for n in args.escalado.split(",") if n.strip()]
+    informe = ejecutar(
+        etapas=[e.strip() for e in args.etapas.split(",") if e.strip()],
+        directorio=args.directorio,
+        rapido=args.rapido,
+        repeticiones=1 if args.rapido else args.repeticiones,
+        escalado=escalado,
+        perfil=args.perfil,
+        procesos=args.procesos,
+    )
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            comparar(informe, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
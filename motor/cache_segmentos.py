@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# motor/cache_segmentos.py — caché en disco de segmentos codificados, direccionada por contenido
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+
+def clave_contenido(*partes):
+    """Hash estable (hex) de datos JSON-serializables."""
+    datos = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(datos.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def huella_datos(datos):
+    """Hash (hex) de un contenido en memoria; coincide con huella_fichero del mismo contenido."""
+    return hashlib.blake2b(datos, digest_size=20).hexdigest()
+
+
+_huellas_ficheros = {}
+
+
+def _firma(ruta):
+    st = os.stat(ruta)
+    return (os.path.abspath(ruta), st.st_size, st.st_mtime_ns)
+
+
+def registrar_huella(ruta, huella):
+    """Memoriza la huella de un fichero recién escrito cuyo hash ya se conoce."""
+    _huellas_ficheros[_firma(ruta)] = huella
+
+
+def huella_fichero(ruta, tamano_bloque=1024 * 1024):
+    """
+    Hash (hex) del contenido de un fichero. Se memoriza por ruta, tamaño y
+    fecha de modificación, así que el mismo fichero solo se lee una vez por proceso.
+    """
+    firma = _firma(ruta)
+    huella = _huellas_ficheros.get(firma)
+    if huella is None:
+        h = hashlib.blake2b(digest_size=20)
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(tamano_bloque), b""):
+                h.update(bloque)
+        huella = _huellas_ficheros[firma] = h.hexdigest()
+    return huella
+
+
+class CacheSegmentos:
+    """
+    Guarda cada segmento codificado (hold, transición, zoom) como <clave>.mp4.
+    La clave resume todas sus entradas, así que un segmento existente se puede
+    reutilizar tal cual en la concatenación final. El tamaño total se limita a
+    max_bytes expulsando primero los segmentos usados hace más tiempo (LRU por mtime).
+    Con otra extensión sirve para cualquier resultado por clave (p.ej. frames
+    preparados en .npy). Las claves reservadas por un trabajo en curso
+    (reservar) no se expulsan, las recorte quien las recorte.
+    """
+
+    def __init__(self, directorio, max_bytes=2 * 1024 ** 3, extension=".mp4"):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self._lock = threading.Lock()
+        self._en_uso = {}
+        os.makedirs(directorio, exist_ok=True)
+
+    def ruta(self, clave):
+        return os.path.join(self.directorio, clave + self.extension)
+
+    def obtener(self, clave):
+        """Ruta del segmento si está en caché (y lo marca como usado), o None."""
+        ruta = self.ruta(clave)
+        try:
+            os.utime(ruta)
+        except OSError:
+            return None
+        return ruta
+
+    def ruta_temporal(self):
+        """Ruta donde codificar un segmento nuevo antes de publicarlo con guardar()."""
+        return os.path.join(self.directorio, f".tmp_{uuid.uuid4().hex}{self.extension}")
+
+    def guardar(self, clave, ruta_temporal):
+        """Publica un segmento de forma atómica y devuelve su ruta definitiva."""
+        ruta = self.ruta(clave)
+        os.replace(ruta_temporal, ruta)
+        return ruta
+
+    @contextmanager
+    def reservar(self, claves):
+        """Mientras dura el bloque, ningún recortar() del proceso expulsa estas claves (entre obtener() y su uso)."""
+        rutas = [self.ruta(c) for c in claves]
+        with self._lock:
+            for ruta in rutas:
+                self._en_uso[ruta] = self._en_uso.get(ruta, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                for ruta in rutas:
+                    self._en_uso[ruta] -= 1
+                    if not self._en_uso[ruta]:
+                        del self._en_uso[ruta]
+
+    def recortar(self, protegidas=()):
+        """Expulsa segmentos LRU hasta quedar por debajo de max_bytes (salvo las claves protegidas o reservadas)."""
+        protegidas = {self.ruta(c) for c in protegidas}
+        with self._lock:
+            protegidas.update(self._en_uso)
+            entradas = []
+            total = 0
+            for nombre in os.listdir(self.directorio):
+                if not nombre.endswith(self.extension) or nombre.startswith(".tmp_"):
+                    continue
+                ruta = os.path.join(self.directorio, nombre)
+                try:
+                    st = os.stat(ruta)
+                except OSError:
+                    continue
+                entradas.append((st.st_mtime, st.st_size, ruta))
+                total += st.st_size
+            for _, tamano, ruta in sorted(entradas):
+                if total <= self.max_bytes:
+                    break
+                if ruta in protegidas:
+                    continue
+                try:
+                    os.remove(ruta)
+                    total -= tamano
+                except OSError:
+                    pass
+            return total
+
+
+_caches = {}
+
+
+def obtener_cache(directorio, max_mb=2048, extension=".mp4"):
+    """Caché compartida por directorio dentro del proceso (entre renders y sesiones)."""
+    clave = os.path.abspath(directorio)
+    cache = _caches.get(clave)
+    if cache is None:
+        cache = _caches[clave] = CacheSegmentos(clave, int(max_mb * 1024 * 1024), extension)
+    cache.max_bytes = int(max_mb * 1024 * 1024)
+    return cache
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# motor/caras.py — detección y difuminado de caras (OpenCV opcional)
+
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import ImageFilter
+
+from .frames import a_array_rgb, huella_array
+from .medicion import medido
+from .paralelo import mapear
+
+# --- intento de importar OpenCV / numpy ---
+try:
+    import cv2
+    import numpy as np
+    cv2_available = True
+    _haarcascade_path = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+    if not os.path.exists(_haarcascade_path):
+        _haarcascade_path = None
+except Exception:
+    cv2 = None
+    np = None
+    cv2_available = False
+    _haarcascade_path = None
+
+
+# Clasificador único por proceso (se crea al primer uso; en los workers del pool, uno por worker)
+_cascade = None
+_cascade_lock = threading.Lock()
+
+# Caché LRU de detecciones: (huella de la imagen, lado_max) -> boxes
+_caras_cache = OrderedDict()
+# la caché se usa desde los hilos de la cola de trabajos y desde el de la app (vista previa)
+_caras_cache_lock = threading.Lock()
+_CARAS_CACHE_MAX = 512
+
+# Lado mayor de la copia reducida sobre la que se detecta
+LADO_MAX_DETECCION = 960
+
+
+def _obtener_cascade():
+    global _cascade
+    if _cascade is None:
+        _cascade = cv2.CascadeClassifier(_haarcascade_path)
+    return _cascade
+
+
+@medido("caras")
+def _detectar_en_array(arr, lado_max=LADO_MAX_DETECCION):
+    """Detecta sobre una copia en gris reducida y devuelve boxes a resolución completa."""
+    gray = cv2.cvtColor(np.ascontiguousarray(arr), cv2.COLOR_RGB2GRAY)
+    h, w = gray.shape[:2]
+    escala = min(1.0, float(lado_max) / max(h, w))
+    if escala < 1.0:
+        gray = cv2.resize(gray, (max(1, int(w * escala)), max(1, int(h * escala))), interpolation=cv2.INTER_AREA)
+    # el tamaño mínimo de cara (30px a resolución completa) se escala con la imagen; 24px es el mínimo del Haarcascade
+    min_lado = max(24, int(round(30 * escala)))
+    with _cascade_lock:
+        faces = _obtener_cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(min_lado, min_lado))
+    if not len(faces):
+        return []
+    return [[int(round(v / escala)) for v in box] for box in faces.tolist()]
+
+
+def _cache_guardar(clave, boxes):
+    with _caras_cache_lock:
+        _caras_cache[clave] = boxes
+        _caras_cache.move_to_end(clave)
+        while len(_caras_cache) > _CARAS_CACHE_MAX:
+            _caras_cache.popitem(last=False)
+
+
+def _cache_obtener(clave):
+    """Boxes memorizadas (y las marca como recientes), o None."""
+    with _caras_cache_lock:
+        boxes = _caras_cache.get(clave)
+        if boxes is not None:
+            _caras_cache.move_to_end(clave)
+        return boxes
+
+
+def detectar_caras_pil(img_pil, lado_max=LADO_MAX_DETECCION):
+    """
+    Devuelve lista de boxes (x,y,w,h) usando Haarcascade sobre imagen PIL (o ndarray RGB).
+    Si OpenCV no está disponible devuelve [].
+    El resultado se memoriza por contenido de la imagen: repetir la detección
+    sobre el mismo frame (vista previa, incrustado) no vuelve a ejecutar OpenCV.
+    """
+    if not cv2_available or _haarcascade_path is None:
+        return []
+    arr = a_array_rgb(img_pil)
+    clave = (huella_array(arr), lado_max)
+    boxes = _cache_obtener(clave)
+    if boxes is None:
+        boxes = _detectar_en_array(arr, lado_max)
+        _cache_guardar(clave, boxes)
+    return [list(b) for b in boxes]
+
+
+def _detectar_trabajo(arr):
+    return _detectar_en_array(arr)
+
+
+def detectar_caras_lote(imagenes, procesos=None):
+    """
+    Detecta caras en varias imágenes repartiendo las que no están en caché
+    entre los procesos del pool. Devuelve las boxes en el mismo orden y deja
+    los resultados en la caché para detectar_caras_pil.
+    """
+    if not cv2_available or _haarcascade_path is None:
+        return [[] for _ in imagenes]
+    arrays = [a_array_rgb(img) for img in imagenes]
+    claves = [(huella_array(arr), LADO_MAX_DETECCION) for arr in arrays]
+    encontrados = {}
+    pendientes = {}
+    for clave, arr in zip(claves, arrays):
+        boxes = _cache_obtener(clave)
+        if boxes is not None:
+            encontrados[clave] = boxes
+        elif clave not in pendientes:
+            pendientes[clave] = arr
+    if pendientes:
+        resultados = mapear(_detectar_trabajo, list(pendientes.values()), procesos)
+        for clave, boxes in zip(pendientes, resultados):
+            _cache_guardar(clave, boxes)
+            encontrados[clave] = boxes
+    return [[list(b) for b in encontrados[clave]] for clave in claves]
+
+
+def es_menor_por_tamano(face_box, img_size, threshold_ratio):
+    """
+    Heurística: si la altura de la cara < threshold_ratio * altura_imagen => considerar menor.
+    """
+    x, y, w, h = face_box
+    _, h_img = img_size
+    return (h / float(h_img)) < float(threshold_ratio)
+
+
+@medido("difuminado_caras")
+def difuminar_caras_en_pil(img_pil, boxes, blur_radius=15, expand_factor=0.25):
+    """
+    Aplica GaussianBlur sobre cada box (con margen expand_factor).
+    """
+    if not boxes:
+        return img_pil
+    img = img_pil.convert("RGBA")
+    for (x, y, w, h) in boxes:
+        exp_w = int(w * expand_factor)
+        exp_h = int(h * expand_factor)
+        x0 = max(0, x - exp_w)
+        y0 = max(0, y - exp_h)
+        x1 = min(img.width, x + w + exp_w)
+        y1 = min(img.height, y + h + exp_h)
+        region = img.crop((x0, y0, x1, y1))
+        region = region.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+        img.paste(region, (x0, y0), region)
+    return img
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# motor/cli.py — render en lote de un directorio de proyectos JSON en un único proceso
+
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+
+from .perfiles import PERFILES
+from .render import cargar_spec, renderizar_proyecto
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m motor",
+        description="Renderiza todos los proyectos *.json de un directorio (o ficheros sueltos)."
+    )
+    parser.add_argument("entradas", nargs="+", help="Directorios con proyectos .json o ficheros .json")
+    parser.add_argument("--salida", default="salida", help="Directorio de los MP4 generados (por defecto: salida)")
+    parser.add_argument("--temp", default="temp_files", help="Directorio de ficheros temporales (por defecto: temp_files)")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos para preparar frames (por defecto: todos los núcleos)")
+    parser.add_argument("--titulos", action="store_true", help="Incrustar títulos aunque el proyecto no lo pida")
+    parser.add_argument("--borrador", action="store_true", help="Render de prueba a baja resolución y pocos fps")
+    parser.add_argument("--perfilado", default=None, help="Captura cprofile, tracemalloc o ambas (separadas por comas); se guarda en el log de tiempos")
+    parser.add_argument("--perfil", choices=sorted(PERFILES), default=None, help="Perfil de codificación (por defecto: el del proyecto)")
+    args = parser.parse_args(argv)
+    # tiempos por etapa de cada render: una línea JSON por proyecto en stderr
+    logging.basicConfig(format="%(message)s")
+    logging.getLogger("motor.medicion").setLevel(logging.INFO)
+
+    specs = []
+    for entrada in args.entradas:
+        if os.path.isdir(entrada):
+            specs += sorted(glob.glob(os.path.join(entrada, "*.json")))
+        else:
+            specs.append(entrada)
+    if not specs:
+        print("No se encontraron proyectos .json", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.salida, exist_ok=True)
+    fallos = 0
+    for ruta_spec in specs:
+        nombre = os.path.splitext(os.path.basename(ruta_spec))[0]
+        t0 = time.perf_counter()
+        try:
+            proyecto = cargar_spec(ruta_spec)
+            if not proyecto["salida"]:
+                proyecto["salida"] = os.path.join(args.salida, nombre + ".mp4")
+            if args.procesos:
+                proyecto["procesos"] = args.procesos
+            if args.titulos:
+                proyecto["incrustar_titulos"] = True
+            if args.borrador:
+                proyecto["borrador"] = True
+                proyecto["resolucion"] = proyecto["fps"] = proyecto["perfil_codificacion"] = None
+            if args.perfilado:
+                proyecto["perfilado"] = args.perfilado
+            if args.perfil:
+                proyecto["perfil_codificacion"] = args.perfil
+            resultado = renderizar_proyecto(proyecto, temp_dir=args.temp)
+        except Exception as e:
+            fallos += 1
+            print(f"[ERROR] {ruta_spec}: {e}", file=sys.stderr)
+            continue
+        for aviso in resultado["avisos"]:
+            print(f"[AVISO] {ruta_spec}: {aviso}", file=sys.stderr)
+        final = resultado.get("video_con_titulos_path") or resultado["video_path"]
+        print(f"[OK] {ruta_spec} -> {final} ({resultado['perfil_codificacion']}, {time.perf_counter() - t0:.1f}s)")
+    print(f"{len(specs) - fallos}/{len(specs)} proyectos renderizados.")
+    return 1 if fallos else 0
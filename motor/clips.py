@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# motor/clips.py — clips de MoviePy generados a partir de frames
+
+import numpy as np
+from moviepy.video.VideoClip import VideoClip
+
+from .frames import abrir_imagen
+from .perfiles import parametros_moviepy
+from .zoom import MOVIMIENTO_POR_DEFECTO, MotorZoom, escala_minima
+
+
+def crear_clip_zoom_pil(imagen_path, duracion, factor_zoom=0.1, fps=24, movimiento=MOVIMIENTO_POR_DEFECTO):
+    """
+    Genera un clip de zoom (por defecto zoom-in del 20% al 100%) con MotorZoom:
+    una transformación afín por frame sobre una pirámide precalculada.
+    imagen_path puede ser una ruta, una imagen PIL o un ndarray.
+    movimiento: uno de zoom.MOVIMIENTOS (in, out, kenburns-in, pan-izquierda...).
+    """
+    motor_zoom = MotorZoom(abrir_imagen(imagen_path, "RGB"), escala_minima(movimiento))
+
+    def make_frame(t):
+        # MoviePy puede conservar el frame devuelto: cada uno va en su propio array
+        return motor_zoom.frame_movimiento(movimiento, t / duracion, salida=np.empty((motor_zoom.h, motor_zoom.w, 3), np.uint8))
+
+    return VideoClip(make_frame, duration=duracion)
+
+
+def superponer_titulos_en_video(video_path, output_path, titulos, pos_y, tamano, color, pos_sub_y, tamano_sub, color_sub, perfil=None):
+    # Importar submódulos concretos (evita dependencias de moviepy.editor)
+    from moviepy.video.io.VideoFileClip import VideoFileClip
+    from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
+    try:
+        from moviepy.video.VideoClip import TextClip
+    except Exception:
+        TextClip = None
+
+    video = VideoFileClip(video_path)
+    clips = [video]
+
+    # Si TextClip no está disponible, no añadimos clips de texto (se puede usar la ruta de frames/PIL)
+    if TextClip is not None:
+        for i, (titulo, subtitulo) in enumerate(titulos):
+            if titulo:
+                txt_clip = TextClip(
+                    titulo,
+                    fontsize=tamano,
+                    color=color,
+                    font="Arial",
+                    method="caption",
+                    size=(video.w - 100, None)
+                ).set_position(("center", pos_y)).set_duration(video.duration)
+                clips.append(txt_clip)
+            if subtitulo:
+                sub_clip = TextClip(
+                    subtitulo,
+                    fontsize=tamano_sub,
+                    color=color_sub,
+                    font="Arial",
+                    method="caption",
+                    size=(video.w - 100, None)
+                ).set_position(("center", pos_sub_y)).set_duration(video.duration)
+                clips.append(sub_clip)
+
+    final = CompositeVideoClip(clips)
+    final.write_videofile(output_path, **parametros_moviepy(perfil, video.fps or 24))
+    video.close()
+    final.close()
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+# motor/codificador.py — codificación por segmentos: imágenes fijas enviadas una sola vez a ffmpeg
+
+import os
+import shutil
+import subprocess
+import uuid
+from contextlib import nullcontext
+
+import numpy as np
+from moviepy.config import FFMPEG_BINARY
+
+from .audio import clave_audio, preparar_audio
+from .medicion import etapa, medido
+from .cache_segmentos import clave_contenido
+from .perfiles import args_perfil, metadatos_perfil, perfil_codificacion
+from .zoom import frames_zoom
+from .timeline import duracion_timeline
+from .trabajos import ranura_codificacion
+from .transiciones import frames_transicion
+
+# Mismos parámetros en todos los segmentos: imprescindible para concatenarlos sin recodificar
+_ARGS_VIDEO = ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-video_track_timescale", "90000"]
+
+
+def _ffmpeg_desde_pipe(w, h, fps, salida, filtros=None, args_video=None):
+    """
+    Lanza ffmpeg leyendo frames RGB crudos por stdin y codificando a salida.
+    args_video: argumentos del codificador añadidos a _ARGS_VIDEO (ver perfiles.args_perfil).
+    """
+    cmd = [
+        FFMPEG_BINARY, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{w}x{h}", "-framerate", str(fps), "-i", "-",
+    ]
+    if filtros:
+        cmd += ["-vf", filtros]
+    cmd += _ARGS_VIDEO + list(args_video or []) + ["-r", str(fps), "-an", salida]
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def _terminar(proc, salida):
+    proc.stdin.close()
+    err = proc.stderr.read()
+    if proc.wait() != 0:
+        raise RuntimeError(f"ffmpeg falló al generar {salida}: {err.decode(errors='replace').strip()}")
+
+
+def codificar_hold(frame, n, fps, salida, args_video=None):
+    """
+    Codifica una imagen fija de n frames enviando un único frame a ffmpeg:
+    el filtro tpad clona el último frame en lugar de recibir n copias por el pipe.
+    """
+    h, w = frame.shape[:2]
+    with etapa("x264"):
+        proc = _ffmpeg_desde_pipe(w, h, fps, salida, filtros=f"tpad=stop_mode=clone:stop={n - 1}", args_video=args_video)
+        proc.stdin.write(np.ascontiguousarray(frame).tobytes())
+        _terminar(proc, salida)
+
+
+def codificar_frames(frames, w, h, fps, salida, args_video=None):
+    """
+    Codifica una secuencia de frames (iterable de ndarray) frame a frame.
+    Se mide por separado generar cada frame ("animacion") y enviarlo a ffmpeg ("x264").
+    """
+    proc = _ffmpeg_desde_pipe(w, h, fps, salida, args_video=args_video)
+    frames = iter(frames)
+    try:
+        while True:
+            with etapa("animacion"):
+                frame = next(frames, None)
+            if frame is None:
+                break
+            with etapa("x264"):
+                proc.stdin.write(np.ascontiguousarray(frame).tobytes())
+    except BaseException:
+        # p.ej. trabajo cancelado mientras se generaban los frames: no dejar ffmpeg colgado
+        proc.kill()
+        proc.wait()
+        raise
+    with etapa("x264"):
+        _terminar(proc, salida)
+
+
+def frames_segmento(seg, obtener_frame, fps):
+    """Genera los frames de un segmento animado (transición o zoom)."""
+    if seg["tipo"] == "transicion":
+        return frames_transicion(obtener_frame(seg["desde"]), obtener_frame(seg["hasta"]), seg["n"], seg["efecto"])
+    return frames_zoom(obtener_frame(seg["frame"]), seg["n"], seg.get("movimiento", "in"))
+
+
+def codificar_segmento(seg, obtener_frame, fps, salida, args_video=None):
+    """
+    Codifica un segmento. Las imágenes de entrada (con títulos, difuminado y
+    estilo si obtener_frame los aplica) se obtienen antes de pedir turno en
+    ranura_codificacion, que solo cubre el proceso de ffmpeg: la interpolación
+    de transiciones y zooms va por el pipe a la vez que se codifica.
+    """
+    indices = [seg["frame"]] if "frame" in seg else [seg["desde"], seg["hasta"]]
+    imagenes = {i: obtener_frame(i) for i in indices}
+    with ranura_codificacion():
+        if seg["tipo"] == "hold":
+            codificar_hold(imagenes[seg["frame"]], seg["n"], fps, salida, args_video)
+        else:
+            h, w = imagenes[indices[0]].shape[:2]
+            codificar_frames(frames_segmento(seg, imagenes.__getitem__, fps), w, h, fps, salida, args_video)
+
+
+@medido("concatenar")
+def concatenar_segmentos(rutas, salida, temp_dir, audio=None, duracion=None, metadatos=None):
+    """
+    Une los segmentos con el demuxer concat y añade la pista de audio ya
+    preparada (audio.preparar_audio), ambos por copia de stream: no se
+    recodifica nada. metadatos se guarda en el campo comment del MP4.
+    """
+    lista = os.path.join(temp_dir, f"concat_{uuid.uuid4().hex}.txt")
+    with open(lista, "w", encoding="utf-8") as f:
+        for ruta in rutas:
+            ruta_abs = os.path.abspath(ruta).replace("'", "'\\''")
+            f.write(f"file '{ruta_abs}'\n")
+    cmd = [FFMPEG_BINARY, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", lista]
+    if audio:
+        cmd += ["-i", audio, "-map", "0:v:0", "-map", "1:a:0"]
+    cmd += ["-c", "copy"]
+    if duracion:
+        cmd += ["-t", f"{duracion:.3f}"]
+    if metadatos:
+        cmd += ["-metadata", f"comment={metadatos}"]
+    cmd += ["-movflags", "+faststart", salida]
+    try:
+        res = subprocess.run(cmd, stderr=subprocess.PIPE)
+        if res.returncode != 0:
+            raise RuntimeError(f"ffmpeg falló al concatenar {salida}: {res.stderr.decode(errors='replace').strip()}")
+    finally:
+        os.remove(lista)
+    return salida
+
+
+def clave_segmento(seg, fps, clave_frame, args_video=None):
+    """Clave de caché de un segmento: parámetros de codificación, tipo, duración, efecto y huella de sus imágenes de entrada."""
+    frames = [seg["frame"]] if "frame" in seg else [seg["desde"], seg["hasta"]]
+    return clave_contenido(
+        _ARGS_VIDEO + list(args_video or []), fps, seg["tipo"], seg["n"], seg.get("efecto"), seg.get("movimiento"),
+        [clave_frame(i) for i in frames]
+    )
+
+
+def codificar_timeline(timeline, obtener_frame, salida, temp_dir="temp_files", audio=None, cache=None, clave_frame=None, precargar=None, progreso=None, perfil=None):
+    """
+    Codifica una línea de tiempo: los holds se envían a ffmpeg una sola vez con
+    su duración y solo las transiciones/zooms se renderizan frame a frame.
+    obtener_frame(i) devuelve el ndarray RGB de la imagen i.
+
+    Con cache (CacheSegmentos) y clave_frame(i) (huella de las entradas de la
+    imagen i), los segmentos ya codificados se reutilizan y solo se codifican
+    los que han cambiado. precargar(indices), si se indica, recibe antes de
+    codificar las imágenes que realmente se van a renderizar (p.ej. para
+    detectar caras en lote solo en esas).
+
+    progreso(etapa, hecho, total), si se indica, recibe los segundos de vídeo
+    ya codificados ("codificar"). Cada segmento espera su turno en
+    ranura_codificacion solo mientras corre su ffmpeg (ver codificar_segmento);
+    la preparación de imágenes, el audio y la concatenación no ocupan turno.
+
+    perfil: nombre del perfil de codificación (perfiles.PERFILES; None = el
+    perfil por defecto). Todos los segmentos se codifican con él, requisito
+    para concatenarlos sin recodificar, y queda anotado en el MP4.
+
+    La música (audio) se decodifica, repite y codifica una sola vez por
+    fichero y duración (preparar_audio, guardada en cache si se indica) y se
+    añade por copia de stream.
+    """
+    fps = timeline["fps"]
+    args_video = args_perfil(perfil, fps)
+    dir_segmentos = os.path.join(temp_dir, f"segmentos_{uuid.uuid4().hex}")
+    os.makedirs(dir_segmentos)
+    usar_cache = cache is not None and clave_frame is not None
+    claves = [clave_segmento(seg, fps, clave_frame, args_video) for seg in timeline["segmentos"]] if usar_cache else []
+    total = duracion_timeline(timeline)
+    audio_bitrate = perfil_codificacion(perfil)["audio_bitrate"]
+    if usar_cache and audio:
+        claves.append(clave_audio(audio, total, audio_bitrate))
+    # reservadas desde ya: otro trabajo que recorte la caché no puede borrar
+    # un segmento entre obtener() y la concatenación
+    with cache.reservar(claves) if usar_cache else nullcontext():
+        try:
+            if precargar is not None:
+                necesarias = set()
+                for k, seg in enumerate(timeline["segmentos"]):
+                    if usar_cache and cache.obtener(claves[k]) is not None:
+                        continue
+                    necesarias.update([seg["frame"]] if "frame" in seg else [seg["desde"], seg["hasta"]])
+                if necesarias:
+                    precargar(sorted(necesarias))
+            avisar = progreso or (lambda *a: None)
+            rutas = []
+            for k, seg in enumerate(timeline["segmentos"]):
+                avisar("codificar", seg["inicio"] / float(fps), total)
+                if usar_cache:
+                    clave = claves[k]
+                    ruta = cache.obtener(clave)
+                    if ruta is None:
+                        tmp = cache.ruta_temporal()
+                        try:
+                            codificar_segmento(seg, obtener_frame, fps, tmp, args_video)
+                        except BaseException:
+                            if os.path.exists(tmp):
+                                os.remove(tmp)
+                            raise
+                        ruta = cache.guardar(clave, tmp)
+                else:
+                    ruta = os.path.join(dir_segmentos, f"{k:05d}.mp4")
+                    codificar_segmento(seg, obtener_frame, fps, ruta, args_video)
+                rutas.append(ruta)
+            pista = None
+            if audio:
+                avisar("audio", total, total)
+                pista = preparar_audio(audio, total, cache, dir_segmentos, audio_bitrate)
+            avisar("concatenar", total, total)
+            return concatenar_segmentos(rutas, salida, temp_dir, audio=pista, duracion=total,
+                                        metadatos=metadatos_perfil(perfil))
+        finally:
+            shutil.rmtree(dir_segmentos, ignore_errors=True)
+            if usar_cache:
+                cache.recortar(protegidas=claves)
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+# motor/espacios.py — espacios de trabajo aislados por sesión y por trabajo, con cuotas de disco
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from .subidas import obtener_almacen_subidas
+
+_MARCA_ACTIVIDAD = ".actividad"
+# Subdirectorio de la sesión con los ficheros subidos (compartido por todos sus trabajos)
+DIRECTORIO_SUBIDAS = "subidas"
+
+
+def tamano_directorio(directorio):
+    """Bytes ocupados por los ficheros de un directorio (recursivo)."""
+    total = 0
+    for raiz, _, ficheros in os.walk(directorio):
+        for nombre in ficheros:
+            try:
+                total += os.path.getsize(os.path.join(raiz, nombre))
+            except OSError:
+                pass
+    return total
+
+
+def _tocar(ruta):
+    with open(ruta, "a"):
+        pass
+    os.utime(ruta)
+
+
+def _ultima_actividad(directorio):
+    try:
+        return os.path.getmtime(os.path.join(directorio, _MARCA_ACTIVIDAD))
+    except OSError:
+        try:
+            return os.path.getmtime(directorio)
+        except OSError:
+            return 0.0
+
+
+class EspacioTrabajo:
+    """
+    Directorio propio de un trabajo (un render, una incrustación de títulos...).
+    Todo lo que genera el trabajo (frames volcados a disco, segmentos
+    temporales, vista previa, vídeo final) se crea dentro de su directorio, así
+    que eliminarlo o expulsarlo por cuota lo libera todo de una vez. Las fotos
+    y la música subidas viven en el almacén de subidas de la sesión
+    (EspacioSesion.subidas()).
+    """
+
+    def __init__(self, directorio, trabajo_id):
+        self.directorio = directorio
+        self.id = trabajo_id
+        os.makedirs(directorio, exist_ok=True)
+        _tocar(os.path.join(directorio, _MARCA_ACTIVIDAD))
+
+    def ruta(self, nombre):
+        """Ruta de un artefacto del trabajo (crea los subdirectorios que falten)."""
+        ruta = os.path.join(self.directorio, nombre)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        return ruta
+
+    def tamano(self):
+        return tamano_directorio(self.directorio)
+
+    def eliminar(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+class EspacioSesion:
+    """
+    Directorio de una sesión de la app: contiene un subdirectorio por trabajo
+    y el de las subidas. La cuota de la sesión (que cuenta también las
+    subidas) se aplica expulsando sus trabajos más antiguos.
+    """
+
+    def __init__(self, gestor, sesion_id):
+        self.gestor = gestor
+        self.id = sesion_id
+        self.directorio = os.path.join(gestor.raiz, sesion_id)
+        os.makedirs(self.directorio, exist_ok=True)
+        self.tocar()
+
+    def tocar(self):
+        """Marca la sesión como activa (protege frente a la limpieza por inactividad)."""
+        _tocar(os.path.join(self.directorio, _MARCA_ACTIVIDAD))
+
+    def en_uso(self):
+        """Contexto durante el que la limpieza del gestor no expulsa la sesión (p.ej. un render en curso)."""
+        return self.gestor.en_uso(self.id)
+
+    def trabajo(self, prefijo="trabajo", protegidos=()):
+        """
+        Crea el espacio de un trabajo nuevo. Antes aplica la cuota de la sesión
+        sin tocar los trabajos protegidos (ids que la sesión sigue usando).
+        """
+        self.tocar()
+        self.aplicar_cuota(protegidos)
+        trabajo_id = f"{prefijo}_{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        return EspacioTrabajo(os.path.join(self.directorio, trabajo_id), trabajo_id)
+
+    def subidas(self):
+        """Almacén de los ficheros subidos en la sesión (por contenido, ver AlmacenSubidas)."""
+        return obtener_almacen_subidas(os.path.join(self.directorio, DIRECTORIO_SUBIDAS))
+
+    def trabajos(self):
+        """Ids de los trabajos de la sesión, del más antiguo al más reciente."""
+        ids = [n for n in os.listdir(self.directorio)
+               if n != DIRECTORIO_SUBIDAS and os.path.isdir(os.path.join(self.directorio, n))]
+        return sorted(ids, key=lambda n: _ultima_actividad(os.path.join(self.directorio, n)))
+
+    def tamano(self):
+        return tamano_directorio(self.directorio)
+
+    def aplicar_cuota(self, protegidos=()):
+        """Expulsa trabajos (los más antiguos primero) hasta quedar bajo la cuota de la sesión."""
+        cuota = self.gestor.cuota_sesion
+        if not cuota:
+            return
+        tamanos = {t: tamano_directorio(os.path.join(self.directorio, t)) for t in self.trabajos()}
+        total = sum(tamanos.values()) + tamano_directorio(os.path.join(self.directorio, DIRECTORIO_SUBIDAS))
+        for trabajo_id, tamano in tamanos.items():
+            if total <= cuota:
+                break
+            if trabajo_id in protegidos:
+                continue
+            shutil.rmtree(os.path.join(self.directorio, trabajo_id), ignore_errors=True)
+            total -= tamano
+
+    def eliminar(self):
+        shutil.rmtree(self.directorio, ignore_errors=True)
+
+
+class GestorEspacios:
+    """
+    Reparte el disco entre sesiones: un directorio por sesión bajo raiz, cuota
+    por sesión, cuota global y expulsión de sesiones inactivas. limpiar() se
+    puede llamar a mano o dejar que lo haga un hilo en segundo plano
+    (iniciar_limpieza).
+    """
+
+    def __init__(self, raiz, cuota_sesion_mb=2048, cuota_global_mb=10240, max_inactividad_s=6 * 3600):
+        self.raiz = os.path.abspath(raiz)
+        self.cuota_sesion = int(cuota_sesion_mb * 1024 * 1024) if cuota_sesion_mb else None
+        self.cuota_global = int(cuota_global_mb * 1024 * 1024) if cuota_global_mb else None
+        self.max_inactividad_s = max_inactividad_s
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._en_uso = {}
+        self._en_uso_lock = threading.Lock()
+        os.makedirs(self.raiz, exist_ok=True)
+
+    def sesion(self, sesion_id=None):
+        """Espacio de la sesión indicada (o de una nueva si sesion_id es None)."""
+        return EspacioSesion(self, sesion_id or uuid.uuid4().hex)
+
+    def sesiones(self):
+        """Ids de las sesiones, de la inactiva hace más tiempo a la más reciente."""
+        ids = [n for n in os.listdir(self.raiz) if os.path.isdir(os.path.join(self.raiz, n))]
+        return sorted(ids, key=lambda n: _ultima_actividad(os.path.join(self.raiz, n)))
+
+    @contextmanager
+    def en_uso(self, sesion_id):
+        """Protege la sesión frente a limpiar() mientras dura el bloque (admite anidamiento)."""
+        with self._en_uso_lock:
+            self._en_uso[sesion_id] = self._en_uso.get(sesion_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._en_uso_lock:
+                self._en_uso[sesion_id] -= 1
+                if not self._en_uso[sesion_id]:
+                    del self._en_uso[sesion_id]
+            try:
+                _tocar(os.path.join(self.raiz, sesion_id, _MARCA_ACTIVIDAD))
+            except OSError:
+                pass
+
+    def limpiar(self, protegidas=()):
+        """
+        Elimina las sesiones inactivas más de max_inactividad_s y, si aun así se
+        supera la cuota global, las menos recientes hasta quedar por debajo.
+        Las sesiones en uso (en_uso(), p.ej. con un render en curso) nunca se
+        expulsan. Devuelve los bytes ocupados tras la limpieza.
+        """
+        with self._en_uso_lock:
+            protegidas = set(protegidas) | set(self._en_uso)
+        with self._lock:
+            ahora = time.time()
+            tamanos = {}
+            for sesion_id in self.sesiones():
+                directorio = os.path.join(self.raiz, sesion_id)
+                if sesion_id not in protegidas and self.max_inactividad_s and ahora - _ultima_actividad(directorio) > self.max_inactividad_s:
+                    shutil.rmtree(directorio, ignore_errors=True)
+                    continue
+                tamanos[sesion_id] = tamano_directorio(directorio)
+            total = sum(tamanos.values())
+            if self.cuota_global:
+                for sesion_id, tamano in tamanos.items():
+                    if total <= self.cuota_global:
+                        break
+                    if sesion_id in protegidas:
+                        continue
+                    shutil.rmtree(os.path.join(self.raiz, sesion_id), ignore_errors=True)
+                    total -= tamano
+            return total
+
+    def iniciar_limpieza(self, intervalo_s=300):
+        """Lanza (una sola vez) un hilo daemon que llama a limpiar() cada intervalo_s segundos."""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+
+        def _bucle():
+            while True:
+                time.sleep(intervalo_s)
+                try:
+                    self.limpiar()
+                except Exception:
+                    pass
+
+        self._hilo = threading.Thread(target=_bucle, name="limpieza-espacios", daemon=True)
+        self._hilo.start()
+
+
+_gestores = {}
+_gestores_lock = threading.Lock()
+
+
+def obtener_gestor(raiz, cuota_sesion_mb=2048, cuota_global_mb=10240, max_inactividad_s=6 * 3600):
+    """Gestor compartido por directorio raíz dentro del proceso, con la limpieza en segundo plano en marcha."""
+    clave = os.path.abspath(raiz)
+    with _gestores_lock:
+        gestor = _gestores.get(clave)
+        if gestor is None:
+            gestor = _gestores[clave] = GestorEspacios(clave, cuota_sesion_mb, cuota_global_mb, max_inactividad_s)
+            gestor.iniciar_limpieza()
+    return gestor
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# motor/estilos.py — efectos de estilo basados en prompt
+
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageEnhance, ImageOps, ImageFilter
+
+from .caras import cv2, cv2_available
+from .frames import TAMANO_REFERENCIA
+from .medicion import medido
+
+# Pesos de luminancia de la conversión "L" de PIL (ITU-R 601-2)
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+_GRIS = np.tile(_LUMA, (3, 1))
+_IDENTIDAD = np.eye(3, dtype=np.float32)
+
+# Efectos que son una transformación afín del color (x -> M x + b): se fusionan en una sola pasada
+_EFECTOS_COLOR = {"noir", "sepia", "warm", "cool", "contrast", "bright", "desaturate"}
+# Efectos tras los cuales la imagen queda opaca (como en la versión con PIL)
+_EFECTOS_OPACOS = {"noir", "warm", "cool", "glow"}
+
+
+@lru_cache(maxsize=256)
+def compilar_estilo(prompt):
+    """
+    Traduce el prompt (palabras clave) a un plan de efectos: tupla ordenada de
+    nombres de efecto. Se calcula una vez por prompt.
+    """
+    if not prompt:
+        return ()
+    p = str(prompt).lower()
+    plan = []
+    if any(k in p for k in ("noir", "black and white", "black&white", "b&w", "bw", "monochrome")):
+        plan.append("noir")
+    if any(k in p for k in ("sepia", "vintage", "retro")):
+        plan.append("sepia")
+    if any(k in p for k in ("warm", "sunny", "sun")):
+        plan.append("warm")
+    if any(k in p for k in ("cool", "blue", "cold")):
+        plan.append("cool")
+    if any(k in p for k in ("soft", "blur", "gentle")):
+        plan.append("soft")
+    if "glow" in p:
+        plan.append("glow")
+    if any(k in p for k in ("grain", "film", "noise")):
+        plan.append("grain")
+    if "vignette" in p:
+        plan.append("vignette")
+    if "contrast" in p:
+        plan.append("contrast")
+    if "bright" in p or "brillo" in p or "brighten" in p:
+        plan.append("bright")
+    if "desaturate" in p or "desaturado" in p:
+        plan.append("desaturate")
+    return tuple(plan)
+
+
+# --- transformaciones de color fusionadas ---
+
+def _componer(M, b, A, c):
+    """Aplica x -> A x + c después de x -> M x + b."""
+    return A @ M, A @ b + c
+
+
+def _tinte(M, b, color, peso):
+    return _componer(M, b, (1.0 - peso) * _IDENTIDAD, peso * np.array(color, dtype=np.float32))
+
+
+def _saturacion(M, b, factor):
+    return _componer(M, b, factor * _IDENTIDAD + (1.0 - factor) * _GRIS, np.zeros(3, np.float32))
+
+
+def _contraste(M, b, factor, media_entrada):
+    # la luminancia media tras M, b se deduce de la media por canal de la entrada
+    media = int(float(_LUMA @ (M @ media_entrada + b)) + 0.5)
+    return _componer(M, b, factor * _IDENTIDAD, np.full(3, (1.0 - factor) * media, np.float32))
+
+
+def _matriz_color(efectos, media_entrada):
+    M = _IDENTIDAD.copy()
+    b = np.zeros(3, np.float32)
+    for efecto in efectos:
+        if efecto == "noir":
+            M, b = _componer(M, b, _GRIS, np.zeros(3, np.float32))
+            M, b = _contraste(M, b, 1.3, media_entrada)
+        elif efecto == "sepia":
+            M, b = _componer(M, b, _GRIS, np.zeros(3, np.float32))
+            M, b = _tinte(M, b, (230, 180, 120), 0.35)
+        elif efecto == "warm":
+            M, b = _saturacion(M, b, 1.1)
+            M, b = _componer(M, b, 1.05 * _IDENTIDAD, np.zeros(3, np.float32))
+            M, b = _tinte(M, b, (255, 140, 50), 0.08)
+        elif efecto == "cool":
+            M, b = _tinte(M, b, (40, 120, 200), 0.08)
+        elif efecto == "contrast":
+            M, b = _contraste(M, b, 1.15, media_entrada)
+        elif efecto == "bright":
+            M, b = _componer(M, b, 1.08 * _IDENTIDAD, np.zeros(3, np.float32))
+        elif efecto == "desaturate":
+            M, b = _saturacion(M, b, 0.5)
+    return M, b
+
+
+# --- primitivas uint8 (OpenCV si está disponible; NumPy/PIL si no) ---
+
+def _media_rgb(rgb):
+    if cv2_available:
+        return np.array(cv2.mean(rgb)[:3], dtype=np.float32)
+    return rgb.reshape(-1, 3).mean(axis=0).astype(np.float32)
+
+
+def _transformar(rgb, M, b):
+    if cv2_available:
+        return cv2.transform(rgb, np.hstack([M, b[:, None]]).astype(np.float32))
+    out = rgb.reshape(-1, 3).astype(np.float32) @ M.T + b
+    return np.clip(out + 0.5, 0, 255).astype(np.uint8).reshape(rgb.shape)
+
+
+def _multiplicar(a, factor):
+    """a * factor / 255 (factor uint8 de la misma forma)."""
+    if cv2_available:
+        return cv2.multiply(a, factor, scale=1.0 / 255)
+    return ((a.astype(np.uint16) * factor + 127) // 255).astype(np.uint8)
+
+
+def _sumar(a, b, peso_a=1.0):
+    """peso_a * a + b con saturación."""
+    if cv2_available:
+        return cv2.addWeighted(a, peso_a, b, 1.0, 0)
+    return np.clip(a.astype(np.float32) * peso_a + b + 0.5, 0, 255).astype(np.uint8)
+
+
+def _desenfocar(a, radio):
+    if cv2_available:
+        return cv2.GaussianBlur(a, (0, 0), radio)
+    return np.asarray(Image.fromarray(a).filter(ImageFilter.GaussianBlur(radius=radio)))
+
+
+def _separar(img):
+    """Imagen PIL -> (rgb uint8, alpha uint8 o None si es opaca)."""
+    if img.mode == "RGB":
+        return np.asarray(img), None
+    rgba = np.asarray(img.convert("RGBA"))
+    if cv2_available:
+        return cv2.cvtColor(rgba, cv2.COLOR_RGBA2RGB), cv2.extractChannel(rgba, 3)
+    return np.ascontiguousarray(rgba[:, :, :3]), np.ascontiguousarray(rgba[:, :, 3])
+
+
+def _unir(rgb, alpha):
+    """(rgb, alpha) -> imagen PIL RGBA."""
+    if alpha is None:
+        if cv2_available:
+            return Image.fromarray(cv2.cvtColor(rgb, cv2.COLOR_RGB2RGBA))
+        return Image.fromarray(rgb).convert("RGBA")
+    if cv2_available:
+        return Image.fromarray(cv2.merge([rgb, alpha]))
+    return Image.fromarray(np.dstack([rgb, alpha]))
+
+
+def _alpha(alpha, rgb):
+    return alpha if alpha is not None else np.full(rgb.shape[:2], 255, np.uint8)
+
+
+@lru_cache(maxsize=8)
+def _mascara_vignette(w, h):
+    """Factores de la viñeta por resolución (uint8): multiplicador RGB, multiplicador alpha y término alpha."""
+    mask = Image.new("L", (w, h), 0)
+    mdraw = ImageDraw.Draw(mask)
+    n = 8
+    for i in range(n):
+        bbox = [int(w * (-0.1 + i * (1.2 / n))), int(h * (-0.1 + i * (1.2 / n))), int(w * (1.1 - i * (1.2 / n))), int(h * (1.1 - i * (1.2 / n)))]
+        if bbox[2] < bbox[0] or bbox[3] < bbox[1]:
+            # a partir de la mitad las cajas se invierten (Pillow reciente lanza ValueError)
+            break
+        alpha = int(255 * (i / (n - 1)) ** 1.5)
+        mdraw.ellipse(bbox, fill=alpha)
+    m = np.asarray(ImageOps.invert(mask), dtype=np.float32) / 255.0
+    # composite(img, composite(img, negro con alpha 180, m), m) desarrollado
+    factor = np.round(255 * m * (2.0 - m)).astype(np.uint8)
+    termino_alpha = np.round(180.0 * (1.0 - m) ** 2).astype(np.uint8)
+    return np.repeat(factor[:, :, None], 3, axis=2), factor, termino_alpha
+
+
+@lru_cache(maxsize=8)
+def _textura_grano(w, h):
+    """Grano gaussiano por resolución, ya atenuado y ponderado al 8% (uint8: RGB y alpha)."""
+    try:
+        noise = ImageEnhance.Brightness(Image.effect_noise((w, h), 64).convert("L")).enhance(0.8)
+    except Exception:
+        return None
+    grano = np.round(np.asarray(noise, dtype=np.float32) * 0.08).astype(np.uint8)
+    return np.repeat(grano[:, :, None], 3, axis=2), grano
+
+
+def aplicar_plan(img_pil, plan):
+    """
+    Ejecuta un plan compilado sobre una imagen PIL y devuelve RGBA.
+    Los efectos de color consecutivos se fusionan en una única matriz 3x4 que
+    se aplica en una pasada; viñeta y grano usan texturas cacheadas por resolución.
+    Los radios de desenfoque están en el espacio de TAMANO_REFERENCIA y se
+    escalan al ancho de la imagen (un borrador se ve igual que el render final).
+    """
+    if not plan:
+        return img_pil.convert("RGBA")
+    w, h = img_pil.size
+    escala = w / float(TAMANO_REFERENCIA[0])
+    # alpha None = imagen opaca (evita arrastrar un canal constante)
+    rgb, alpha = _separar(img_pil if img_pil.mode in ("RGB", "RGBA") else img_pil.convert("RGBA"))
+
+    i = 0
+    while i < len(plan):
+        efecto = plan[i]
+        if efecto in _EFECTOS_COLOR:
+            j = i
+            while j < len(plan) and plan[j] in _EFECTOS_COLOR:
+                j += 1
+            M, b = _matriz_color(plan[i:j], _media_rgb(rgb))
+            rgb = _transformar(rgb, M, b)
+            if any(e in _EFECTOS_OPACOS for e in plan[i:j]):
+                alpha = None
+            i = j
+            continue
+        if efecto == "soft":
+            rgb = _desenfocar(rgb, 2 * escala)
+            if alpha is not None:
+                alpha = _desenfocar(alpha, 2 * escala)
+        elif efecto == "glow":
+            # screen: 255 - (255 - a) * (255 - blur) / 255
+            rgb = 255 - _multiplicar(255 - rgb, 255 - _desenfocar(rgb, 8 * escala))
+            alpha = None
+        elif efecto == "grain":
+            grano = _textura_grano(w, h)
+            if grano is not None:
+                rgb = _sumar(rgb, grano[0], 0.92)
+                alpha = _sumar(_alpha(alpha, rgb), grano[1], 0.92)
+        elif efecto == "vignette":
+            f_rgb, f_alpha, t_alpha = _mascara_vignette(w, h)
+            rgb = _multiplicar(rgb, f_rgb)
+            alpha = _sumar(_multiplicar(_alpha(alpha, rgb), f_alpha), t_alpha)
+        i += 1
+    return _unir(rgb, alpha)
+
+
+@medido("estilo")
+def apply_style_effects(img_pil, prompt):
+    """
+    Aplica efectos simples basados en palabras clave del prompt.
+    Efectos: sepia/vintage, noir/black&white, warm/cool, grain, vignette, soft/blur, glow, contrast, brighten, desaturate.
+    El prompt se compila una vez en un plan (compilar_estilo) que se ejecuta con aplicar_plan.
+    """
+    if not prompt:
+        return img_pil
+    return aplicar_plan(img_pil, compilar_estilo(str(prompt)))
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# motor/frames.py — almacén de frames preparados en memoria (con volcado opcional a disco)
+
+import hashlib
+import os
+import uuid
+
+import numpy as np
+from PIL import Image
+
+from .ingesta import MAX_PIXELES_DECODIFICACION, decodificar_imagen
+
+# Espacio de referencia de títulos y efectos: posiciones, tamaños y radios de
+# difuminado se expresan para un frame de este tamaño y se escalan al ancho real
+TAMANO_REFERENCIA = (1080, 1920)
+
+
+class AlmacenFrames:
+    """
+    Guarda los frames preparados como arrays RGB uint8 y devuelve un handle (str)
+    por frame. Los handles sustituyen a las rutas PNG de temp_files: se evita
+    codificar/decodificar PNG entre etapas.
+
+    Si se indica max_bytes_memoria, los frames que no caben se vuelcan a disco
+    en formato .npy sin comprimir (lectura por mmap, sin decodificar).
+    """
+
+    def __init__(self, directorio="temp_files", max_bytes_memoria=None):
+        self.directorio = directorio
+        self.max_bytes_memoria = max_bytes_memoria
+        self._memoria = {}
+        self._disco = {}
+        self._huellas = {}
+        self._bytes_memoria = 0
+
+    def __contains__(self, handle):
+        return handle in self._memoria or handle in self._disco
+
+    def __len__(self):
+        return len(self._memoria) + len(self._disco)
+
+    def guardar(self, frame, prefijo="frame"):
+        """Añade un frame (PIL o ndarray) y devuelve su handle."""
+        arr = a_array_rgb(frame)
+        handle = f"{prefijo}_{uuid.uuid4().hex}"
+        self._huellas[handle] = huella_array(arr)
+        if self.max_bytes_memoria is not None and self._bytes_memoria + arr.nbytes > self.max_bytes_memoria:
+            os.makedirs(self.directorio, exist_ok=True)
+            ruta = os.path.join(self.directorio, handle + ".npy")
+            np.save(ruta, arr, allow_pickle=False)
+            self._disco[handle] = ruta
+        else:
+            self._memoria[handle] = arr
+            self._bytes_memoria += arr.nbytes
+        return handle
+
+    def array(self, handle):
+        """Frame como ndarray (H, W, 3) uint8, sin copiar si está en memoria."""
+        if handle in self._memoria:
+            return self._memoria[handle]
+        if handle in self._disco:
+            return np.load(self._disco[handle], mmap_mode="r", allow_pickle=False)
+        raise KeyError(handle)
+
+    def imagen(self, handle):
+        """Frame como imagen PIL RGB."""
+        return Image.fromarray(np.asarray(self.array(handle)))
+
+    def huella(self, handle):
+        """Hash del contenido del frame (para claves de caché)."""
+        return self._huellas[handle]
+
+    def tamano(self, handle):
+        h, w = self.array(handle).shape[:2]
+        return (w, h)
+
+    def eliminar(self, handle):
+        arr = self._memoria.pop(handle, None)
+        if arr is not None:
+            self._bytes_memoria -= arr.nbytes
+        self._huellas.pop(handle, None)
+        ruta = self._disco.pop(handle, None)
+        if ruta and os.path.exists(ruta):
+            os.remove(ruta)
+
+    def limpiar(self):
+        for handle in list(self._memoria) + list(self._disco):
+            self.eliminar(handle)
+
+
+def a_array_rgb(frame):
+    """Convierte PIL/ndarray a ndarray RGB uint8 contiguo."""
+    if isinstance(frame, Image.Image):
+        return np.asarray(frame.convert("RGB"))
+    arr = np.asarray(frame)
+    if arr.ndim == 2:
+        arr = np.stack([arr] * 3, axis=-1)
+    elif arr.shape[2] == 4:
+        arr = arr[:, :, :3]
+    return np.ascontiguousarray(arr, dtype=np.uint8)
+
+
+def huella_array(arr):
+    """Hash (hex) de la forma y los píxeles de un ndarray."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr(arr.shape).encode())
+    h.update(np.ascontiguousarray(arr).data)
+    return h.hexdigest()
+
+
+def abrir_imagen(origen, modo="RGBA", tamano_minimo=None, encajar=False, max_pixeles=MAX_PIXELES_DECODIFICACION):
+    """
+    Abre una ruta, o acepta directamente una imagen PIL o un ndarray, y la convierte a modo.
+    Las rutas se decodifican con decodificar_imagen (escala reducida, orientación
+    EXIF y límite de píxeles); tamano_minimo/encajar describen a qué tamaño la
+    va a reducir el llamador.
+    """
+    if isinstance(origen, Image.Image):
+        return origen.convert(modo)
+    if isinstance(origen, np.ndarray):
+        return Image.fromarray(np.asarray(origen)).convert(modo)
+    return decodificar_imagen(origen, modo, tamano_minimo, encajar, max_pixeles)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+# motor/imagen.py — preparación de frames: ajuste al formato vertical, collage y superposición
+
+import math
+from PIL import Image, ImageDraw, ImageFilter
+
+from .frames import abrir_imagen
+from .ingesta import MAX_PIXELES_DECODIFICACION
+from .medicion import medido
+from .textos import TAMANO_REFERENCIA, contiene_emoji, cargar_fuente, normalizar_color
+
+
+# Reducción aplicada antes de difuminar el fondo en el modo rápido
+ESCALA_FONDO_RAPIDO = 8
+
+
+@medido("fondo")
+def fondo_difuminado(img, tamano_salida, radio=30, rapido=True):
+    """
+    Fondo a pantalla completa: la imagen estirada a tamano_salida y muy difuminada.
+
+    En modo rápido se difumina una copia reducida ESCALA_FONDO_RAPIDO veces
+    (con el radio reducido en la misma proporción) y se amplía al final: un
+    desenfoque de radio 30 elimina justo el detalle que se pierde al reducir,
+    así que el resultado es visualmente igual y mucho más barato.
+    """
+    if not rapido:
+        return img.resize(tamano_salida, Image.LANCZOS).filter(ImageFilter.GaussianBlur(radius=radio))
+    w, h = tamano_salida
+    pequeno = (max(1, w // ESCALA_FONDO_RAPIDO), max(1, h // ESCALA_FONDO_RAPIDO))
+    escala = pequeno[0] / float(w)
+    fondo = img.resize(pequeno, Image.BILINEAR, reducing_gap=2.0)
+    fondo = fondo.filter(ImageFilter.GaussianBlur(radius=radio * escala))
+    return fondo.resize(tamano_salida, Image.BICUBIC)
+
+
+def decodifica_encajada(fondo_tipo, fondo_rapido):
+    """
+    Si ajustar_y_procesar_imagen decodifica la foto solo para encajarla en la
+    salida (True) o a tamaño de cubrirla para el fondo estirado (False).
+    """
+    return not (fondo_tipo == "difuminado" and not fondo_rapido)
+
+
+@medido("ajuste")
+def ajustar_y_procesar_imagen(ruta_imagen, tamano_salida, titulo_info, subtitulo_texto=None, fondo_tipo="difuminado", fondo_color="#000000", fondo_rapido=True, max_pixeles=MAX_PIXELES_DECODIFICACION):
+    """
+    Abre una imagen, la redimensiona para que quepa en el formato vertical,
+    crea un fondo según el tipo seleccionado y añade los textos.
+
+    fondo_tipo: "difuminado" o "color"
+    fondo_color: color en formato hex (#RRGGBB) para el fondo si es de tipo "color"
+    fondo_rapido: difuminar el fondo a resolución reducida (ver fondo_difuminado)
+    max_pixeles: límite de píxeles decodificados de la foto (ver decodificar_imagen)
+    """
+    # el difuminado del fondo se ve igual a cualquier resolución de salida
+    radio = 30 * tamano_salida[0] / float(TAMANO_REFERENCIA[0])
+    if not decodifica_encajada(fondo_tipo, fondo_rapido):
+        # el fondo estirado necesita la imagen a tamano_salida en ambos ejes
+        img = abrir_imagen(ruta_imagen, tamano_minimo=tamano_salida, max_pixeles=max_pixeles)
+        fondo = fondo_difuminado(img, tamano_salida, radio, rapido=False)
+    else:
+        img = abrir_imagen(ruta_imagen, tamano_minimo=tamano_salida, encajar=True, max_pixeles=max_pixeles)
+
+    # Una sola decodificación: el primer plano se reduce una vez y, en modo rápido,
+    # el fondo sale de ese mismo primer plano (ya mucho más pequeño que el original)
+    img.thumbnail(tamano_salida, Image.LANCZOS)
+
+    # Crear el fondo según el tipo seleccionado
+    if fondo_tipo == "difuminado":
+        if fondo_rapido:
+            fondo = fondo_difuminado(img, tamano_salida, radio)
+    else:  # fondo_tipo == "color"
+        fondo = Image.new("RGBA", tamano_salida, fondo_color)
+
+    lienzo = Image.new("RGBA", tamano_salida)
+    lienzo.paste(fondo, (0, 0))
+    pos_x = (tamano_salida[0] - img.width) // 2
+    pos_y = (tamano_salida[1] - img.height) // 2
+    lienzo.paste(img, (pos_x, pos_y), img)
+
+    draw = ImageDraw.Draw(lienzo)
+
+    # Añadir Título
+    if titulo_info['texto']:
+        prefer_emoji = contiene_emoji(titulo_info['texto'])
+        fuente_titulo = cargar_fuente(titulo_info.get('tamano', 90), titulo_info.get('fuente_path'), prefer_emoji=prefer_emoji)
+        bbox_titulo = draw.textbbox((0, 0), titulo_info['texto'], font=fuente_titulo)
+        ancho_texto = bbox_titulo[2] - bbox_titulo[0]
+        alto_texto = bbox_titulo[3] - bbox_titulo[1]
+        pos_titulo_x = (tamano_salida[0] - ancho_texto) // 2
+        pos_titulo_y = titulo_info.get('pos_y', 100)  # Usa el valor configurable
+
+        # normalizar colores antes de dibujar
+        _color_sombra = normalizar_color(titulo_info.get('color_sombra', '000000'))
+        _color_texto = normalizar_color(titulo_info.get('color', 'ffffff'))
+
+        draw.text((pos_titulo_x + 3, pos_titulo_y + 3), titulo_info['texto'], font=fuente_titulo, fill=_color_sombra)
+        draw.text((pos_titulo_x, pos_titulo_y), titulo_info['texto'], font=fuente_titulo, fill=_color_texto)
+
+    # Añadir Subtítulo
+    if subtitulo_texto:
+        prefer_emoji_sub = contiene_emoji(subtitulo_texto)
+        fuente_subtitulo = cargar_fuente(titulo_info.get('tamano_sub', 60), titulo_info.get('fuente_path'), prefer_emoji=prefer_emoji_sub)
+        bbox_sub = draw.textbbox((0, 0), subtitulo_texto, font=fuente_subtitulo)
+        ancho_sub = bbox_sub[2] - bbox_sub[0]
+        alto_sub = bbox_sub[3] - bbox_sub[1]
+        pos_sub_x = (tamano_salida[0] - ancho_sub) // 2
+        pos_sub_y = titulo_info.get('pos_sub_y', tamano_salida[1] - alto_sub - 150)  # Usa el valor configurable
+
+        _color_sombra_sub = normalizar_color(titulo_info.get('color_sombra', '000000'))
+        _color_sub = normalizar_color(titulo_info.get('color_sub', 'ffffff'))
+
+        draw.text((pos_sub_x + 2, pos_sub_y + 2), subtitulo_texto, font=fuente_subtitulo, fill=_color_sombra_sub)
+        draw.text((pos_sub_x, pos_sub_y), subtitulo_texto, font=fuente_subtitulo, fill=_color_sub)
+
+    return lienzo.convert("RGB")
+
+
+@medido("collage")
+def crear_collage_general(paths, scales=None, tamaño=TAMANO_REFERENCIA, max_pixeles=MAX_PIXELES_DECODIFICACION):
+    """
+    Crea un collage automático a partir de una lista de rutas o imágenes (PIL/ndarray).
+    - scales: lista de floats con factor de escala por imagen (1.0 = ocupa celda completa).
+    Distribución: grid cuadrada (cols = ceil(sqrt(n))).
+    """
+    if not paths:
+        return Image.new("RGB", tamaño, (0, 0, 0))
+    n = len(paths)
+    w, h = tamaño
+    cols = int(math.ceil(math.sqrt(n)))
+    rows = int(math.ceil(n / float(cols)))
+    cell_w = w // cols
+    cell_h = h // rows
+    canvas = Image.new("RGBA", (w, h), (0, 0, 0, 255))
+    scales = scales or [1.0] * n
+    for idx, p in enumerate(paths):
+        scale = scales[idx] if idx < len(scales) else 1.0
+        target_w = max(10, int(cell_w * scale))
+        target_h = max(10, int(cell_h * scale))
+        try:
+            im = abrir_imagen(p, tamano_minimo=(target_w, target_h), max_pixeles=max_pixeles)
+        except Exception:
+            continue
+        im_resized = im.resize((target_w, target_h), Image.LANCZOS)
+        col = idx % cols
+        row = idx // cols
+        # centrar dentro de la celda
+        x0 = col * cell_w + (cell_w - target_w) // 2
+        y0 = row * cell_h + (cell_h - target_h) // 2
+        canvas.paste(im_resized, (x0, y0), im_resized)
+    return canvas.convert("RGB")
+
+
+@medido("collage")
+def overlay_two_images(path_a, path_b, tamaño=TAMANO_REFERENCIA, alpha=0.35, max_pixeles=MAX_PIXELES_DECODIFICACION):
+    """Superpone B encima de A con alpha (abre rutas o acepta PIL)."""
+    try:
+        a = abrir_imagen(path_a, tamano_minimo=tamaño, max_pixeles=max_pixeles).resize(tamaño, Image.LANCZOS)
+    except Exception:
+        a = Image.new("RGBA", tamaño, (0, 0, 0, 255))
+    try:
+        b = abrir_imagen(path_b, tamano_minimo=tamaño, max_pixeles=max_pixeles).resize(tamaño, Image.LANCZOS)
+    except Exception:
+        b = Image.new("RGBA", tamaño, (0, 0, 0, 0))
+    b.putalpha(int(255 * alpha))
+    out = Image.alpha_composite(a, b)
+    return out.convert("RGB")
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# motor/ingesta.py — decodificación de fotos: escala reducida (JPEG draft), orientación EXIF y presupuesto de píxeles
+
+import math
+
+from PIL import Image, ImageOps
+
+from .medicion import medido
+
+# Límite por defecto de píxeles decodificados de una sola foto (tras la reducción del JPEG)
+MAX_PIXELES_DECODIFICACION = 64 * 1000 * 1000
+# Bytes por píxel decodificado en el peor caso (RGBA)
+_BYTES_PIXEL = 4
+_TAG_ORIENTACION = 0x0112
+
+
+class ImagenDemasiadoGrande(ValueError):
+    """La foto supera el presupuesto de píxeles del trabajo."""
+
+
+def _orientacion(img):
+    try:
+        return img.getexif().get(_TAG_ORIENTACION, 1)
+    except Exception:
+        return 1
+
+
+def _tamano_necesario(tamano_origen, tamano_minimo, encajar):
+    """
+    Tamaño mínimo que hay que decodificar para obtener tamano_minimo sin perder calidad.
+    Con encajar=True la imagen se reducirá después para caber en tamano_minimo
+    (conservando proporción), así que solo cuenta el lado que limita.
+    """
+    w, h = tamano_origen
+    tw, th = tamano_minimo
+    if encajar:
+        s = min(tw / float(w), th / float(h))
+        return (max(1, int(math.ceil(w * s))), max(1, int(math.ceil(h * s))))
+    return (min(w, tw), min(h, th))
+
+
+def _abrir_reducida(ruta, tamano_minimo=None, encajar=False):
+    """
+    Abre la foto sin decodificarla y, si es JPEG, activa la decodificación a
+    escala reducida (1/2, 1/4, 1/8) más pequeña que sigue cubriendo tamano_minimo.
+    Devuelve (imagen perezosa, orientación EXIF, tamaño necesario ya orientado o None).
+    """
+    img = Image.open(ruta)
+    orientacion = _orientacion(img)
+    girada = orientacion in (5, 6, 7, 8)
+    necesario = None
+    if tamano_minimo:
+        w, h = img.size
+        if girada:
+            w, h = h, w
+        necesario = _tamano_necesario((w, h), tamano_minimo, encajar)
+        if img.format == "JPEG":
+            img.draft(None, necesario[::-1] if girada else necesario)
+    return img, orientacion, necesario
+
+
+def estimar_bytes_decodificacion(ruta, tamano_minimo=None, encajar=False):
+    """Memoria aproximada que ocupará la foto decodificada (solo lee la cabecera)."""
+    img, _, _ = _abrir_reducida(ruta, tamano_minimo, encajar)
+    try:
+        w, h = img.size
+    finally:
+        img.close()
+    return w * h * _BYTES_PIXEL
+
+
+@medido("decodificar")
+def decodificar_imagen(ruta, modo="RGBA", tamano_minimo=None, encajar=False, max_pixeles=MAX_PIXELES_DECODIFICACION):
+    """
+    Decodifica una foto a la menor resolución suficiente y con la orientación EXIF aplicada.
+
+    tamano_minimo: tamaño al que el llamador va a reducir la imagen (None = completa).
+    Los JPEG se decodifican directamente a escala reducida; el resto de formatos
+    se reducen por un factor entero (manteniendo al menos el doble del tamaño
+    necesario para que el remuestreo final conserve calidad) antes de convertir.
+    max_pixeles: si la foto a decodificar lo supera se lanza ImagenDemasiadoGrande
+    sin llegar a decodificarla.
+    """
+    img, orientacion, necesario = _abrir_reducida(ruta, tamano_minimo, encajar)
+    w, h = img.size
+    if max_pixeles and w * h > max_pixeles:
+        img.close()
+        raise ImagenDemasiadoGrande(
+            f"{ruta}: {w * h / 1e6:.1f} MP supera el límite de {max_pixeles / 1e6:.1f} MP por foto."
+        )
+    img.load()
+    if img.mode not in ("RGB", "RGBA", "L", "LA"):
+        img = img.convert(modo)
+    if necesario:
+        nw, nh = necesario[::-1] if orientacion in (5, 6, 7, 8) else necesario
+        factor = min(w // max(1, 2 * nw), h // max(1, 2 * nh))
+        if factor >= 2:
+            img = img.reduce(factor)
+    if orientacion != 1:
+        img = ImageOps.exif_transpose(img)
+    return img.convert(modo)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# motor/medicion.py — tiempos por etapa de los renders, registro JSON y perfilado opcional (cProfile / tracemalloc)
+
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger("motor.medicion")
+
+# Perfilado por defecto de los renders ("", "cprofile", "tracemalloc" o ambos separados por comas)
+PERFILADO_ENV = "GENERADOR_PERFILADO"
+
+_cronometro = ContextVar("cronometro", default=None)
+
+
+class Cronometro:
+    """
+    Acumula tiempo exclusivo por etapa: al entrar en una etapa anidada se
+    pausa la exterior, así que las etapas suman el tiempo medido sin contarlo
+    dos veces (p.ej. "estilo" dentro de "textos" no se suma a "textos").
+    """
+
+    def __init__(self):
+        self.etapas = {}
+        self._pila = []
+
+    def _acumular(self, nombre, segundos, llamadas=0):
+        acumulado = self.etapas.setdefault(nombre, [0.0, 0])
+        acumulado[0] += segundos
+        acumulado[1] += llamadas
+
+    @contextmanager
+    def etapa(self, nombre):
+        ahora = time.perf_counter()
+        if self._pila:
+            exterior, desde = self._pila[-1]
+            self._acumular(exterior, ahora - desde)
+        self._pila.append([nombre, ahora])
+        try:
+            yield
+        finally:
+            ahora = time.perf_counter()
+            _, desde = self._pila.pop()
+            self._acumular(nombre, ahora - desde, 1)
+            if self._pila:
+                self._pila[-1][1] = ahora
+
+    def sumar(self, etapas):
+        """Incorpora tiempos medidos en otro proceso (un worker del pool)."""
+        for nombre, (segundos, llamadas) in etapas.items():
+            self._acumular(nombre, segundos, llamadas)
+
+
+@contextmanager
+def etapa(nombre):
+    """Mide el bloque como etapa del cronómetro activo; sin cronómetro activo no hace nada."""
+    cronometro = _cronometro.get()
+    if cronometro is None:
+        yield
+        return
+    with cronometro.etapa(nombre):
+        yield
+
+
+def medido(nombre):
+    """Decorador: cada llamada a la función cuenta como la etapa nombre."""
+    def decorador(func):
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            with etapa(nombre):
+                return func(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+@contextmanager
+def cronometro_activo(cronometro=None):
+    """Activa un cronómetro (nuevo si no se indica) en el contexto actual; lo entrega para leerlo al final."""
+    cronometro = cronometro or Cronometro()
+    token = _cronometro.set(cronometro)
+    try:
+        yield cronometro
+    finally:
+        _cronometro.reset(token)
+
+
+def _modos_perfilado(perfilado):
+    if perfilado is None:
+        perfilado = os.environ.get(PERFILADO_ENV, "")
+    if isinstance(perfilado, str):
+        perfilado = perfilado.split(",")
+    return {m.strip().lower() for m in perfilado if m and m.strip()}
+
+
+class Medicion:
+    """
+    Tiempos de un render o de una incrustación de títulos:
+    - fases: reloj de pared de las grandes fases (preparar, codificar...);
+    - etapas: tiempo exclusivo por etapa (decodificar, fondo, estilo, caras,
+      textos, animacion, x264...), sumando el de los workers del pool, así que
+      puede superar al de las fases cuando se prepara en paralelo.
+
+    perfilado ("cprofile", "tracemalloc" o ambos; None = variable de entorno
+    GENERADOR_PERFILADO) activa además la captura correspondiente mientras la
+    medición está activa. cProfile solo ve el hilo del trabajo, no los workers.
+    """
+
+    def __init__(self, nombre="render", perfilado=None, directorio=None):
+        self.nombre = nombre
+        self.modos = _modos_perfilado(perfilado)
+        self.directorio = directorio
+        self.cronometro = Cronometro()
+        self.fases = {}
+        self.perfilado = {}
+        self.inicio = None
+        self.total = None
+
+    @contextmanager
+    def fase(self, nombre):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fases[nombre] = self.fases.get(nombre, 0.0) + time.perf_counter() - t0
+
+    @contextmanager
+    def activa(self):
+        """Activa el cronómetro (y el perfilado pedido) mientras dura el bloque."""
+        perfil = cProfile.Profile() if "cprofile" in self.modos else None
+        memoria = "tracemalloc" in self.modos and not tracemalloc.is_tracing()
+        if memoria:
+            tracemalloc.start(10)
+        self.inicio = time.time()
+        t0 = time.perf_counter()
+        if perfil is not None:
+            perfil.enable()
+        try:
+            with cronometro_activo(self.cronometro):
+                yield self
+        finally:
+            if perfil is not None:
+                perfil.disable()
+                self._guardar_cprofile(perfil)
+            if memoria:
+                self._guardar_tracemalloc()
+                tracemalloc.stop()
+            self.total = time.perf_counter() - t0
+
+    def _guardar_cprofile(self, perfil, lineas=25):
+        texto = io.StringIO()
+        pstats.Stats(perfil, stream=texto).sort_stats("cumulative").print_stats(lineas)
+        self.perfilado["cprofile"] = texto.getvalue()
+        if self.directorio:
+            ruta = os.path.join(self.directorio, f"{self.nombre}_{int(self.inicio)}.prof")
+            perfil.dump_stats(ruta)
+            self.perfilado["cprofile_ruta"] = ruta
+
+    def _guardar_tracemalloc(self, lineas=15):
+        actual, pico = tracemalloc.get_traced_memory()
+        estadisticas = tracemalloc.take_snapshot().statistics("lineno")[:lineas]
+        self.perfilado["tracemalloc"] = {
+            "pico_mb": round(pico / (1024 * 1024.), 1),
+            "actual_mb": round(actual / (1024 * 1024.), 1),
+            "top": [str(e) for e in estadisticas],
+        }
+
+    def informe(self):
+        """Resumen serializable a JSON (el que se registra y muestra la app)."""
+        etapas = sorted(self.cronometro.etapas.items(), key=lambda e: -e[1][0])
+        return {
+            "nombre": self.nombre,
+            "inicio": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.inicio)) if self.inicio else None,
+            "total_s": round(self.total, 3) if self.total is not None else None,
+            "fases": {k: round(v, 3) for k, v in self.fases.items()},
+            "etapas": [{"etapa": k, "segundos": round(s, 3), "llamadas": n} for k, (s, n) in etapas],
+            "perfilado": self.perfilado,
+        }
+
+    def registrar(self, **extra):
+        """Escribe el informe como una línea JSON en el log motor.medicion y lo devuelve."""
+        informe = dict(self.informe(), **extra)
+        # el texto de cProfile y el top de tracemalloc no caben en una línea de log
+        linea = dict(informe, perfilado={k: v for k, v in informe["perfilado"].items() if k == "cprofile_ruta"})
+        if "tracemalloc" in informe["perfilado"]:
+            linea["perfilado"]["tracemalloc_pico_mb"] = informe["perfilado"]["tracemalloc"]["pico_mb"]
+        logger.info(json.dumps(linea, ensure_ascii=False))
+        return informe
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# motor/paralelo.py — pool de procesos reutilizable para la preparación de frames
+
+import atexit
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Un único pool por proceso, de tamaño fijo (todos los núcleos): lo comparten
+# todos los trabajos de la cola; cada uno limita su parte con su número de procesos
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def resolver_procesos(procesos):
+    """None/0 => todos los núcleos; cualquier otro valor se limita a [1, núcleos]."""
+    nucleos = os.cpu_count() or 1
+    if not procesos:
+        return nucleos
+    return max(1, min(int(procesos), nucleos))
+
+
+def obtener_pool():
+    """Devuelve el pool compartido (lo crea la primera vez). Nunca se recrea mientras se usa."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=resolver_procesos(None))
+        return _pool
+
+
+def cerrar_pool():
+    """Cierra el pool compartido (al salir del proceso)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+atexit.register(cerrar_pool)
+
+
+def _iterar_en_pool(func, items, n):
+    pool = obtener_pool()
+    pendientes = deque()
+    siguiente = iter(items)
+    try:
+        for item in siguiente:
+            pendientes.append(pool.submit(func, item))
+            if len(pendientes) >= n:
+                break
+        while pendientes:
+            resultado = pendientes.popleft().result()
+            for item in siguiente:
+                pendientes.append(pool.submit(func, item))
+                break
+            yield resultado
+    finally:
+        # solo se cancelan las tareas propias; las de otros trabajos siguen en el pool
+        for futuro in pendientes:
+            futuro.cancel()
+
+
+def iterar(func, items, procesos=None):
+    """
+    Aplica func a cada item repartiendo el trabajo en el pool de procesos y
+    entrega los resultados a medida que están listos, en el orden de items
+    (determinista). procesos limita cuántas tareas de esta llamada hay a la
+    vez en el pool compartido. Con un solo proceso o un solo item se ejecuta
+    en serie, sin pool. Si se deja de iterar, las tareas pendientes se cancelan.
+    """
+    items = list(items)
+    n = min(resolver_procesos(procesos), len(items))
+    if n <= 1:
+        return (func(item) for item in items)
+    return _iterar_en_pool(func, items, n)
+
+
+def mapear(func, items, procesos=None):
+    """Como iterar, pero devuelve la lista completa de resultados."""
+    return list(iterar(func, items, procesos))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# motor/perfiles.py — perfiles de codificación x264 (velocidad frente a tamaño del fichero)
+
+PERFIL_POR_DEFECTO = "balanced"
+PERFIL_BORRADOR = "fast-draft"
+
+# preset/crf/tune: parámetros de x264; threads 0 = todos los núcleos en una sola codificación;
+# gop_s: distancia máxima entre keyframes en segundos (se convierte a frames según los fps);
+# parametros: argumentos extra de ffmpeg para el vídeo; audio_bitrate: bitrate del AAC
+PERFILES = {
+    "fast-draft": {
+        "preset": "ultrafast",
+        "crf": 30,
+        "threads": 0,
+        "gop_s": 2,
+        "tune": "stillimage",
+        "parametros": [],
+        "audio_bitrate": "96k",
+    },
+    "balanced": {
+        "preset": "medium",
+        "crf": 23,
+        "threads": 0,
+        "gop_s": 4,
+        "tune": "stillimage",
+        "parametros": [],
+        "audio_bitrate": "128k",
+    },
+    "archive": {
+        "preset": "slow",
+        "crf": 18,
+        "threads": 0,
+        "gop_s": 4,
+        "tune": "stillimage",
+        "parametros": ["-profile:v", "high"],
+        "audio_bitrate": "192k",
+    },
+}
+
+
+def perfil_codificacion(nombre=None):
+    """Perfil por nombre (None = PERFIL_POR_DEFECTO). Lanza ValueError si no existe."""
+    nombre = nombre or PERFIL_POR_DEFECTO
+    if nombre not in PERFILES:
+        raise ValueError(f"Perfil de codificación desconocido: {nombre} (disponibles: {', '.join(PERFILES)})")
+    return PERFILES[nombre]
+
+
+def _args_x264(perfil, fps):
+    args = ["-crf", str(perfil["crf"]), "-g", str(max(1, int(round(perfil["gop_s"] * fps))))]
+    if perfil["tune"]:
+        args += ["-tune", perfil["tune"]]
+    return args + list(perfil["parametros"])
+
+
+def args_perfil(nombre, fps):
+    """Argumentos de vídeo de ffmpeg (tras -c:v libx264) para el perfil y los fps indicados."""
+    perfil = perfil_codificacion(nombre)
+    return ["-preset", perfil["preset"], "-threads", str(perfil["threads"])] + _args_x264(perfil, fps)
+
+
+def parametros_moviepy(nombre, fps):
+    """Argumentos de write_videofile de MoviePy equivalentes al perfil."""
+    perfil = perfil_codificacion(nombre)
+    return {
+        "codec": "libx264",
+        "audio_codec": "aac",
+        "fps": fps,
+        "preset": perfil["preset"],
+        "threads": perfil["threads"],
+        "audio_bitrate": perfil["audio_bitrate"],
+        "ffmpeg_params": _args_x264(perfil, fps) + ["-metadata", f"comment={metadatos_perfil(nombre)}"],
+    }
+
+
+def metadatos_perfil(nombre):
+    """Etiqueta que se guarda en el MP4 (campo comment) para saber con qué perfil se codificó."""
+    perfil = perfil_codificacion(nombre)
+    return f"perfil={nombre or PERFIL_POR_DEFECTO} preset={perfil['preset']} crf={perfil['crf']}"
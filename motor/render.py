@@ -0,0 +1,579 @@
+# -*- coding: utf-8 -*-
+# motor/render.py — motor de render sin interfaz: de un proyecto (dict/JSON) a un MP4
+
+import json
+import os
+from contextlib import nullcontext
+from functools import lru_cache
+
+import numpy as np
+
+from moviepy.video.VideoClip import VideoClip
+
+from .audio import clave_audio, mezclar_audio, preparar_audio
+from .cache_segmentos import clave_contenido, huella_fichero, obtener_cache
+from .caras import detectar_caras_lote
+from .codificador import codificar_timeline
+from .estilos import apply_style_effects
+from .frames import AlmacenFrames, a_array_rgb
+from .imagen import ajustar_y_procesar_imagen, decodifica_encajada, crear_collage_general, overlay_two_images
+from .ingesta import MAX_PIXELES_DECODIFICACION, estimar_bytes_decodificacion
+from .medicion import Medicion, cronometro_activo, etapa, medido
+from .paralelo import iterar, resolver_procesos
+from .perfiles import PERFIL_BORRADOR, PERFIL_POR_DEFECTO, parametros_moviepy, perfil_codificacion
+from .textos import TAMANO_REFERENCIA, superponer_titulos_en_frame
+from .renderizador import RenderizadorTimeline
+from .timeline import construir_timeline, duracion_timeline
+from .trabajos import ranura_codificacion
+
+TAMANO_SALIDA = TAMANO_REFERENCIA
+FPS = 24
+
+# Modo borrador: vídeo de prueba a baja resolución, menos fps y codificación rápida (PERFIL_BORRADOR)
+TAMANO_BORRADOR = (360, 640)
+FPS_BORRADOR = 12
+
+# Valores por defecto de un proyecto (los mismos que ofrece la barra lateral de la app)
+SPEC_POR_DEFECTO = {
+    "fotos": [],
+    "audio": None,
+    "titulo": "",
+    "mostrar_titulo_en": "todas",       # "todas" | "primera"
+    "subtitulos": [],
+    "duracion_foto": 3.0,
+    "transicion_duracion": 0.5,
+    "transicion": "crossfade",          # none | crossfade | dissolve | fade | slide | wipe | zoom
+    "zoom_movimiento": "in",            # con transición zoom: in | out | kenburns-in | kenburns-out | pan-izquierda | pan-derecha
+    "fondo_tipo": "difuminado",         # difuminado | color sólido
+    "fondo_color": "#000000",
+    "fondo_rapido": True,               # difuminar el fondo a resolución reducida
+    "estilo_prompt": "",
+    "estilo_aplicar": False,
+    "usar_collage": False,
+    "max_fotos_collage": 3,
+    "escalas": [],
+    "blur": False,
+    "blur_minors": False,
+    "blur_strength": 15,
+    "minors_threshold": 0.12,
+    "titulos": None,                    # lista opcional de dicts por frame que sobreescriben los valores calculados
+    "incrustar_titulos": False,
+    "salida": None,
+    "borrador": False,                  # render de prueba rápido (ver TAMANO_BORRADOR / FPS_BORRADOR)
+    "resolucion": None,                 # [ancho, alto]; None = TAMANO_SALIDA (o TAMANO_BORRADOR en borrador)
+    "fps": None,                        # None = FPS (o FPS_BORRADOR en borrador)
+    "perfil_codificacion": None,        # fast-draft | balanced | archive; None = balanced (fast-draft en borrador)
+    "perfilado": None,                  # cprofile | tracemalloc | ambos separados por comas; None = GENERADOR_PERFILADO
+    "procesos": None,                   # procesos para preparar frames (None = todos los núcleos, 1 = en serie)
+    "memoria_frames_mb": None,          # límite de frames en memoria; el resto se vuelca a disco (.npy)
+    "memoria_decodificacion_mb": 1024,  # presupuesto de memoria para decodificar fotos (limita fotos y workers)
+    "codificador": "segmentos",         # segmentos (imágenes fijas una sola vez) | moviepy (composición clásica)
+    "cache_segmentos": True,            # reutilizar segmentos ya codificados (solo codificador=segmentos)
+    "cache_segmentos_dir": None,        # por defecto <temp_dir>/cache_segmentos, compartida entre proyectos
+    "cache_segmentos_mb": 2048,
+    "cache_frames": True,               # reutilizar frames ya preparados (mismas fotos y ajustes de imagen)
+    "cache_frames_dir": None,           # por defecto <temp_dir>/cache_frames, compartida entre proyectos
+    "cache_frames_mb": 2048,
+}
+
+# titulo_info "vacío": los textos se dibujan después, en superponer_titulos_en_frame
+_TITULO_INFO_VACIO = {
+    'texto': '',
+    'fuente_path': None,
+    'tamano': 1,
+    'color': "white",
+    'color_sombra': "black",
+    'tamano_sub': 1,
+    'color_sub': "white",
+    'pos_y': 0,
+    'pos_sub_y': 0
+}
+
+
+def normalizar_spec(spec, base_dir=None):
+    """
+    Completa un proyecto con los valores por defecto y resuelve rutas relativas
+    (fotos, audio, salida) respecto a base_dir.
+    """
+    proyecto = dict(SPEC_POR_DEFECTO)
+    proyecto.update(spec or {})
+    if isinstance(proyecto["subtitulos"], str):
+        proyecto["subtitulos"] = proyecto["subtitulos"].split("\n")
+    proyecto["subtitulos"] = [s.strip() for s in proyecto["subtitulos"] if s and s.strip()]
+
+    def _resolver(p):
+        if p and base_dir and not os.path.isabs(p):
+            return os.path.join(base_dir, p)
+        return p
+
+    proyecto["fotos"] = [_resolver(p) for p in proyecto["fotos"]]
+    proyecto["audio"] = _resolver(proyecto["audio"])
+    proyecto["salida"] = _resolver(proyecto["salida"])
+
+    borrador = bool(proyecto["borrador"])
+    proyecto["resolucion"] = tuple(int(v) for v in (proyecto["resolucion"] or (TAMANO_BORRADOR if borrador else TAMANO_SALIDA)))
+    proyecto["fps"] = int(proyecto["fps"] or (FPS_BORRADOR if borrador else FPS))
+    proyecto["perfil_codificacion"] = proyecto["perfil_codificacion"] or (PERFIL_BORRADOR if borrador else PERFIL_POR_DEFECTO)
+    perfil_codificacion(proyecto["perfil_codificacion"])  # valida el nombre antes de empezar
+    return proyecto
+
+
+def cargar_spec(ruta_json):
+    """Lee un proyecto desde un fichero JSON (rutas relativas al propio fichero)."""
+    with open(ruta_json, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    return normalizar_spec(spec, base_dir=os.path.dirname(os.path.abspath(ruta_json)))
+
+
+def _preparar_frame(ruta, proyecto):
+    """Ajusta una foto al formato vertical y aplica el estilo global si procede."""
+    improc = ajustar_y_procesar_imagen(
+        ruta, proyecto["resolucion"], _TITULO_INFO_VACIO, None,
+        fondo_tipo=proyecto["fondo_tipo"], fondo_color=proyecto["fondo_color"],
+        fondo_rapido=proyecto.get("fondo_rapido", True),
+        max_pixeles=proyecto.get("max_pixeles", MAX_PIXELES_DECODIFICACION)
+    )
+    return _aplicar_estilo_global(improc, proyecto)
+
+
+def _aplicar_estilo_global(img, proyecto):
+    if proyecto["estilo_aplicar"] and proyecto["estilo_prompt"]:
+        try:
+            img = apply_style_effects(img, proyecto["estilo_prompt"])
+        except Exception:
+            pass
+    return img
+
+
+def _preparar_unidad(trabajo):
+    """
+    Prepara el frame de una unidad de montaje y lo devuelve como ndarray RGB.
+    Función de nivel de módulo para poder ejecutarse en el pool de procesos.
+    Las imágenes intermedias (collage/superposición) no salen de memoria.
+    Devuelve también los tiempos por etapa medidos en el worker.
+    """
+    (modo, rutas, escalas), proyecto = trabajo
+    with cronometro_activo() as cronometro:
+        if modo == "collage":
+            sub_imgs = [_preparar_frame(p, proyecto) for p in rutas]
+            frame = crear_collage_general(sub_imgs, scales=escalas, tamaño=proyecto["resolucion"])
+            frame = _aplicar_estilo_global(frame, proyecto)
+        elif modo == "overlay":
+            a = _preparar_frame(rutas[0], proyecto)
+            b = _preparar_frame(rutas[1], proyecto)
+            frame = overlay_two_images(a, b, tamaño=proyecto["resolucion"], alpha=0.35)
+            frame = _aplicar_estilo_global(frame, proyecto)
+        else:
+            frame = _preparar_frame(rutas[0], proyecto)
+        with etapa("conversion"):
+            arr = a_array_rgb(frame)
+    return arr, cronometro.etapas
+
+
+def clave_unidad(unidad, opciones):
+    """
+    Clave del frame preparado de una unidad: contenido de sus fotos, escalas
+    del collage y solo los ajustes que cambian la imagen (no la transición,
+    la duración ni los títulos).
+    """
+    modo, rutas, escalas = unidad
+    difuminado = opciones["fondo_tipo"] == "difuminado"
+    return clave_contenido(
+        "frame", modo, [huella_fichero(r) for r in rutas], escalas,
+        list(opciones["resolucion"]), opciones["fondo_tipo"],
+        None if difuminado else opciones["fondo_color"],
+        bool(opciones["fondo_rapido"]) if difuminado else None,
+        opciones["estilo_prompt"] if opciones["estilo_aplicar"] else None,
+        opciones["max_pixeles"],
+    )
+
+
+def _presupuesto_decodificacion(proyecto):
+    """Presupuesto de bytes del trabajo y máximo de píxeles por foto que se deriva de él."""
+    mb = proyecto["memoria_decodificacion_mb"]
+    if not mb:
+        return None, MAX_PIXELES_DECODIFICACION
+    presupuesto = int(mb * 1024 * 1024)
+    return presupuesto, min(MAX_PIXELES_DECODIFICACION, presupuesto // 4)
+
+
+def _filtrar_fotos_por_presupuesto(proyecto, max_pixeles, avisos):
+    """
+    Lee solo la cabecera de cada foto y descarta (con aviso) las que, incluso
+    decodificadas a escala reducida, superan max_pixeles. Devuelve la memoria
+    estimada de decodificación por foto.
+    """
+    estimaciones = {}
+    descartadas = set()
+    n_fotos = len(proyecto["fotos"])
+    encajar = decodifica_encajada(proyecto["fondo_tipo"], proyecto["fondo_rapido"])
+    for k, ruta in enumerate(proyecto["fotos"]):
+        try:
+            estimaciones[ruta] = estimar_bytes_decodificacion(ruta, proyecto["resolucion"], encajar=encajar)
+        except Exception:
+            # foto ilegible: el error se notificará al prepararla, como antes
+            estimaciones[ruta] = 0
+            continue
+        if estimaciones[ruta] > max_pixeles * 4:
+            avisos.append(f"Se omite {os.path.basename(ruta)}: supera el límite de {max_pixeles / 1e6:.1f} MP por foto.")
+            descartadas.add(k)
+    if descartadas:
+        for clave in ("fotos", "escalas"):
+            proyecto[clave] = [v for k, v in enumerate(proyecto[clave] or []) if k not in descartadas]
+        # los subtítulos van por posición (una foto puede repetirse): se comparan con el nº de fotos
+        if len(proyecto["subtitulos"]) == n_fotos:
+            proyecto["subtitulos"] = [v for k, v in enumerate(proyecto["subtitulos"]) if k not in descartadas]
+    return estimaciones
+
+
+def _procesos_por_memoria(unidades, estimaciones, procesos, presupuesto, tamano=TAMANO_SALIDA):
+    """Limita los workers para que la decodificación simultánea quepa en el presupuesto."""
+    procesos = resolver_procesos(procesos)
+    if not presupuesto or not unidades:
+        return procesos
+    bytes_frame = tamano[0] * tamano[1] * 4
+    # cada unidad decodifica sus fotos de una en una pero mantiene sus frames intermedios
+    pico = max(max(estimaciones.get(r, 0) for r in rutas) + (len(rutas) + 1) * bytes_frame for _, rutas, _ in unidades)
+    return max(1, min(procesos, presupuesto // max(1, pico)))
+
+
+def titulos_por_defecto(proyecto, n_frames, h_first=TAMANO_REFERENCIA[1]):
+    """
+    Estado inicial de títulos/subtítulos/difuminado por frame (el que edita la app).
+    Posiciones y tamaños están en el espacio de TAMANO_REFERENCIA, sea cual sea la
+    resolución del render, así que un borrador y el render final comparten títulos.
+    """
+    default_title_size = max(18, int(h_first * 0.08))   # ~8% de la altura
+    default_sub_size = max(12, int(h_first * 0.045))    # ~4.5% de la altura
+    subtitulos = proyecto["subtitulos"]
+    escalas = proyecto["escalas"] or []
+    titulos_state = [
+        {
+            "titulo": proyecto["titulo"] if (proyecto["mostrar_titulo_en"] == "todas" or i == 0) else "",
+            "subtitulo": subtitulos[i] if i < len(subtitulos) else "",
+            "pos_y": int(h_first * 0.06),
+            "tamano": default_title_size,
+            "color": "000000",
+            "pos_sub_y": int(h_first * 0.88),
+            "tamano_sub": default_sub_size,
+            "color_sub": "000000",
+            "angle": 0,
+            "angle_sub": 0,
+            "blur": proyecto["blur"],
+            "blur_minors": proyecto["blur_minors"],
+            "blur_strength": proyecto["blur_strength"],
+            "minors_threshold": proyecto["minors_threshold"],
+            "use_style": proyecto["estilo_aplicar"],
+            "style_prompt": proyecto["estilo_prompt"],
+            "scale": float(escalas[i]) if i < len(escalas) else 1.0
+        }
+        for i in range(n_frames)
+    ]
+    for i, extra in enumerate(proyecto["titulos"] or []):
+        if i < n_frames and extra:
+            titulos_state[i].update(extra)
+    return titulos_state
+
+
+def renderizar_proyecto(spec, temp_dir="temp_files", almacen=None, progreso=None, medicion=None):
+    """
+    Genera el vídeo base (sin títulos) de un proyecto y, si el proyecto lo pide,
+    la versión con títulos incrustados.
+
+    Devuelve un dict con video_path, frames_paths (handles del almacén de frames),
+    almacen, titulos_state, avisos, borrador, perfil_codificacion (perfil con el
+    que se codificó, también anotado en el MP4) y, opcionalmente,
+    video_con_titulos_path.
+
+    Con borrador=True el vídeo sale a TAMANO_BORRADOR y FPS_BORRADOR con
+    el perfil fast-draft: sirve para revisar orden y tiempos en segundos.
+    Los títulos se expresan en TAMANO_REFERENCIA y se escalan al frame, así que
+    el render final reproduce la composición del borrador.
+
+    progreso(etapa, hecho, total), si se indica, recibe el avance por etapas
+    ("preparar": frames preparados; "codificar": segundos codificados) y puede
+    lanzar una excepción para cancelar el render (ver trabajos.Trabajo).
+
+    El resultado incluye "medicion": tiempos por fase y por etapa (y el
+    perfilado pedido en proyecto["perfilado"]), que también se registran como
+    una línea JSON en el log motor.medicion. medicion permite pasar una
+    Medicion propia.
+    """
+    proyecto = normalizar_spec(spec)
+    if not proyecto["fotos"]:
+        raise ValueError("El proyecto no tiene fotos.")
+    if not os.path.exists(temp_dir):
+        os.makedirs(temp_dir)
+    medicion = medicion or Medicion("render", proyecto["perfilado"], temp_dir)
+    with medicion.activa():
+        resultado = _renderizar(proyecto, temp_dir, almacen, progreso, medicion)
+    resultado["medicion"] = medicion.registrar(
+        fotos=len(proyecto["fotos"]), frames=resultado["timeline"]["total"],
+        resolucion=list(proyecto["resolucion"]), perfil_codificacion=proyecto["perfil_codificacion"],
+    )
+    return resultado
+
+
+def _renderizar(proyecto, temp_dir, almacen, progreso, medicion):
+    """Cuerpo de renderizar_proyecto, con la medición ya activa."""
+    avisos = []
+    if almacen is None:
+        limite = proyecto["memoria_frames_mb"]
+        almacen = AlmacenFrames(temp_dir, max_bytes_memoria=int(limite * 1024 * 1024) if limite else None)
+
+    presupuesto, max_pixeles = _presupuesto_decodificacion(proyecto)
+    estimaciones = _filtrar_fotos_por_presupuesto(proyecto, max_pixeles, avisos)
+    if not proyecto["fotos"]:
+        raise ValueError("Ninguna foto del proyecto cabe en el presupuesto de memoria.")
+
+    rutas_fotos = proyecto["fotos"]
+    if proyecto["subtitulos"] and len(proyecto["subtitulos"]) != len(rutas_fotos):
+        avisos.append("El número de subtítulos no coincide con el de fotos. Se omitirán.")
+        proyecto["subtitulos"] = []
+
+    # --- MONTAJE Y TRANSICIONES ---
+    sp = (proyecto["estilo_prompt"] or "").lower()
+    montage_mode = "normal"
+    if proyecto["usar_collage"]:
+        montage_mode = "collage"
+    elif "overlay" in sp or "superpos" in sp:
+        montage_mode = "overlay"
+
+    speed_factor = 1.0
+    if "fast" in sp or "rápido" in sp:
+        speed_factor = 0.6
+    if "slow" in sp or "lento" in sp:
+        speed_factor = 1.5
+    dur = max(0.5, proyecto["duracion_foto"] * speed_factor)
+
+    transition_type = proyecto["transicion"]
+    trans_dur = proyecto["transicion_duracion"]
+    escalas = proyecto["escalas"] or []
+
+    # Plan de unidades de trabajo (una por frame del vídeo): foto suelta, grupo de collage o pareja superpuesta
+    unidades = []
+    i = 0
+    N = len(rutas_fotos)
+    while i < N:
+        if montage_mode == "collage":
+            group = rutas_fotos[i:i + proyecto["max_fotos_collage"]]
+            scales_for_group = [float(escalas[i + k]) if i + k < len(escalas) else 1.0 for k in range(len(group))]
+            unidades.append(("collage", group, scales_for_group))
+            i += len(group)
+        elif montage_mode == "overlay" and i + 1 < N:
+            unidades.append(("overlay", rutas_fotos[i:i + 2], None))
+            i += 2
+        else:
+            unidades.append(("normal", [rutas_fotos[i]], None))
+            i += 1
+
+    # Preparación en paralelo: cada worker devuelve su frame como ndarray, en el mismo orden que unidades
+    # (los workers se limitan para que las decodificaciones simultáneas quepan en el presupuesto)
+    opciones = {k: proyecto[k] for k in ("resolucion", "fondo_tipo", "fondo_color", "fondo_rapido", "estilo_prompt", "estilo_aplicar")}
+    opciones["max_pixeles"] = max_pixeles
+    # Las unidades ya preparadas en un render anterior (caché de frames) no se vuelven a procesar
+    cache_frames = cache_frames_de_proyecto(proyecto, temp_dir)
+    avisar = progreso or (lambda *a: None)
+    avisar("preparar", 0, len(unidades))
+    frames_paths = [None] * len(unidades)
+    hechos = 0
+    with medicion.fase("preparar"):
+        claves = [clave_unidad(unidad, opciones) for unidad in unidades] if cache_frames is not None else []
+        with cache_frames.reservar(claves) if cache_frames is not None else nullcontext():
+            pendientes = []
+            for i, unidad in enumerate(unidades):
+                existente = cache_frames.obtener(claves[i]) if cache_frames is not None else None
+                if existente is None:
+                    pendientes.append(i)
+                    continue
+                with etapa("cache_frames"):
+                    frames_paths[i] = almacen.guardar(np.load(existente, allow_pickle=False))
+                hechos += 1
+                avisar("preparar", hechos, len(unidades))
+            trabajos = [(unidades[i], opciones) for i in pendientes]
+            procesos = _procesos_por_memoria([unidades[i] for i in pendientes], estimaciones, proyecto["procesos"], presupuesto, proyecto["resolucion"])
+            for i, (arr, etapas) in zip(pendientes, iterar(_preparar_unidad, trabajos, procesos)):
+                medicion.cronometro.sumar(etapas)
+                frames_paths[i] = almacen.guardar(arr)
+                if cache_frames is not None:
+                    with etapa("cache_frames"):
+                        temporal = cache_frames.ruta_temporal()
+                        np.save(temporal, arr, allow_pickle=False)
+                        cache_frames.guardar(claves[i], temporal)
+                hechos += 1
+                avisar("preparar", hechos, len(unidades))
+            if cache_frames is not None:
+                cache_frames.recortar(protegidas=claves)
+
+    titulos_state = titulos_por_defecto(proyecto, len(frames_paths))
+    perfil = proyecto["perfil_codificacion"]
+
+    video_salida_path = proyecto["salida"] or os.path.join(temp_dir, "evento_final.mp4")
+    timeline = construir_timeline(len(frames_paths), dur, transition_type, trans_dur, fps=proyecto["fps"], movimiento_zoom=proyecto["zoom_movimiento"])
+    if proyecto["incrustar_titulos"]:
+        # una sola pasada: los títulos se componen sobre cada frame antes de codificar
+        obtener_frame = frames_con_titulos(frames_paths, titulos_state, almacen, proyecto["estilo_prompt"])
+        clave_frame = claves_con_titulos(frames_paths, titulos_state, almacen, proyecto["estilo_prompt"])
+        precargar = precarga_caras(frames_paths, titulos_state, almacen, proyecto["procesos"])
+    else:
+        obtener_frame = lambda i: almacen.array(frames_paths[i])
+        clave_frame = lambda i: almacen.huella(frames_paths[i])
+        precargar = None
+    with medicion.fase("codificar"):
+        if proyecto["codificador"] == "moviepy":
+            _codificar_con_moviepy(timeline, obtener_frame, proyecto["audio"], video_salida_path, progreso, perfil,
+                                   temp_dir=temp_dir, cache=cache_de_proyecto(proyecto, temp_dir))
+        else:
+            codificar_timeline(timeline, obtener_frame, video_salida_path, temp_dir=temp_dir, audio=proyecto["audio"],
+                               cache=cache_de_proyecto(proyecto, temp_dir), clave_frame=clave_frame, precargar=precargar,
+                               progreso=progreso, perfil=perfil)
+
+    resultado = {
+        "video_path": video_salida_path,
+        "frames_paths": frames_paths,
+        "almacen": almacen,
+        "timeline": timeline,
+        "titulos_state": titulos_state,
+        "avisos": avisos,
+        "borrador": proyecto["borrador"],
+        "perfil_codificacion": perfil,
+    }
+    if proyecto["incrustar_titulos"]:
+        resultado["video_con_titulos_path"] = video_salida_path
+    return resultado
+
+
+def _codificar_con_moviepy(timeline, obtener_frame, audio, salida, progreso=None, perfil=None, temp_dir="temp_files", cache=None):
+    """
+    Codifica la línea de tiempo en una sola pasada con MoviePy. Cada frame lo
+    produce RenderizadorTimeline a partir del segmento activo (sin componer
+    todos los clips ni mantener todas las imágenes en memoria). El vídeo se
+    codifica sin audio y la música preparada (preparar_audio) se añade después
+    por copia de stream.
+    """
+    renderizador = RenderizadorTimeline(timeline, obtener_frame)
+    total = duracion_timeline(timeline)
+    avisar = progreso or (lambda *a: None)
+
+    def make_frame(t):
+        avisar("codificar", t, total)
+        with etapa("animacion"):
+            return renderizador.frame_en(t)
+
+    video_final = VideoClip(make_frame, duration=total)
+    solo_video = os.path.join(temp_dir, f"sin_audio_{os.path.basename(salida)}") if audio else salida
+    avisar("esperando_codificacion", 0, total)
+    with ranura_codificacion():
+        try:
+            with etapa("x264"):
+                video_final.write_videofile(solo_video, audio=False, **parametros_moviepy(perfil, timeline["fps"]))
+        finally:
+            video_final.close()
+            renderizador.liberar()
+    # el audio y la mezcla (copia de stream) no ocupan turno de codificación
+    if audio:
+        try:
+            avisar("audio", total, total)
+            audio_bitrate = perfil_codificacion(perfil)["audio_bitrate"]
+            with cache.reservar([clave_audio(audio, total, audio_bitrate)]) if cache is not None else nullcontext():
+                pista = preparar_audio(audio, total, cache, temp_dir, audio_bitrate)
+                with etapa("concatenar"):
+                    mezclar_audio(solo_video, pista, salida)
+        finally:
+            os.remove(solo_video)
+
+
+@medido("titulos")
+def titular_frame(frame, t, estilo_prompt_global=""):
+    """
+    Aplica difuminado, estilo y títulos de un elemento de titulos_state a un
+    frame (ndarray), escalados del espacio de TAMANO_REFERENCIA al ancho del frame.
+    """
+    img_con_titulo = superponer_titulos_en_frame(
+        frame,
+        t["titulo"],
+        t["subtitulo"],
+        t["pos_y"],
+        t["tamano"],
+        t["color"],
+        t["pos_sub_y"],
+        t["tamano_sub"],
+        t["color_sub"],
+        t.get("angle", 0),
+        t.get("angle_sub", 0),
+        blur=t.get("blur", False),
+        blur_minors=t.get("blur_minors", False),
+        blur_strength=t.get("blur_strength", 15),
+        minors_threshold=t.get("minors_threshold", 0.12),
+        style_apply=t.get("use_style", False),
+        style_prompt=t.get("style_prompt", "") or estilo_prompt_global,
+        escala=frame.shape[1] / float(TAMANO_REFERENCIA[0])
+    )
+    return a_array_rgb(img_con_titulo)
+
+
+def frames_con_titulos(frames_paths, titulos_state, almacen, estilo_prompt_global=""):
+    """
+    obtener_frame(i) que devuelve el frame i ya titulado. Cada imagen se usa en
+    su hold y en las transiciones vecinas, así que se memorizan las últimas.
+    """
+    @lru_cache(maxsize=3)
+    def obtener_frame(i):
+        return titular_frame(almacen.array(frames_paths[i]), titulos_state[i], estilo_prompt_global)
+    return obtener_frame
+
+
+def claves_con_titulos(frames_paths, titulos_state, almacen, estilo_prompt_global=""):
+    """clave_frame(i) para la caché de segmentos: huella del frame base + sus ajustes de títulos."""
+    def clave_frame(i):
+        return clave_contenido(almacen.huella(frames_paths[i]), titulos_state[i], estilo_prompt_global)
+    return clave_frame
+
+
+def precarga_caras(frames_paths, titulos_state, almacen, procesos=None):
+    """precargar(indices) que detecta en lote (pool de procesos) las caras de los frames con difuminado."""
+    def precargar(indices):
+        con_blur = [i for i in indices if titulos_state[i].get("blur", False)]
+        if con_blur:
+            with etapa("caras"):
+                detectar_caras_lote([almacen.array(frames_paths[i]) for i in con_blur], procesos)
+    return precargar
+
+
+def cache_de_proyecto(proyecto, temp_dir):
+    if not proyecto["cache_segmentos"]:
+        return None
+    directorio = proyecto["cache_segmentos_dir"] or os.path.join(temp_dir, "cache_segmentos")
+    return obtener_cache(directorio, proyecto["cache_segmentos_mb"])
+
+
+def cache_frames_de_proyecto(proyecto, temp_dir):
+    if not proyecto["cache_frames"]:
+        return None
+    directorio = proyecto["cache_frames_dir"] or os.path.join(temp_dir, "cache_frames")
+    return obtener_cache(directorio, proyecto["cache_frames_mb"], extension=".npy")
+
+
+def incrustar_titulos(frames_paths, titulos_state, timeline, salida_path, almacen, audio=None, estilo_prompt_global="", temp_dir="temp_files", cache=None, procesos=None, progreso=None, perfil=None, medicion=None):
+    """
+    Genera el vídeo final con los títulos/difuminado/estilo de cada frame incrustados.
+
+    Parte de los frames del almacén y de la línea de tiempo del render original
+    (mismas transiciones y tiempos), así que no decodifica el vídeo anterior:
+    es una única codificación. Con cache, solo se recodifican los segmentos
+    de las fotos cuyos ajustes han cambiado desde la última vez. perfil es el
+    perfil de codificación (p.ej. el del render original, resultado["perfil_codificacion"]).
+
+    Los tiempos por etapa se registran en el log motor.medicion; con medicion
+    (una Medicion propia) el llamador puede además leerlos al terminar.
+    """
+    obtener_frame = frames_con_titulos(frames_paths, titulos_state, almacen, estilo_prompt_global)
+    clave_frame = claves_con_titulos(frames_paths, titulos_state, almacen, estilo_prompt_global)
+    medicion = medicion or Medicion("titulos", directorio=temp_dir)
+    with medicion.activa(), medicion.fase("codificar"):
+        salida = codificar_timeline(timeline, obtener_frame, salida_path, temp_dir=temp_dir, audio=audio,
+                                    cache=cache, clave_frame=clave_frame,
+                                    precargar=precarga_caras(frames_paths, titulos_state, almacen, procesos),
+                                    progreso=progreso, perfil=perfil)
+    medicion.registrar(frames=timeline["total"], perfil_codificacion=perfil)
+    return salida
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# motor/renderizador.py — render de la línea de tiempo frame a frame tocando solo el segmento activo
+
+from bisect import bisect_right
+
+from .transiciones import frames_transicion
+from .zoom import MotorZoom, escala_minima
+
+
+class RenderizadorTimeline:
+    """
+    Devuelve el frame k de una línea de tiempo (construir_timeline).
+
+    Los segmentos son contiguos, así que un índice de inicios ordenados y
+    bisect localizan el segmento activo en O(log n). Solo se mantiene en
+    memoria el estado del segmento activo (su imagen, la pirámide del zoom o
+    el generador de la transición): se carga al entrar en el segmento con
+    obtener_frame(i) y se libera al pasar al siguiente, así que el coste por
+    frame y la memoria no crecen con el número de fotos.
+
+    Los frames devueltos pueden ser buffers reutilizados: hay que consumirlos
+    (o copiarlos) antes de pedir el siguiente.
+    """
+
+    def __init__(self, timeline, obtener_frame):
+        self.timeline = timeline
+        self.obtener_frame = obtener_frame
+        self.fps = timeline["fps"]
+        self.total = timeline["total"]
+        self._inicios = [seg["inicio"] for seg in timeline["segmentos"]]
+        self._activo = None
+        self._estado = None
+
+    def segmento_en(self, k):
+        """Índice del segmento que contiene el frame k."""
+        if not 0 <= k < self.total:
+            raise IndexError(k)
+        return bisect_right(self._inicios, k) - 1
+
+    def _entrar(self, i):
+        seg = self.timeline["segmentos"][i]
+        self._activo = i
+        self._estado = None  # libera el segmento anterior antes de cargar el nuevo
+        if seg["tipo"] == "hold":
+            self._estado = {"frame": self.obtener_frame(seg["frame"])}
+        elif seg["tipo"] == "zoom":
+            movimiento = seg.get("movimiento", "in")
+            self._estado = {"zoom": MotorZoom(self.obtener_frame(seg["frame"]), escala_minima(movimiento)), "movimiento": movimiento}
+        else:
+            self._estado = {"siguiente": 0}
+
+    def _frame_transicion(self, seg, offset):
+        estado = self._estado
+        if offset != estado["siguiente"]:
+            # acceso no secuencial: se reinicia el generador (el render normal es secuencial)
+            estado.pop("generador", None)
+            estado["siguiente"] = 0
+        if "generador" not in estado:
+            a = self.obtener_frame(seg["desde"])
+            b = self.obtener_frame(seg["hasta"])
+            estado["generador"] = frames_transicion(a, b, seg["n"], seg["efecto"])
+        frame = None
+        while estado["siguiente"] <= offset:
+            frame = next(estado["generador"])
+            estado["siguiente"] += 1
+        return frame
+
+    def frame(self, k):
+        """Frame k (ndarray RGB uint8)."""
+        i = self.segmento_en(k)
+        if i != self._activo:
+            self._entrar(i)
+        seg = self.timeline["segmentos"][i]
+        offset = k - seg["inicio"]
+        if seg["tipo"] == "hold":
+            return self._estado["frame"]
+        if seg["tipo"] == "zoom":
+            return self._estado["zoom"].frame_movimiento(self._estado["movimiento"], offset / float(max(1, seg["n"])))
+        return self._frame_transicion(seg, offset)
+
+    def frame_en(self, t):
+        """Frame activo en el instante t (segundos), para usarlo como make_frame de MoviePy."""
+        return self.frame(min(self.total - 1, max(0, int(t * self.fps + 1e-6))))
+
+    def frames(self):
+        """Recorre todos los frames en orden."""
+        for k in range(self.total):
+            yield self.frame(k)
+        self.liberar()
+
+    def liberar(self):
+        self._activo = None
+        self._estado = None
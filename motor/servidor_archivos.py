@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# motor/servidor_archivos.py — servidor HTTP local para entregar los vídeos desde disco (por trozos y con Range)
+
+import mimetypes
+import os
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit, parse_qs
+
+TAMANO_TROZO = 256 * 1024
+# Puerto fijo por defecto (reenviado en .devcontainer/devcontainer.json)
+PUERTO_POR_DEFECTO = 8502
+
+
+def _rango(cabecera, tamano):
+    """
+    Interpreta una cabecera Range de un solo tramo ("bytes=a-b", "bytes=a-",
+    "bytes=-n"). Devuelve (inicio, fin) inclusivo, None si no hay rango válido
+    que aplicar, o False si el rango no se puede satisfacer.
+    """
+    if not cabecera or not cabecera.startswith("bytes=") or "," in cabecera:
+        return None
+    inicio, _, fin = cabecera[len("bytes="):].strip().partition("-")
+    try:
+        if inicio == "":
+            n = int(fin)
+            if n <= 0:
+                return False
+            return max(0, tamano - n), tamano - 1
+        inicio = int(inicio)
+        fin = int(fin) if fin else tamano - 1
+    except ValueError:
+        return None
+    if inicio >= tamano or fin < inicio:
+        return False
+    return inicio, min(fin, tamano - 1)
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    servidor_archivos = None  # ServidorArchivos, asignado al crear el servidor
+
+    def log_message(self, formato, *args):
+        pass
+
+    def do_HEAD(self):
+        self._servir(cuerpo=False)
+
+    def do_GET(self):
+        self._servir(cuerpo=True)
+
+    def _servir(self, cuerpo):
+        partes = urlsplit(self.path)
+        segmentos = partes.path.strip("/").split("/")
+        ruta = self.servidor_archivos.ruta_de(segmentos[1]) if len(segmentos) == 3 and segmentos[0] == "v" else None
+        if ruta is None or not os.path.isfile(ruta):
+            self.send_error(404)
+            return
+        tamano = os.path.getsize(ruta)
+        rango = _rango(self.headers.get("Range"), tamano)
+        if rango is False:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{tamano}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        inicio, fin = rango or (0, tamano - 1)
+        longitud = max(0, fin - inicio + 1)
+        self.send_response(206 if rango else 200)
+        self.send_header("Content-Type", mimetypes.guess_type(ruta)[0] or "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(longitud))
+        if rango:
+            self.send_header("Content-Range", f"bytes {inicio}-{fin}/{tamano}")
+        if "descargar" in parse_qs(partes.query):
+            nombre = unquote(segmentos[2])
+            self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(nombre)}")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "private, max-age=3600")
+        self.end_headers()
+        if not cuerpo:
+            return
+        try:
+            with open(ruta, "rb") as f:
+                f.seek(inicio)
+                restante = longitud
+                while restante > 0:
+                    trozo = f.read(min(TAMANO_TROZO, restante))
+                    if not trozo:
+                        break
+                    self.wfile.write(trozo)
+                    restante -= len(trozo)
+        except (BrokenPipeError, ConnectionResetError):
+            # el navegador corta la conexión al saltar a otro punto del vídeo
+            pass
+
+
+class ServidorArchivos:
+    """
+    Entrega ficheros publicados desde disco por trozos y con peticiones Range
+    (el navegador pide solo lo que va a reproducir), así que la memoria no
+    crece con el tamaño del vídeo. Solo se sirven rutas publicadas, cada una
+    bajo un token aleatorio: /v/<token>/<nombre>[?descargar=1].
+
+    base_publica permite anunciar otra URL (p.ej. detrás de un proxy) en
+    lugar de http://host:puerto.
+    """
+
+    def __init__(self, host="127.0.0.1", puerto=0, base_publica=None):
+        manejador = type("Manejador", (_Manejador,), {"servidor_archivos": self})
+        self._httpd = ThreadingHTTPServer((host, puerto), manejador)
+        self._httpd.daemon_threads = True
+        self.host, self.puerto = self._httpd.server_address[:2]
+        self.base = (base_publica or f"http://{self.host}:{self.puerto}").rstrip("/")
+        self._rutas = {}
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, name="servidor-archivos", daemon=True)
+        self._hilo.start()
+
+    def publicar(self, ruta):
+        """Publica un fichero y devuelve su URL (el mismo fichero conserva su token)."""
+        ruta = os.path.abspath(ruta)
+        with self._lock:
+            token = self._tokens.get(ruta)
+            if token is None:
+                token = secrets.token_urlsafe(16)
+                self._tokens[ruta] = token
+                self._rutas[token] = ruta
+        return f"{self.base}/v/{token}/{quote(os.path.basename(ruta))}"
+
+    def url_descarga(self, ruta):
+        return self.publicar(ruta) + "?descargar=1"
+
+    def retirar(self, ruta):
+        with self._lock:
+            token = self._tokens.pop(os.path.abspath(ruta), None)
+            self._rutas.pop(token, None)
+
+    def ruta_de(self, token):
+        return self._rutas.get(token)
+
+    def cerrar(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+_servidor = None
+_servidor_lock = threading.Lock()
+
+
+def obtener_servidor(host=None, puerto=None, base_publica=None):
+    """
+    Servidor compartido del proceso. Sin argumentos se configura con las
+    variables de entorno GENERADOR_ARCHIVOS_HOST, GENERADOR_ARCHIVOS_PUERTO
+    (por defecto PUERTO_POR_DEFECTO; 0 = puerto libre) y GENERADOR_ARCHIVOS_URL.
+    """
+    global _servidor
+    with _servidor_lock:
+        if _servidor is None:
+            _servidor = ServidorArchivos(
+                host or os.environ.get("GENERADOR_ARCHIVOS_HOST", "127.0.0.1"),
+                int(puerto if puerto is not None else os.environ.get("GENERADOR_ARCHIVOS_PUERTO", PUERTO_POR_DEFECTO)),
+                base_publica or os.environ.get("GENERADOR_ARCHIVOS_URL"),
+            )
+    return _servidor
+
+
+def servidor_publico():
+    """
+    Servidor compartido solo si se ha configurado GENERADOR_ARCHIVOS_URL (la
+    URL con la que el navegador lo alcanza); None en otro caso. En despliegues
+    remotos (Codespaces, HTTPS, proxy) http://127.0.0.1:<puerto> no es
+    accesible desde el navegador, así que sin esa URL la app entrega los
+    vídeos a través de la propia Streamlit.
+    """
+    if not os.environ.get("GENERADOR_ARCHIVOS_URL"):
+        return None
+    return obtener_servidor()
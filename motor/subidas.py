@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# motor/subidas.py — ficheros subidos guardados por contenido, sin duplicados y escritos en segundo plano
+
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .cache_segmentos import huella_datos, registrar_huella
+
+# Un pool de hilos pequeño para todo el proceso: escribir a disco libera el GIL
+_escritores = ThreadPoolExecutor(max_workers=4, thread_name_prefix="subidas")
+
+
+class AlmacenSubidas:
+    """
+    Guarda cada fichero subido como <hash del contenido><extensión>, así que
+    dos fotos con el mismo nombre no se pisan y volver a subir (o volver a
+    generar con) el mismo fichero no escribe nada. guardar() calcula el hash y
+    devuelve enseguida un Future con la ruta: la escritura se hace en un hilo
+    en segundo plano y, en cuanto termina, la ruta ya se puede usar como
+    fuente del render. Las escrituras pendientes del mismo contenido se comparten.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self._lock = threading.Lock()
+        self._pendientes = {}
+        os.makedirs(directorio, exist_ok=True)
+
+    def ruta(self, huella, nombre):
+        """Ruta definitiva del contenido huella (conserva la extensión del nombre original)."""
+        return os.path.join(self.directorio, huella + os.path.splitext(nombre)[1].lower())
+
+    def guardar(self, datos, nombre):
+        """Programa la escritura de datos (bytes) y devuelve un Future con su ruta."""
+        huella = huella_datos(datos)
+        ruta = self.ruta(huella, nombre)
+        with self._lock:
+            futuro = self._pendientes.get(ruta)
+            if futuro is not None:
+                return futuro
+            if os.path.exists(ruta):
+                futuro = Future()
+                futuro.set_result(ruta)
+                return futuro
+            futuro = self._pendientes[ruta] = _escritores.submit(self._escribir, datos, ruta, huella)
+        return futuro
+
+    def _escribir(self, datos, ruta, huella):
+        temporal = os.path.join(self.directorio, f".tmp_{uuid.uuid4().hex}")
+        try:
+            # el directorio puede haber desaparecido con la limpieza de la sesión
+            os.makedirs(self.directorio, exist_ok=True)
+            with open(temporal, "wb") as f:
+                f.write(datos)
+            os.replace(temporal, ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        finally:
+            with self._lock:
+                self._pendientes.pop(ruta, None)
+        # el hash ya se conoce: huella_fichero (claves de caché) no tendrá que releerlo
+        registrar_huella(ruta, huella)
+        return ruta
+
+
+_almacenes = {}
+_almacenes_lock = threading.Lock()
+
+
+def obtener_almacen_subidas(directorio):
+    """Almacén compartido por directorio dentro del proceso (las escrituras pendientes sobreviven a cada recarga)."""
+    clave = os.path.abspath(directorio)
+    with _almacenes_lock:
+        almacen = _almacenes.get(clave)
+        if almacen is None:
+            almacen = _almacenes[clave] = AlmacenSubidas(clave)
+    return almacen
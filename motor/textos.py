@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+# motor/textos.py — fuentes, colores y superposición de títulos sobre frames
+
+import os
+import re
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+from .caras import cv2_available, detectar_caras_pil, es_menor_por_tamano, difuminar_caras_en_pil
+from .estilos import apply_style_effects
+from .frames import TAMANO_REFERENCIA, abrir_imagen
+from .medicion import medido
+
+
+# --- detección simple de emoji ---
+_emoji_re = re.compile(
+    "["
+    "\U0001F300-\U0001F5FF"
+    "\U0001F600-\U0001F64F"
+    "\U0001F680-\U0001F6FF"
+    "\U0001F700-\U0001F77F"
+    "\U0001F780-\U0001F7FF"
+    "\U0001F800-\U0001F8FF"
+    "\U0001F900-\U0001F9FF"
+    "\U0001FA00-\U0001FA6F"
+    "\U0001FA70-\U0001FAFF"
+    "]", flags=re.UNICODE)
+
+
+def contiene_emoji(s):
+    if not s:
+        return False
+    return bool(_emoji_re.search(s))
+
+
+def normalizar_color(c):
+    """
+    Devuelve un color válido para PIL: acepta '#RRGGBB', 'RRGGBB' o nombres como 'white'.
+    """
+    if not c:
+        return "#000000"
+    cs = str(c).strip()
+    if cs.startswith("#"):
+        return cs
+    # si es hex sin '#'
+    if len(cs) == 6 and all(ch in "0123456789abcdefABCDEF" for ch in cs):
+        return "#" + cs
+    # fallback: devuelve tal cual (permite nombres como 'white')
+    return cs
+
+
+@lru_cache(maxsize=None)
+def _rutas_fuente(fuente_path=None, prefer_emoji=False):
+    """
+    Candidatas de fuente en orden de preferencia, resueltas una sola vez por proceso
+    (solo las rutas que existen, seguidas de nombres que Pillow puede resolver).
+    """
+    posibles = []
+    if prefer_emoji:
+        # rutas comunes de fuentes emoji (macOS / Linux)
+        posibles += [
+            "/System/Library/Fonts/Apple Color Emoji.ttf",
+            "/usr/share/fonts/truetype/noto/NotoColorEmoji.ttf",
+            "/usr/share/fonts/truetype/seguiemj.ttf",
+            "/usr/share/fonts/truetype/ancient-scripts/Symbola.ttf"
+        ]
+    if fuente_path:
+        posibles.append(fuente_path)
+    # rutas comunes en Linux / macOS / Windows (no-emoji)
+    posibles += [
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+        "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+        "/usr/share/fonts/truetype/freefont/FreeSans.ttf",
+        "/usr/share/fonts/truetype/msttcorefonts/Arial.ttf",
+        "/Library/Fonts/Arial.ttf",
+        "C:\\Windows\\Fonts\\Arial.ttf",
+        "arial.ttf",
+    ]
+    rutas = [p for p in posibles if p and os.path.exists(p)]
+    # Intentar por nombre (Pillow puede resolver algunos nombres instalados)
+    rutas += ["DejaVuSans.ttf", "Arial.ttf", "LiberationSans-Regular.ttf"]
+    return tuple(rutas)
+
+
+@lru_cache(maxsize=256)
+def _truetype(ruta, tamano):
+    """FreeTypeFont cargada por (ruta, tamaño), o None si esa combinación no se puede cargar."""
+    try:
+        return ImageFont.truetype(ruta, tamano)
+    except Exception:
+        return None
+
+
+def cargar_fuente(tamano, fuente_path=None, prefer_emoji=False):
+    """
+    Intentar cargar una fuente TrueType escalable.
+    Si prefer_emoji True, prueba fuentes emoji antes de las estándar.
+    Las rutas y las fuentes ya cargadas se reutilizan entre llamadas.
+    """
+    tamano = int(tamano) if tamano else 20
+    for p in _rutas_fuente(fuente_path, bool(prefer_emoji)):
+        fuente = _truetype(p, tamano)
+        if fuente is not None:
+            return fuente
+    # último recurso
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=1024)
+def ajustar_fuente_a_ancho(text, requested_size, max_width, prefer_emoji=False):
+    """
+    Mayor tamaño de fuente (<= requested_size, mínimo 8) con el que text cabe en
+    max_width. El ancho del texto es casi proporcional al tamaño, así que se
+    estima el tamaño por proporción y se corrige con muy pocas mediciones.
+    Devuelve (fuente, bbox).
+    """
+    size = requested_size
+    font = cargar_fuente(size, None, prefer_emoji=prefer_emoji)
+    bbox = font.getbbox(text)
+    tw = bbox[2] - bbox[0]
+    intentos = 0
+    while tw > max_width and size > 8 and intentos < 6:
+        size = max(8, min(size - 1, int(size * max_width / float(tw))))
+        font = cargar_fuente(size, None, prefer_emoji=prefer_emoji)
+        bbox = font.getbbox(text)
+        tw = bbox[2] - bbox[0]
+        intentos += 1
+    return font, bbox
+
+
+def preparar_base(imagen, blur=False, blur_minors=False, blur_strength=15, minors_threshold=0.12, style_apply=False, style_prompt="", boxes=None):
+    """
+    Etapa de imagen de superponer_titulos_en_frame: difuminado de caras y estilo.
+    Devuelve RGBA. boxes permite pasar caras ya detectadas (p.ej. en el frame a
+    resolución completa y reescaladas a una vista previa reducida).
+    """
+    img = abrir_imagen(imagen)
+    # Si se solicita difuminado, detectar caras y aplicar según opciones
+    if blur and cv2_available:
+        if boxes is None:
+            boxes = detectar_caras_pil(img)
+        if boxes:
+            if blur_minors:
+                # filtrar boxes por heurística de tamaño
+                boxes = [b for b in boxes if es_menor_por_tamano(b, img.size, minors_threshold)]
+            # aplicar difuminado
+            img = difuminar_caras_en_pil(img, boxes, blur_radius=blur_strength)
+    # aplicar estilo (si está activo y hay prompt)
+    if style_apply and style_prompt:
+        try:
+            img = apply_style_effects(img, style_prompt)
+        except Exception:
+            # no bloquear si falla el efecto
+            pass
+    return img.convert("RGBA")
+
+
+@medido("textos")
+def componer_textos(img, titulo, subtitulo, pos_y, tamano, color, pos_sub_y, tamano_sub, color_sub, angle=0, angle_sub=0, escala=1.0):
+    """
+    Etapa de texto de superponer_titulos_en_frame: dibuja título y subtítulo sobre img (RGBA) y devuelve RGB.
+    escala: factor de img respecto al frame original (vista previa reducida);
+    posiciones, tamaños y márgenes se escalan igual.
+    """
+    w_img, h_img = img.size
+    canvas = Image.new("RGBA", img.size, (0, 0, 0, 0))
+
+    def _px(v):
+        return int(round(v * escala))
+
+    # Función auxiliar para crear una capa con el texto y rotarla (ahora con auto-escalado)
+    def _draw_rotated_text_inner(text, font_size, x_center, y_top, fill, shadow_fill, angle_deg):
+        if not text:
+            return (None, None)
+        # normalizar colores
+        fill_color = normalizar_color(fill)
+        shadow_color = normalizar_color(shadow_fill)
+
+        # preferencia por emoji si corresponde
+        prefer_emoji = contiene_emoji(text)
+        requested_size = max(1, _px(max(6, int(font_size))))
+        # ancho máximo permitido para el texto (margen lateral)
+        max_width = max(_px(20), w_img - _px(40))
+
+        # fuente al tamaño pedido o, si excede el ancho, reducida hasta que quepa
+        font, bbox = ajustar_fuente_a_ancho(text, requested_size, max_width, prefer_emoji)
+        tw = bbox[2] - bbox[0]
+        th = bbox[3] - bbox[1]
+
+        # utilizar métricas para margen inferior (evita corte)
+        try:
+            ascent, descent = font.getmetrics()
+        except Exception:
+            ascent, descent = th, int(th * 0.2)
+        margin_top = _px(10)
+        margin_bottom = max(_px(10), descent + _px(6))
+        margin_x = _px(10)
+
+        layer_w, layer_h = tw + margin_top + margin_bottom + 2 * margin_x, th + margin_top + margin_bottom + 2 * margin_x
+        layer = Image.new("RGBA", (layer_w, layer_h), (0, 0, 0, 0))
+        layer_draw = ImageDraw.Draw(layer)
+        # dibujar sombra y texto en la capa con colores normalizados
+        shadow_offset = max(1, _px(3))
+        layer_draw.text((margin_x + shadow_offset, margin_top + shadow_offset), text, font=font, fill=shadow_color)
+        layer_draw.text((margin_x, margin_top), text, font=font, fill=fill_color)
+        # rotar capa
+        rot = layer.rotate(angle_deg, resample=Image.BICUBIC, expand=True)
+        # calcular paste position
+        paste_x = int(x_center - rot.width // 2)
+        paste_y = _px(y_top)
+        # clamp vertical/horizontal
+        if paste_y < 0:
+            paste_y = 0
+        if paste_y + rot.height > h_img:
+            paste_y = max(0, h_img - rot.height)
+        if paste_x < 0:
+            paste_x = 0
+        if paste_x + rot.width > w_img:
+            paste_x = max(0, w_img - rot.width)
+        return rot, (paste_x, paste_y)
+
+    # Título: centrado en ancho, posición vertical pos_y
+    if titulo:
+        rot_layer, pos = _draw_rotated_text_inner(titulo, tamano, w_img // 2, pos_y, color or "ffffff", "000000", angle)
+        if rot_layer:
+            canvas.alpha_composite(rot_layer, dest=pos)
+
+    # Subtítulo
+    if subtitulo:
+        rot_layer_sub, pos_sub = _draw_rotated_text_inner(subtitulo, tamano_sub, w_img // 2, pos_sub_y, color_sub or "ffffff", "000000", angle_sub)
+        if rot_layer_sub:
+            canvas.alpha_composite(rot_layer_sub, dest=pos_sub)
+
+    # Combinar sobre la imagen original
+    return Image.alpha_composite(img, canvas).convert("RGB")
+
+
+def superponer_titulos_en_frame(imagen_path, titulo, subtitulo, pos_y, tamano, color, pos_sub_y, tamano_sub, color_sub, angle=0, angle_sub=0, blur=False, blur_minors=False, blur_strength=15, minors_threshold=0.12, style_apply=False, style_prompt="", escala=1.0):
+    """
+    Difumina caras, aplica el estilo y dibuja título/subtítulo sobre un frame
+    (ruta, PIL o ndarray del almacén de frames). Devuelve RGB.
+    Es la composición de preparar_base y componer_textos.
+    escala: tamaño del frame respecto a TAMANO_REFERENCIA (p.ej. 1/3 en borrador).
+    """
+    img = preparar_base(imagen_path, blur, blur_minors, max(1, blur_strength * escala), minors_threshold, style_apply, style_prompt)
+    return componer_textos(img, titulo, subtitulo, pos_y, tamano, color, pos_sub_y, tamano_sub, color_sub, angle, angle_sub, escala=escala)
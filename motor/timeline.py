@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# motor/timeline.py — modelo de línea de tiempo en frames de vídeo (holds y transiciones)
+
+from .transiciones import TRANSICIONES
+
+
+def construir_timeline(n_frames, duracion, transicion="crossfade", transicion_duracion=0.5, fps=24, movimiento_zoom="in"):
+    """
+    Reparte n_frames imágenes de `duracion` segundos en la línea de tiempo.
+
+    Todo se mide en frames de vídeo (enteros) para que los segmentos encajen
+    exactamente al concatenarlos. Devuelve un dict con:
+    - fps, total: frames por segundo y número total de frames.
+    - clips: por imagen {"frame", "inicio", "fin"} (fin exclusivo), incluyendo
+      los tramos de transición en los que la imagen está visible.
+    - segmentos: lista contigua y ordenada de tramos:
+        {"tipo": "hold", "frame", "inicio", "n"}                 imagen fija
+        {"tipo": "transicion", "efecto", "desde", "hasta", "inicio", "n"}
+        {"tipo": "zoom", "frame", "inicio", "n", "movimiento"}   imagen animada (ver zoom.MOVIMIENTOS)
+    """
+    d = max(1, int(round(duracion * fps)))
+    t = 0
+    if transicion in TRANSICIONES and n_frames > 1:
+        # la transición se solapa con el final de un clip y el principio del siguiente
+        t = min(int(round(transicion_duracion * fps)), d // 2)
+
+    clips = []
+    segmentos = []
+    inicio = 0
+    for i in range(n_frames):
+        clip_inicio = inicio - (t if i > 0 else 0)
+        clips.append({"frame": i, "inicio": clip_inicio, "fin": clip_inicio + d})
+        if i > 0 and t:
+            segmentos.append({"tipo": "transicion", "efecto": transicion, "desde": i - 1, "hasta": i, "inicio": inicio, "n": t})
+            inicio += t
+        # la parte fija descuenta las transiciones de entrada y de salida
+        n_fijo = d - (t if i > 0 else 0) - (t if i < n_frames - 1 else 0)
+        tipo = "zoom" if (transicion == "zoom" and i > 0) else "hold"
+        if n_fijo > 0:
+            segmentos.append({"tipo": tipo, "frame": i, "inicio": inicio, "n": n_fijo})
+            if tipo == "zoom":
+                segmentos[-1]["movimiento"] = movimiento_zoom
+            inicio += n_fijo
+    return {"fps": fps, "total": inicio, "clips": clips, "segmentos": segmentos}
+
+
+def duracion_timeline(timeline):
+    return timeline["total"] / float(timeline["fps"])
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# motor/trabajos.py — cola de trabajos en segundo plano con progreso, cancelación y codificaciones limitadas
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+from .medicion import etapa
+
+EN_COLA = "en_cola"
+EJECUTANDO = "ejecutando"
+COMPLETADO = "completado"
+ERROR = "error"
+CANCELADO = "cancelado"
+
+# Codificaciones (ffmpeg) simultáneas en todo el proceso, sean de la cola o no
+_codificaciones = threading.BoundedSemaphore(1)
+_max_codificaciones = 1
+
+
+class TrabajoCancelado(Exception):
+    """Se lanza desde el callback de progreso cuando el trabajo se ha cancelado."""
+
+
+def configurar_codificaciones(n):
+    """Fija cuántas codificaciones pueden ejecutarse a la vez (afecta a las siguientes)."""
+    global _codificaciones, _max_codificaciones
+    _max_codificaciones = max(1, int(n))
+    _codificaciones = threading.BoundedSemaphore(_max_codificaciones)
+
+
+@contextmanager
+def ranura_codificacion():
+    """Espera turno para codificar; las demás etapas (preparar frames...) no esperan."""
+    semaforo = _codificaciones
+    with etapa("espera_codificacion"):
+        semaforo.acquire()
+    try:
+        yield
+    finally:
+        semaforo.release()
+
+
+class Trabajo:
+    """
+    Un trabajo enviado a la cola. Su función recibe progreso=self.informar,
+    que actualiza la etapa en curso y lanza TrabajoCancelado si se ha pedido
+    cancelar: la cancelación es cooperativa y surte efecto en el siguiente aviso.
+    Con espacio (p.ej. un EspacioSesion), desde que se encola hasta que termina
+    (o se cancela sin llegar a ejecutarse) se mantiene dentro de
+    espacio.en_uso(): la limpieza de disco no expulsa sus ficheros.
+    """
+
+    def __init__(self, tipo, func, args, kwargs, espacio=None):
+        self.id = uuid.uuid4().hex
+        self.tipo = tipo
+        self.estado = EN_COLA
+        self.etapa = None
+        self.hecho = 0
+        self.total = 0
+        self.resultado = None
+        self.error = None
+        self.creado = time.time()
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._uso = espacio.en_uso() if espacio is not None else nullcontext()
+        self._uso.__enter__()
+        self._futuro = None
+        self._liberado = False
+        self._lock = threading.Lock()
+        self._cancelar = threading.Event()
+        self._terminado = threading.Event()
+
+    @property
+    def activo(self):
+        return self.estado in (EN_COLA, EJECUTANDO)
+
+    @property
+    def fraccion(self):
+        return min(1.0, self.hecho / float(self.total)) if self.total else 0.0
+
+    def informar(self, etapa, hecho=0, total=0):
+        """Callback de progreso: etapa y avance (p.ej. frames preparados, segundos codificados)."""
+        self.etapa, self.hecho, self.total = etapa, hecho, total
+        if self._cancelar.is_set():
+            raise TrabajoCancelado(self.id)
+
+    def cancelar(self):
+        self._cancelar.set()
+        # si aún no ha empezado no llegará a ejecutarse: se termina aquí
+        if self._futuro is not None and self._futuro.cancel():
+            self._descartar()
+
+    def _descartar(self):
+        """Cierra un trabajo cuyo futuro se canceló antes de ejecutarse."""
+        self.estado = CANCELADO
+        self._terminar()
+
+    def _terminar(self):
+        with self._lock:
+            if self._liberado:
+                return
+            self._liberado = True
+        # los argumentos (proyecto, almacén de frames...) no se retienen una vez terminado
+        self._args, self._kwargs = (), {}
+        self._uso.__exit__(None, None, None)
+        self._terminado.set()
+
+    def esperar(self, timeout=None):
+        """Espera a que termine y devuelve el resultado (o relanza su error)."""
+        self._terminado.wait(timeout)
+        if self.estado == ERROR:
+            raise self.error
+        return self.resultado
+
+    def _ejecutar(self):
+        try:
+            if self._cancelar.is_set():
+                raise TrabajoCancelado(self.id)
+            self.estado = EJECUTANDO
+            self.resultado = self._func(*self._args, progreso=self.informar, **self._kwargs)
+            self.estado = COMPLETADO
+        except TrabajoCancelado:
+            self.estado = CANCELADO
+        except Exception as e:
+            self.error = e
+            self.estado = ERROR
+        finally:
+            self._terminar()
+
+
+class ColaTrabajos:
+    """
+    Ejecuta trabajos (render, incrustación de títulos) en un pool acotado de
+    hilos. Las etapas pesadas ya se reparten en el pool de procesos o en
+    ffmpeg; aquí solo se limita cuántos trabajos avanzan a la vez y, con
+    ranura_codificacion, cuántas codificaciones.
+    """
+
+    def __init__(self, max_trabajos=2, max_codificaciones=1):
+        self._pool = ThreadPoolExecutor(max_workers=max_trabajos, thread_name_prefix="trabajo")
+        self._trabajos = {}
+        self._lock = threading.Lock()
+        configurar_codificaciones(max_codificaciones)
+
+    def enviar(self, func, *args, tipo="render", espacio=None, **kwargs):
+        """Encola func(*args, progreso=..., **kwargs) y devuelve el Trabajo (ver Trabajo para espacio)."""
+        trabajo = Trabajo(tipo, func, args, kwargs, espacio)
+        with self._lock:
+            # los terminados ya solo los referencia quien los envió: la cola no retiene sus resultados
+            for trabajo_id in [t.id for t in self._trabajos.values() if not t.activo]:
+                del self._trabajos[trabajo_id]
+            self._trabajos[trabajo.id] = trabajo
+        trabajo._futuro = self._pool.submit(trabajo._ejecutar)
+        return trabajo
+
+    def obtener(self, trabajo_id):
+        return self._trabajos.get(trabajo_id)
+
+    def pendientes(self):
+        """Trabajos en cola o en ejecución."""
+        return [t for t in list(self._trabajos.values()) if t.activo]
+
+    def olvidar(self, trabajo_id):
+        """Deja de seguir un trabajo (una vez leído su resultado)."""
+        with self._lock:
+            self._trabajos.pop(trabajo_id, None)
+
+    def cerrar(self, cancelar=True):
+        if cancelar:
+            for trabajo in self.pendientes():
+                trabajo.cancelar()
+        self._pool.shutdown(wait=False, cancel_futures=cancelar)
+        for trabajo in self.pendientes():
+            if trabajo._futuro is not None and trabajo._futuro.cancelled():
+                trabajo._descartar()
+
+
+_cola = None
+_cola_lock = threading.Lock()
+
+
+def obtener_cola(max_trabajos=2, max_codificaciones=1):
+    """Cola compartida por todas las sesiones del proceso."""
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = ColaTrabajos(max_trabajos, max_codificaciones)
+    return _cola
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# motor/transiciones.py — compositor de transiciones: solo se calculan los frames del solape
+
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+from .caras import cv2, cv2_available
+
+# Transiciones que solapan el final de una imagen con el principio de la siguiente
+TRANSICIONES = ("crossfade", "dissolve", "fade", "slide", "wipe")
+
+
+def _suavizar(p):
+    """Curva ease-in-out para los movimientos (slide/wipe)."""
+    return p * p * (3.0 - 2.0 * p)
+
+
+def _mezclar(a16, b16, alpha, salida):
+    """salida = a + (b - a) * alpha / 256, con alpha entero 0..256 (escalar o array HxWx1 uint16)."""
+    if "tmp_a" not in salida:
+        # con OpenCV: a, b son los uint8 originales y alpha un escalar 0..256 o un mapa
+        # de pesos float32 0..1 (su complementario va en salida["peso_a"])
+        if np.isscalar(alpha):
+            cv2.addWeighted(a16, 1.0 - alpha / 256.0, b16, alpha / 256.0, 0, dst=salida["frame"])
+        else:
+            salida["frame"][...] = cv2.blendLinear(a16, b16, salida["peso_a"], alpha)
+        return
+    np.multiply(b16, alpha, out=salida["tmp_b"])
+    np.multiply(a16, 256 - alpha, out=salida["tmp_a"])
+    np.add(salida["tmp_a"], salida["tmp_b"], out=salida["tmp_a"])
+    np.right_shift(salida["tmp_a"], 8, out=salida["tmp_a"])
+    np.copyto(salida["frame"], salida["tmp_a"], casting="unsafe")
+
+
+@lru_cache(maxsize=4)
+def _ruido_disolucion(w, h):
+    """Campo de ruido suave (0..1) por resolución: manchas en lugar de píxeles sueltos."""
+    rng = np.random.default_rng(0)
+    pequeno = rng.random((max(2, h // 24), max(2, w // 24))).astype(np.float32)
+    ruido = np.array(Image.fromarray(pequeno).resize((w, h), Image.BICUBIC), dtype=np.float32)
+    ruido -= ruido.min()
+    ruido /= max(1e-6, float(ruido.max()))
+    ruido.setflags(write=False)
+    return ruido
+
+
+def frames_transicion(a, b, n, efecto="crossfade"):
+    """
+    Genera los n frames intermedios entre a y b (sin incluir los extremos).
+
+    Todos los frames se escriben en el mismo buffer preasignado: el consumidor
+    debe usar (o copiar) cada frame antes de pedir el siguiente.
+    - crossfade: fundido lineal.
+    - fade: fundido a negro y desde negro.
+    - dissolve: disolución por manchas con borde suave.
+    - slide: b entra desde la derecha empujando a a (solo copias de memoria).
+    - wipe: cortinilla de izquierda a derecha con borde difuminado.
+    """
+    a = np.asarray(a)
+    b = np.asarray(b)
+    h, w = a.shape[:2]
+    buffers = {"frame": np.empty_like(a)}
+    if efecto in ("crossfade", "fade", "dissolve"):
+        if cv2_available:
+            a16, b16 = np.ascontiguousarray(a), np.ascontiguousarray(b)
+        else:
+            a16 = a.astype(np.uint16)
+            b16 = b.astype(np.uint16)
+            buffers["tmp_a"] = np.empty(a.shape, np.uint16)
+            buffers["tmp_b"] = np.empty(a.shape, np.uint16)
+        negro = np.zeros_like(a16)
+    if efecto == "dissolve":
+        ruido = _ruido_disolucion(w, h)
+        alpha = np.empty((h, w), np.float32)
+        alpha16 = np.empty((h, w, 1), np.uint16)
+        borde = 0.15
+        if cv2_available:
+            buffers["peso_a"] = np.empty((h, w), np.float32)
+    if efecto == "wipe":
+        banda = max(2, w // 40)
+        rampa = np.linspace(256, 0, banda, dtype=np.float32)[None, :, None]
+
+    for k in range(n):
+        p = (k + 1) / float(n + 1)
+        if efecto == "slide":
+            x = int(round(w * _suavizar(p)))
+            frame = buffers["frame"]
+            frame[:, :w - x] = a[:, x:]
+            frame[:, w - x:] = b[:, :x]
+        elif efecto == "wipe":
+            # el borde (banda) recorre desde fuera por la izquierda hasta fuera por la derecha
+            x = int(round((w + banda) * _suavizar(p))) - banda
+            frame = buffers["frame"]
+            x0, x1 = max(0, x), min(w, x + banda)
+            frame[:, :x0] = b[:, :x0]
+            frame[:, x1:] = a[:, x1:]
+            if x1 > x0:
+                r = rampa[:, x0 - x:x1 - x]
+                frame[:, x0:x1] = (a[:, x0:x1] * (256 - r) + b[:, x0:x1] * r).astype(np.uint16) >> 8
+        elif efecto == "fade":
+            if p < 0.5:
+                _mezclar(a16, negro, int(round(512 * p)), buffers)
+            else:
+                _mezclar(negro, b16, int(round(512 * (p - 0.5))), buffers)
+        elif efecto == "dissolve":
+            # alpha = clip((p * (1 + borde) - ruido) / borde, 0, 1) en 0..256
+            np.subtract(p * (1.0 + borde), ruido, out=alpha)
+            np.multiply(alpha, 256.0 / borde, out=alpha)
+            np.clip(alpha, 0, 256, out=alpha)
+            if cv2_available:
+                np.multiply(alpha, 1.0 / 256, out=alpha)
+                np.subtract(1.0, alpha, out=buffers["peso_a"])
+                _mezclar(a16, b16, alpha, buffers)
+            else:
+                np.copyto(alpha16[:, :, 0], alpha, casting="unsafe")
+                _mezclar(a16, b16, alpha16, buffers)
+        else:
+            _mezclar(a16, b16, int(round(256 * p)), buffers)
+        yield buffers["frame"]
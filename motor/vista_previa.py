@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# motor/vista_previa.py — vista previa del editor de títulos sobre copias reducidas y cacheadas de los frames
+
+from collections import OrderedDict
+
+from PIL import Image
+
+from .caras import cv2_available, detectar_caras_pil
+from .textos import TAMANO_REFERENCIA, componer_textos, preparar_base
+
+ANCHO_VISTA_PREVIA = 405  # 1080 / 2.67: suficiente para la columna de la app
+
+
+class _LRU:
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self._datos = OrderedDict()
+
+    def obtener(self, clave, crear):
+        if clave in self._datos:
+            self._datos.move_to_end(clave)
+            return self._datos[clave]
+        valor = self._datos[clave] = crear()
+        if len(self._datos) > self.maximo:
+            self._datos.popitem(last=False)
+        return valor
+
+    def limpiar(self):
+        self._datos.clear()
+
+
+class VistaPrevia:
+    """
+    Renderiza la vista previa de un frame con sus títulos sobre una copia
+    reducida (proxy) del frame del almacén, en tres etapas memorizadas por
+    separado:
+    - proxy: el frame reducido a `ancho` (una vez por frame);
+    - base: difuminado de caras y estilo sobre el proxy (solo cambia con esos
+      ajustes; las caras se detectan en el frame completo, cacheadas por
+      contenido, y se reescalan);
+    - textos: se recomponen en cada cambio, que es lo único que varía al
+      mover los sliders de posición, tamaño, rotación o color.
+    Devuelve imágenes PIL en memoria (sin ficheros temporales). Los ajustes de
+    títulos están en el espacio de TAMANO_REFERENCIA y se escalan al proxy, sea
+    cual sea la resolución del render (borrador o final).
+    """
+
+    def __init__(self, almacen, ancho=ANCHO_VISTA_PREVIA, max_frames=64):
+        self.almacen = almacen
+        self.ancho = ancho
+        self._proxies = _LRU(max_frames)
+        self._bases = _LRU(max_frames)
+
+    def proxy(self, handle):
+        """Frame reducido (RGBA) y su escala respecto al original."""
+        def _crear():
+            img = self.almacen.imagen(handle)
+            escala = min(1.0, self.ancho / float(img.width))
+            tamano = (max(1, round(img.width * escala)), max(1, round(img.height * escala)))
+            return img.resize(tamano, Image.BOX if escala < 1 else Image.NEAREST).convert("RGBA"), escala
+        return self._proxies.obtener(handle, _crear)
+
+    def base(self, handle, t, estilo_prompt_global=""):
+        """Proxy con difuminado y estilo aplicados según los ajustes de t."""
+        blur = bool(t.get("blur", False)) and cv2_available
+        style_apply = bool(t.get("use_style", False))
+        style_prompt = t.get("style_prompt", "") or estilo_prompt_global or ""
+        clave = (
+            handle, blur,
+            bool(t.get("blur_minors", False)) if blur else None,
+            float(t.get("blur_strength", 15)) if blur else None,
+            float(t.get("minors_threshold", 0.12)) if blur else None,
+            style_prompt if style_apply else None,
+        )
+
+        def _crear():
+            img, escala = self.proxy(handle)
+            boxes = None
+            if blur:
+                # detección en el frame completo (cacheada por contenido) reescalada al proxy
+                boxes = [[int(round(v * escala)) for v in b] for b in detectar_caras_pil(self.almacen.array(handle))]
+            return preparar_base(
+                img, blur=blur,
+                blur_minors=t.get("blur_minors", False),
+                blur_strength=max(1, t.get("blur_strength", 15) * img.width / float(TAMANO_REFERENCIA[0])),
+                minors_threshold=t.get("minors_threshold", 0.12),
+                style_apply=style_apply, style_prompt=style_prompt, boxes=boxes,
+            )
+        return self._bases.obtener(clave, _crear)
+
+    def renderizar(self, handle, t, estilo_prompt_global=""):
+        """Vista previa (PIL RGB) de un frame con los títulos de t."""
+        img = self.base(handle, t, estilo_prompt_global)
+        escala = img.width / float(TAMANO_REFERENCIA[0])
+        return componer_textos(
+            img, t["titulo"], t["subtitulo"], t["pos_y"], t["tamano"], t["color"],
+            t["pos_sub_y"], t["tamano_sub"], t["color_sub"],
+            t.get("angle", 0), t.get("angle_sub", 0), escala=escala,
+        )
+
+    def limpiar(self):
+        self._proxies.limpiar()
+        self._bases.limpiar()
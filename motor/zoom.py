@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# motor/zoom.py — zoom / Ken Burns: una transformación afín por frame sobre una pirámide precalculada
+
+import numpy as np
+from PIL import Image
+
+from .caras import cv2, cv2_available
+from .frames import a_array_rgb
+
+# Movimientos disponibles: escala (inicio, fin) respecto al frame y centro (x, y) normalizado de la
+# imagen que queda en el centro del frame al inicio y al final. Escala < 1 deja bordes negros.
+MOVIMIENTOS = {
+    "in": {"escala": (0.2, 1.0), "centro": ((0.5, 0.5), (0.5, 0.5))},       # zoom-in clásico desde el 20%
+    "out": {"escala": (1.0, 0.2), "centro": ((0.5, 0.5), (0.5, 0.5))},
+    "kenburns-in": {"escala": (1.0, 1.2), "centro": ((0.5, 0.5), (0.5, 0.45))},
+    "kenburns-out": {"escala": (1.2, 1.0), "centro": ((0.5, 0.45), (0.5, 0.5))},
+    "pan-izquierda": {"escala": (1.15, 1.15), "centro": ((0.6, 0.5), (0.4, 0.5))},
+    "pan-derecha": {"escala": (1.15, 1.15), "centro": ((0.4, 0.5), (0.6, 0.5))},
+}
+MOVIMIENTO_POR_DEFECTO = "in"
+
+
+class MotorZoom:
+    """
+    Genera los frames de un movimiento de cámara sobre una imagen fija.
+
+    La imagen se prepara una sola vez como pirámide (cada nivel a la mitad de
+    resolución, reducido con INTER_AREA) y cada frame es un único warpAffine
+    bilineal desde el nivel adecuado hacia un buffer de salida reutilizado:
+    nunca se remuestrea más de 2x hacia abajo, así que no hay aliasing.
+    """
+
+    def __init__(self, imagen, escala_minima=0.2):
+        base = a_array_rgb(imagen)
+        self.h, self.w = base.shape[:2]
+        self.niveles = [base]
+        # niveles necesarios hasta cubrir la escala mínima del movimiento
+        while 2 ** -len(self.niveles) >= escala_minima and min(self.niveles[-1].shape[:2]) >= 4:
+            self.niveles.append(_reducir_mitad(self.niveles[-1]))
+        self._buffer = np.zeros((self.h, self.w, 3), dtype=np.uint8)
+
+    def frame(self, escala, centro=(0.5, 0.5), salida=None):
+        """
+        Frame con la imagen escalada `escala` veces y el punto `centro` (normalizado)
+        en el centro del frame. Escribe en salida (o en el buffer interno) y lo devuelve.
+        """
+        salida = self._buffer if salida is None else salida
+        cx, cy = _limitar_centro(escala, centro)
+        # nivel más reducido que sigue siendo al menos tan grande como el resultado
+        nivel = 0
+        while nivel + 1 < len(self.niveles) and 2 ** -(nivel + 1) >= escala:
+            nivel += 1
+        src = self.niveles[nivel]
+        hs, ws = src.shape[:2]
+        sx = escala * self.w / float(ws)
+        sy = escala * self.h / float(hs)
+        # centros de píxel: dst + 0.5 = s * (src + 0.5 - C) + W / 2
+        tx = sx * (0.5 - cx * ws) + self.w / 2.0 - 0.5
+        ty = sy * (0.5 - cy * hs) + self.h / 2.0 - 0.5
+        if cv2_available:
+            M = np.array([[sx, 0.0, tx], [0.0, sy, ty]], dtype=np.float64)
+            cv2.warpAffine(src, M, (self.w, self.h), dst=salida, flags=cv2.INTER_LINEAR,
+                           borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+        else:
+            # PIL recibe la transformación inversa (de salida a origen)
+            inversa = (1.0 / sx, 0.0, -tx / sx, 0.0, 1.0 / sy, -ty / sy)
+            img = Image.fromarray(src).transform((self.w, self.h), Image.AFFINE, inversa, Image.BILINEAR, fillcolor=(0, 0, 0))
+            salida[...] = np.asarray(img)
+        return salida
+
+    def frame_movimiento(self, movimiento, progreso, salida=None):
+        """Frame del movimiento en progreso (0..1)."""
+        params = MOVIMIENTOS.get(movimiento, MOVIMIENTOS[MOVIMIENTO_POR_DEFECTO])
+        e0, e1 = params["escala"]
+        (x0, y0), (x1, y1) = params["centro"]
+        p = min(1.0, max(0.0, progreso))
+        return self.frame(e0 + (e1 - e0) * p, (x0 + (x1 - x0) * p, y0 + (y1 - y0) * p), salida)
+
+    def frames(self, n, movimiento=MOVIMIENTO_POR_DEFECTO):
+        """Genera los n frames del movimiento (progreso k/n, como el zoom original). Reutiliza el buffer."""
+        for k in range(n):
+            yield self.frame_movimiento(movimiento, k / float(max(1, n)))
+
+
+def _reducir_mitad(arr):
+    h, w = arr.shape[:2]
+    tamano = (max(1, w // 2), max(1, h // 2))
+    if cv2_available:
+        return cv2.resize(arr, tamano, interpolation=cv2.INTER_AREA)
+    return np.asarray(Image.fromarray(arr).reduce(2))
+
+
+def _limitar_centro(escala, centro):
+    """Con escala >= 1 el centro se limita para que el frame no salga de la imagen."""
+    cx, cy = centro
+    if escala > 1.0:
+        margen = 0.5 / escala
+        cx = min(max(cx, margen), 1.0 - margen)
+        cy = min(max(cy, margen), 1.0 - margen)
+    return cx, cy
+
+
+def escala_minima(movimiento):
+    return min(MOVIMIENTOS.get(movimiento, MOVIMIENTOS[MOVIMIENTO_POR_DEFECTO])["escala"])
+
+
+def frames_zoom(imagen, n, movimiento=MOVIMIENTO_POR_DEFECTO):
+    """Atajo: genera los n frames de un movimiento sobre imagen (ndarray/PIL)."""
+    return MotorZoom(imagen, escala_minima(movimiento)).frames(n, movimiento)